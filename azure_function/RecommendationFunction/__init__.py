@@ -13,22 +13,54 @@ import azure.functions as func
 # Ajouter le répertoire parent au path pour imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from recommendation_engine import RecommendationEngine
+from model_holder import ModelHolder
 
-# Instance globale du moteur (réutilisée entre invocations)
-engine = None
+# Détenteur global du moteur (réutilisé entre invocations, rechargé à chaud)
+holder = None
+
+# Chargement des composants lourds: 'eager' (tout au démarrage), 'lazy' (à la première
+# utilisation) ou 'background' (thread de warm-up, popularité servie en attendant)
+ENGINE_LOAD_MODE = os.environ.get('ENGINE_LOAD_MODE', 'background')
+
+# Nombre maximum d'utilisateurs par requête batch (user_ids)
+MAX_BATCH_USERS = 500
+
+# Rechargement à chaud: intervalle de vérification de bundles/LATEST en secondes (0 = désactivé)
+MODEL_POLL_SECONDS = float(os.environ.get('MODEL_POLL_SECONDS', '60'))
+
+# Source des modèles: 'local' (inclus dans le déploiement) ou 'blob' (synchronisés depuis
+# Blob Storage vers MODELS_SYNC_PATH, à chaque vérification)
+MODELS_SOURCE = os.environ.get('MODELS_SOURCE', 'local')
+MODELS_SYNC_PATH = os.environ.get('MODELS_SYNC_PATH', '/tmp/models')
+
+def blob_sync(models_path: str):
+    """Fonction de synchronisation Blob Storage -> models_path pour ModelHolder"""
+    from azure_utils import download_models_from_blob
+    from config import STORAGE_ACCOUNT_NAME, BLOB_CONTAINER_NAME, BLOB_MODELS_PREFIX
+
+    def sync() -> bool:
+        return download_models_from_blob(STORAGE_ACCOUNT_NAME, BLOB_CONTAINER_NAME,
+                                         prefix=BLOB_MODELS_PREFIX, local_path=models_path)
+    return sync
 
 def initialize_engine():
-    """Initialise le moteur de recommandation (appelé une seule fois)"""
-    global engine
-    if engine is None:
+    """Initialise le détenteur du moteur (une seule fois) et retourne le moteur actif"""
+    global holder
+    if holder is None:
         try:
             logging.info("Initialisation du moteur de recommandation...")
 
-            # Chemin vers les modèles inclus dans le déploiement
-            # Les modèles sont dans le dossier 'models' à la racine de la Function App
-            base_dir = os.path.dirname(os.path.dirname(__file__))
-            models_path = os.path.join(base_dir, 'models')
+            sync = None
+            if MODELS_SOURCE == 'blob':
+                models_path = MODELS_SYNC_PATH
+                sync = blob_sync(models_path)
+                if not sync():
+                    raise RuntimeError("Téléchargement initial des modèles depuis Blob Storage échoué")
+            else:
+                # Chemin vers les modèles inclus dans le déploiement
+                # Les modèles sont dans le dossier 'models' à la racine de la Function App
+                base_dir = os.path.dirname(os.path.dirname(__file__))
+                models_path = os.path.join(base_dir, 'models')
 
             logging.info(f"Chemin des modèles: {models_path}")
             logging.info(f"Existence: {os.path.exists(models_path)}")
@@ -39,9 +71,14 @@ def initialize_engine():
             else:
                 raise FileNotFoundError(f"Répertoire modèles introuvable: {models_path}")
 
-            engine = RecommendationEngine(models_path=models_path)
-            engine.load_models()
-            logging.info("✓ Moteur initialisé avec succès")
+            model_holder = ModelHolder(models_path, load_mode=ENGINE_LOAD_MODE, sync=sync,
+                                       poll_interval_seconds=MODEL_POLL_SECONDS)
+            model_holder.engine  # Premier chargement
+            if MODEL_POLL_SECONDS > 0:
+                model_holder.start_watcher()
+            holder = model_holder
+            logging.info(f"✓ Moteur initialisé avec succès (mode: {ENGINE_LOAD_MODE}, "
+                         f"version: {holder.model_version})")
 
         except Exception as e:
             import traceback
@@ -50,7 +87,96 @@ def initialize_engine():
             logging.error(f"Traceback: {error_trace}")
             raise
 
-    return engine
+    # Une seule lecture par requête: la requête reste sur ce moteur même si un swap intervient
+    return holder.engine
+
+def handle_batch_request(rec_engine, req: func.HttpRequest, user_ids) -> func.HttpResponse:
+    """
+    Recommandations pour une liste d'utilisateurs en un appel (précalcul email/push)
+
+    Args:
+        rec_engine: Moteur initialisé
+        req: Requête HTTP (paramètres dans le body JSON ou en query params)
+        user_ids: Liste d'IDs (body JSON) ou chaîne "58,100,500" (query param)
+
+    Returns:
+        Réponse HTTP avec les recommandations par utilisateur
+    """
+    try:
+        params = req.get_json()
+    except ValueError:
+        params = req.params
+
+    try:
+        if isinstance(user_ids, str):
+            user_ids = user_ids.split(',')
+        user_ids = [int(user_id) for user_id in user_ids]
+        n_recommendations = int(params.get('n', params.get('n_recommendations', 5)))
+        weight_collab = float(params.get('weight_collab', 0.36))
+        weight_content = float(params.get('weight_content', 0.39))
+        weight_trend = float(params.get('weight_trend', 0.25))
+        use_diversity_bool = str(params.get('use_diversity', True)).lower() in ['true', '1', 'yes']
+    except (TypeError, ValueError) as e:
+        return func.HttpResponse(
+            json.dumps({
+                'error': f'Paramètre invalide: {str(e)}'
+            }, indent=2),
+            status_code=400,
+            mimetype="application/json"
+        )
+
+    if not user_ids or len(user_ids) > MAX_BATCH_USERS:
+        return func.HttpResponse(
+            json.dumps({
+                'error': f'user_ids doit contenir entre 1 et {MAX_BATCH_USERS} utilisateurs',
+                'example': {
+                    'user_ids': [58, 100, 500],
+                    'n': 5
+                }
+            }, indent=2),
+            status_code=400,
+            mimetype="application/json"
+        )
+
+    logging.info(f"Génération de {n_recommendations} recommandations pour {len(user_ids)} utilisateurs (batch)")
+
+    results = rec_engine.recommend_batch(
+        user_ids=user_ids,
+        n_recommendations=n_recommendations,
+        weight_collab=weight_collab,
+        weight_content=weight_content,
+        weight_trend=weight_trend,
+        use_diversity=use_diversity_bool
+    )
+
+    response_body = {
+        'n_users': len(results),
+        'results': {str(user_id): recommendations for user_id, recommendations in results.items()},
+        'parameters': {
+            'n_recommendations': n_recommendations,
+            'weight_collab': weight_collab,
+            'weight_content': weight_content,
+            'weight_trend': weight_trend,
+            'use_diversity': use_diversity_bool
+        },
+        'metadata': {
+            'engine_loaded': rec_engine.loaded,
+            'model_version': rec_engine.model_version,
+            'model_reloads': holder.reloads,
+            'platform': 'Azure Functions',
+            'version': 'lite'
+        }
+    }
+
+    return func.HttpResponse(
+        json.dumps(response_body, indent=2),
+        status_code=200,
+        mimetype="application/json",
+        headers={
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        }
+    )
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -68,6 +194,16 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         # Initialiser le moteur (si pas déjà fait)
         rec_engine = initialize_engine()
 
+        # Mode batch: liste d'utilisateurs (user_ids) en query param ou dans le body JSON
+        batch_user_ids = req.params.get('user_ids')
+        if batch_user_ids is None:
+            try:
+                batch_user_ids = (req.get_json() or {}).get('user_ids')
+            except (ValueError, AttributeError):
+                pass
+        if batch_user_ids is not None:
+            return handle_batch_request(rec_engine, req, batch_user_ids)
+
         # Parser les paramètres (query params ou body JSON)
         user_id = req.params.get('user_id')
         n_recommendations = req.params.get('n_recommendations', '5')
@@ -145,6 +281,11 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             },
             'metadata': {
                 'engine_loaded': rec_engine.loaded,
+                'warming_up': rec_engine.is_warming_up(),
+                'model_version': rec_engine.model_version,
+                'model_reloads': holder.reloads,
+                'deltas_applied': len(rec_engine.applied_deltas),
+                'cache': rec_engine.result_cache.stats() if rec_engine.result_cache else None,
                 'platform': 'Azure Functions',
                 'version': 'lite'
             }
@@ -43,24 +43,36 @@ def download_models_from_blob(storage_account_name: str, container_name: str,
 
         # Lister les blobs dans le conteneur
         logger.info(f"Téléchargement des modèles depuis {storage_account_name}/{container_name}")
-        blobs = container_client.list_blobs(name_starts_with=prefix)
+        blobs = [blob for blob in container_client.list_blobs(name_starts_with=prefix)
+                 if not blob.name.endswith('/')]  # Skip directories
+
+        # Pointeurs de version (bundles/LATEST) en dernier: un bundle n'est visible
+        # localement qu'une fois tous ses fichiers téléchargés
+        blobs.sort(key=lambda blob: os.path.basename(blob.name) == 'LATEST')
 
         downloaded_count = 0
         for blob in blobs:
-            if blob.name.endswith('/'):  # Skip directories
+            # Chemin local relatif au préfixe (conserve bundles/<version>/, deltas/, ...)
+            relative_name = blob.name[len(prefix):].lstrip('/')
+            local_file = os.path.join(local_path, relative_name)
+
+            # Fichiers déjà présents, de même taille et plus récents: pas de nouveau téléchargement
+            # (les bundles versionnés sont immuables, seuls les nouveaux fichiers sont rapatriés)
+            if (os.path.basename(relative_name) != 'LATEST' and os.path.exists(local_file)
+                    and os.path.getsize(local_file) == blob.size
+                    and os.path.getmtime(local_file) >= blob.last_modified.timestamp()):
                 continue
 
-            # Créer le chemin local (garder juste le nom du fichier)
-            blob_name = os.path.basename(blob.name)
-            local_file = os.path.join(local_path, blob_name)
-
             logger.info(f"Téléchargement {blob.name} vers {local_file} ({blob.size / 1024 / 1024:.1f} MB)")
+            Path(local_file).parent.mkdir(parents=True, exist_ok=True)
 
-            # Télécharger le blob
+            # Télécharger le blob (fichier temporaire puis remplacement atomique)
             blob_client = container_client.get_blob_client(blob.name)
-            with open(local_file, "wb") as f:
+            tmp_file = f"{local_file}.tmp"
+            with open(tmp_file, "wb") as f:
                 download_stream = blob_client.download_blob()
                 f.write(download_stream.readall())
+            os.replace(tmp_file, local_file)
 
             downloaded_count += 1
 
@@ -0,0 +1,76 @@
+"""
+Scores bruts par source (collaborative, content-based, tendance) d'une requête
+
+Les listes de candidats des trois sources ne dépendent pas des poids hybrides:
+elles peuvent être calculées une fois puis recombinées pour autant de jeux de poids
+que nécessaire (tuning Optuna / grid search). Une recombinaison n'est plus qu'une
+somme pondérée de trois vecteurs normalisés et un tri.
+"""
+
+import numpy as np
+from typing import List, Optional, Tuple
+
+# Ordre des lignes de ComponentScores.scores
+COMPONENTS = ('collab', 'content', 'trend')
+
+
+class ComponentScores:
+    """
+    Candidats des trois sources pour un utilisateur
+
+    Attributes:
+        collab, content, trend: Listes (article_id, score brut) de chaque source
+        cold_start: Utilisateur sans historique (trend = popularité seule, non pondérée)
+        article_ids: Union des candidats (ordre de première apparition collab -> content -> trend)
+        scores: Scores normalisés par le max de chaque source (3, n_candidats), 0 si absent
+    """
+
+    def __init__(self, collab: List[Tuple[int, float]], content: List[Tuple[int, float]],
+                 trend: List[Tuple[int, float]], cold_start: bool = False):
+        self.collab = collab
+        self.content = content
+        self.trend = trend
+        self.cold_start = cold_start
+
+        # Union des candidats dans l'ordre d'insertion de l'ancien dict de scores combinés
+        positions = {}
+        for recs in (collab, content, trend):
+            for article_id, _ in recs:
+                positions.setdefault(article_id, len(positions))
+        self.article_ids = np.fromiter(positions, dtype=np.int64, count=len(positions))
+
+        self.scores = np.zeros((len(COMPONENTS), len(positions)))
+        for row, recs in enumerate((collab, content, trend)):
+            if recs:
+                values = np.array([score for _, score in recs], dtype=np.float64)
+                columns = [positions[article_id] for article_id, _ in recs]
+                self.scores[row, columns] = values / values.max()
+
+    @classmethod
+    def popularity_only(cls, popular: List[Tuple[int, float]]) -> 'ComponentScores':
+        """Cold start: candidats de popularité, renvoyés tels quels par combine()"""
+        return cls([], [], popular, cold_start=True)
+
+    def with_trend(self, trend: List[Tuple[int, float]]) -> 'ComponentScores':
+        """Mêmes candidats personnels, tendance recalculée (autre date de référence / fenêtre)"""
+        return ComponentScores(self.collab, self.content, trend, self.cold_start)
+
+    def combine(self, weight_collab: float, weight_content: float,
+                weight_trend: float, n_candidates: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Score combiné = somme pondérée des scores normalisés (poids déjà normalisés)
+
+        Args:
+            n_candidates: Ne garder que les n meilleurs (None = tous)
+
+        Returns:
+            Liste de tuples (article_id, score combiné) triée par score décroissant
+            (ex aequo dans l'ordre d'insertion, comme le tri stable de l'ancien dict)
+        """
+        if self.cold_start:
+            return self.trend[:n_candidates]
+
+        combined = (weight_collab * self.scores[0] + weight_content * self.scores[1]) + \
+            weight_trend * self.scores[2]
+        order = np.argsort(-combined, kind='stable')[:n_candidates]
+        return list(zip(self.article_ids[order].tolist(), combined[order].tolist()))
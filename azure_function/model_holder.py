@@ -0,0 +1,159 @@
+"""
+Rechargement à chaud des modèles (double buffer autour de RecommendationEngine)
+
+Un thread de surveillance détecte une nouvelle version du bundle (bundles/LATEST),
+éventuellement après synchronisation depuis Blob Storage, charge un second moteur
+hors du chemin des requêtes puis le substitue à l'actif en une seule affectation.
+Les requêtes en cours terminent sur l'ancien moteur: aucune n'est rejetée ni
+servie par un moteur à moitié chargé.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from recommendation_engine import RecommendationEngine
+from model_bundle import find_latest_bundle
+
+logger = logging.getLogger(__name__)
+
+
+class ModelHolder:
+    """
+    Détient le moteur actif et le remplace quand la version du bundle change
+
+    Usage dans un handler: lire holder.engine UNE fois par requête et n'utiliser
+    que cette référence (cohérence même si un swap a lieu pendant la requête).
+    """
+
+    POLL_INTERVAL_SECONDS = 60
+
+    def __init__(self, models_path: str, load_mode: str = 'background',
+                 sync: Optional[Callable[[], bool]] = None,
+                 poll_interval_seconds: float = POLL_INTERVAL_SECONDS):
+        """
+        Args:
+            models_path: Dossier des modèles (contient bundles/LATEST)
+            load_mode: Chargement du PREMIER moteur ('eager', 'lazy' ou 'background');
+                les suivants sont toujours chargés entièrement avant le swap
+            sync: Fonction appelée avant chaque vérification pour rapatrier les modèles
+                (ex: téléchargement depuis Blob Storage), None = disque local uniquement
+            poll_interval_seconds: Intervalle entre deux vérifications
+        """
+        self.models_path = models_path
+        self.load_mode = load_mode
+        self.sync = sync
+        self.poll_interval_seconds = poll_interval_seconds
+        self._engine = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher_thread = None
+        self.reloads = 0
+        self.last_reload = None
+        self.last_error = None
+
+    @property
+    def engine(self) -> RecommendationEngine:
+        """Moteur actif (chargé au premier accès)"""
+        if self._engine is None:
+            with self._reload_lock:
+                if self._engine is None:
+                    engine = RecommendationEngine(models_path=self.models_path)
+                    engine.load_models(lazy=self.load_mode == 'lazy',
+                                       warm_in_background=self.load_mode == 'background')
+                    self._engine = engine
+                    self.last_reload = datetime.now().isoformat(timespec='seconds')
+        return self._engine
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self._engine.model_version if self._engine is not None else None
+
+    def available_version(self) -> Optional[str]:
+        """Version du bundle actif sur disque (None si pas de bundle)"""
+        bundle_path = find_latest_bundle(self.models_path)
+        return os.path.basename(os.path.normpath(bundle_path)) if bundle_path else None
+
+    def check_for_update(self) -> bool:
+        """
+        Synchronise puis recharge si la version sur disque diffère de la version active
+
+        Returns:
+            True si un nouveau moteur a été mis en service
+        """
+        if self.sync is not None and not self.sync():
+            logger.warning("Synchronisation des modèles échouée, version actuelle conservée")
+            return False
+
+        version = self.available_version()
+        if version is None or version == self.model_version:
+            # Même version: seuls les nouveaux deltas de profils sont appliqués (sans rechargement)
+            engine = self._engine
+            if engine is not None and engine.fully_loaded:
+                engine.apply_pending_deltas()
+            return False
+        return self.reload(version)
+
+    def reload(self, expected_version: Optional[str] = None) -> bool:
+        """
+        Charge un nouveau moteur (en entier) puis le substitue à l'actif
+
+        Args:
+            expected_version: Version attendue, pour journaliser un LATEST modifié pendant le chargement
+
+        Returns:
+            True si le swap a eu lieu, False si le chargement a échoué (ancien moteur conservé)
+        """
+        with self._reload_lock:
+            start_time = time.perf_counter()
+            try:
+                standby = RecommendationEngine(models_path=self.models_path)
+                standby.load_models()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Rechargement échoué, version {self.model_version} conservée: {e}",
+                             exc_info=True)
+                return False
+
+            if expected_version is not None and standby.model_version != expected_version:
+                logger.warning(f"Version chargée {standby.model_version} != attendue {expected_version}")
+
+            previous_version = self.model_version
+            self._engine = standby  # Swap atomique: les requêtes suivantes voient le nouveau moteur
+            self.reloads += 1
+            self.last_reload = datetime.now().isoformat(timespec='seconds')
+            self.last_error = None
+
+        logger.info(f"✓ Modèles rechargés à chaud: {previous_version} -> {standby.model_version} "
+                    f"({time.perf_counter() - start_time:.1f}s)")
+        return True
+
+    def start_watcher(self) -> threading.Thread:
+        """Lance le thread de surveillance (daemon, idempotent)"""
+        if self._watcher_thread is None:
+            self._watcher_thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher_thread.start()
+        return self._watcher_thread
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval_seconds):
+            try:
+                self.check_for_update()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Erreur de surveillance des modèles: {e}", exc_info=True)
+
+    def status(self) -> Dict:
+        """État du rechargement à chaud (métadonnées de réponse)"""
+        return {
+            'model_version': self.model_version,
+            'reloads': self.reloads,
+            'last_reload': self.last_reload,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,271 @@
+"""
+Deltas de profils utilisateurs (mises à jour incrémentales depuis le flux de clics)
+
+Écrits par data_preparation/update_profiles_incremental.py, appliqués à chaud par
+RecommendationEngine.apply_delta sans rechargement complet des modèles:
+    <models_path>/deltas/delta_<horodatage>.npz
+
+Un delta contient l'état COMPLET des utilisateurs touchés (historique ordonné,
+poids et nombre de clics par article) et la popularité recalculée: appliquer
+deux fois le même delta ne change rien.
+
+Un delta n'est valable que sur les modèles à partir desquels il a été calculé
+(base_versions): le bundle actif et le socle legacy, identifié par l'empreinte des
+fichiers que seul le recalcul complet réécrit (DELTA_BASE_FILES). Après un recalcul
+complet (nouveaux poids, popularité, mappings) ou un nouveau bundle, les anciens deltas
+sont ignorés par le moteur et archivés par update_profiles_incremental.py.
+"""
+
+import os
+import shutil
+import numpy as np
+from datetime import datetime
+from scipy.sparse import csr_matrix
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from model_bundle import find_latest_bundle, legacy_model_version
+
+DELTAS_DIR = "deltas"
+DELTA_PREFIX = "delta_"
+ARCHIVE_DIR = "archive"  # deltas/archive/: deltas d'anciens modèles, jamais relus
+# Réécrits par le recalcul complet (data_preprocessing_parallel.py, compute_weights_ultra_parallel.py),
+# jamais par update_profiles_incremental.py: leur empreinte identifie le socle legacy des deltas
+DELTA_BASE_FILES = ("mappings.pkl", "weight_params.json")
+
+
+class ProfileDelta:
+    """
+    Profils mis à jour encodés en CSR (offsets + article_ids + poids + clics)
+
+    Lignes dans l'ordre de user_ids, articles dans l'ordre de l'historique (premier clic).
+    """
+
+    def __init__(self, name: str, user_ids: np.ndarray, offsets: np.ndarray, article_ids: np.ndarray,
+                 weights: np.ndarray, num_clicks: np.ndarray,
+                 popularity_article_ids: Optional[np.ndarray] = None,
+                 popularity_scores: Optional[np.ndarray] = None,
+                 base_versions: Sequence[str] = ()):
+        self.name = name
+        self.user_ids = user_ids
+        self.offsets = offsets
+        self.article_ids = article_ids
+        self.weights = weights
+        self.num_clicks = num_clicks
+        self.popularity_article_ids = popularity_article_ids
+        self.popularity_scores = popularity_scores
+        self.base_versions = list(base_versions)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def has_popularity(self) -> bool:
+        return self.popularity_article_ids is not None and len(self.popularity_article_ids) > 0
+
+    def profiles(self) -> Iterator[Tuple[int, Dict]]:
+        """(user_id, profil) au format des profils du moteur ('articles_read', 'article_weights')"""
+        for i, user_id in enumerate(self.user_ids.tolist()):
+            start, stop = int(self.offsets[i]), int(self.offsets[i + 1])
+            articles = self.article_ids[start:stop].tolist()
+            yield user_id, {
+                'articles_read': articles,
+                'article_weights': dict(zip(articles, self.weights[start:stop].tolist()))
+            }
+
+    def matrix_rows(self, user_rows: np.ndarray, article_cols: np.ndarray, values: np.ndarray,
+                    n_articles: int) -> csr_matrix:
+        """
+        Lignes user-item des utilisateurs connus, prêtes pour replace_csr_rows
+
+        Args:
+            user_rows: Ligne de chaque utilisateur du delta dans la matrice (-1 si inconnu)
+            article_cols: Colonne de chaque entrée article_ids (-1 si article inconnu)
+            values: Valeur de chaque entrée (weights ou num_clicks)
+            n_articles: Nombre de colonnes de la matrice
+
+        Returns:
+            CSR (utilisateurs connus, dans l'ordre de user_rows[user_rows >= 0]) × n_articles
+        """
+        known_users = np.flatnonzero(user_rows >= 0)
+        lengths = np.diff(self.offsets)
+        entry_user = np.repeat(np.arange(len(self.user_ids)), lengths)
+
+        # Position de chaque utilisateur connu parmi les lignes produites
+        position = np.full(len(self.user_ids), -1, dtype=np.int64)
+        position[known_users] = np.arange(len(known_users))
+
+        keep = (position[entry_user] >= 0) & (article_cols >= 0) & (values > 0)
+        rows = csr_matrix((values[keep], (position[entry_user[keep]], article_cols[keep])),
+                          shape=(len(known_users), n_articles))
+        rows.sum_duplicates()
+        return rows
+
+
+def replace_csr_rows(matrix: csr_matrix, rows: np.ndarray, new_rows: csr_matrix) -> csr_matrix:
+    """
+    Copie de matrix dont les lignes rows sont remplacées par celles de new_rows (vectorisé, O(nnz))
+
+    La matrice d'origine n'est pas modifiée (elle peut être en mémoire mappée et
+    encore lue par des requêtes en cours): l'appelant remplace la référence.
+
+    Args:
+        matrix: Matrice CSR
+        rows: Lignes à remplacer (uniques), dans l'ordre des lignes de new_rows
+        new_rows: CSR len(rows) × n_colonnes, index triés
+    """
+    matrix = matrix.tocsr()
+    rows = np.asarray(rows, dtype=np.int64)
+    old_indptr = matrix.indptr.astype(np.int64)
+    old_lengths = np.diff(old_indptr)
+
+    lengths = old_lengths.copy()
+    lengths[rows] = np.diff(new_rows.indptr)
+    indptr = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+    data = np.empty(indptr[-1], dtype=np.result_type(matrix.data.dtype, new_rows.data.dtype))
+    indices = np.empty(indptr[-1], dtype=np.int64)
+
+    # Entrées conservées: décalées vers leur nouvelle position
+    replaced = np.zeros(matrix.shape[0], dtype=bool)
+    replaced[rows] = True
+    entry_row = np.repeat(np.arange(matrix.shape[0]), old_lengths)
+    kept = np.flatnonzero(~replaced[entry_row])
+    kept_rows = entry_row[kept]
+    destination = indptr[kept_rows] + (kept - old_indptr[kept_rows])
+    data[destination] = matrix.data[kept]
+    indices[destination] = matrix.indices[kept]
+
+    # Nouvelles lignes
+    new_entry_row = np.repeat(np.arange(len(rows)), np.diff(new_rows.indptr))
+    destination = indptr[rows[new_entry_row]] + (np.arange(new_rows.nnz) - new_rows.indptr[new_entry_row])
+    data[destination] = new_rows.data
+    indices[destination] = new_rows.indices
+
+    index_dtype = np.int32 if indptr[-1] < np.iinfo(np.int32).max else np.int64
+    return csr_matrix((data.astype(matrix.data.dtype, copy=False), indices.astype(index_dtype),
+                       indptr.astype(index_dtype)), shape=matrix.shape)
+
+
+def delta_base_versions(models_path: str) -> List[str]:
+    """
+    Versions des modèles sur lesquelles s'applique un delta calculé maintenant
+
+    Returns:
+        [version du bundle actif (si bundle), empreinte du socle legacy]
+    """
+    versions = []
+    bundle_path = find_latest_bundle(models_path)
+    if bundle_path is not None:
+        versions.append(os.path.basename(os.path.normpath(bundle_path)))
+    versions.append(legacy_model_version(models_path, DELTA_BASE_FILES))
+    return versions
+
+
+def read_base_versions(delta_path: str) -> List[str]:
+    """base_versions d'un delta sans charger ses tableaux (vide pour les deltas sans version)"""
+    with np.load(delta_path) as data:
+        return data['base_versions'].tolist() if 'base_versions' in data.files else []
+
+
+def list_deltas(models_path: str, base_version: Optional[str] = None) -> List[str]:
+    """
+    Chemins des deltas de models_path/deltas, dans l'ordre d'écriture
+
+    Args:
+        models_path: Dossier des modèles
+        base_version: Si donnée, seuls les deltas calculés sur cette version des modèles
+    """
+    path = os.path.join(models_path, DELTAS_DIR)
+    if not os.path.isdir(path):
+        return []
+    names = sorted(f for f in os.listdir(path) if f.startswith(DELTA_PREFIX) and f.endswith('.npz'))
+    paths = [os.path.join(path, name) for name in names]
+    if base_version is not None:
+        paths = [p for p in paths if base_version in read_base_versions(p)]
+    return paths
+
+
+def archive_stale_deltas(models_path: str, base_versions: Sequence[str]) -> List[str]:
+    """
+    Déplace dans deltas/archive/ les deltas calculés sur d'autres modèles que base_versions
+
+    Returns:
+        Noms des deltas archivés
+    """
+    current = set(base_versions)
+    stale = [p for p in list_deltas(models_path) if not current & set(read_base_versions(p))]
+    if stale:
+        archive_dir = os.path.join(models_path, DELTAS_DIR, ARCHIVE_DIR)
+        os.makedirs(archive_dir, exist_ok=True)
+        for path in stale:
+            shutil.move(path, os.path.join(archive_dir, os.path.basename(path)))
+    return [os.path.basename(p) for p in stale]
+
+
+def load_delta(delta_path: str) -> ProfileDelta:
+    """Charge un delta .npz"""
+    with np.load(delta_path) as data:
+        arrays = {name: data[name] for name in data.files}
+    return ProfileDelta(
+        name=os.path.basename(delta_path),
+        user_ids=arrays['user_ids'],
+        offsets=arrays['offsets'],
+        article_ids=arrays['article_ids'],
+        weights=arrays['weights'],
+        num_clicks=arrays['num_clicks'],
+        popularity_article_ids=arrays.get('popularity_article_ids'),
+        popularity_scores=arrays.get('popularity_scores'),
+        base_versions=arrays['base_versions'].tolist() if 'base_versions' in arrays else []
+    )
+
+
+def write_delta(models_path: str, profiles: Dict[int, Dict],
+                popularity: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                base_versions: Optional[Sequence[str]] = None) -> str:
+    """
+    Écrit un delta pour les profils donnés (écriture atomique)
+
+    Args:
+        models_path: Dossier des modèles
+        profiles: {user_id: profil enrichi} — 'articles_read', 'article_weights' et
+            'article_stats' (num_clicks par article, 1 si absent)
+        popularity: (article_ids, popularity_scores) recalculés, None si inchangée
+        base_versions: Versions des modèles de départ (défaut: delta_base_versions(models_path))
+
+    Returns:
+        Chemin du delta écrit
+    """
+    user_ids = np.array(sorted(profiles), dtype=np.int64)
+    offsets = np.zeros(len(user_ids) + 1, dtype=np.int64)
+    article_ids, weights, num_clicks = [], [], []
+    for i, user_id in enumerate(user_ids.tolist()):
+        profile = profiles[user_id]
+        articles = [int(a) for a in profile['articles_read']]
+        article_weights = profile.get('article_weights', {})
+        article_stats = profile.get('article_stats', {})
+        article_ids.extend(articles)
+        weights.extend(float(article_weights.get(a, 0.0)) for a in articles)
+        num_clicks.extend(float(article_stats.get(a, {}).get('num_clicks', 1)) for a in articles)
+        offsets[i + 1] = offsets[i] + len(articles)
+
+    arrays = {
+        'user_ids': user_ids,
+        'offsets': offsets,
+        'article_ids': np.array(article_ids, dtype=np.int64),
+        'weights': np.array(weights, dtype=np.float32),
+        'num_clicks': np.array(num_clicks, dtype=np.float32),
+        'base_versions': np.array(list(base_versions if base_versions is not None
+                                       else delta_base_versions(models_path)), dtype=str)
+    }
+    if popularity is not None:
+        arrays['popularity_article_ids'] = np.asarray(popularity[0], dtype=np.int64)
+        arrays['popularity_scores'] = np.asarray(popularity[1], dtype=np.float64)
+
+    deltas_dir = os.path.join(models_path, DELTAS_DIR)
+    os.makedirs(deltas_dir, exist_ok=True)
+    name = f"{DELTA_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.npz"
+    tmp_path = os.path.join(deltas_dir, f".{name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, os.path.join(deltas_dir, name))
+    return os.path.join(deltas_dir, name)
@@ -0,0 +1,236 @@
+"""
+Stockage colonnaire des profils utilisateurs
+Remplace le dict de dicts de user_profiles_enriched.pkl (un dict article_stats de
+15 clés par article lu) par des tableaux typés en CSR: quelques octets par article
+au lieu de plusieurs centaines d'octets d'objets Python.
+"""
+
+import numpy as np
+from collections.abc import Mapping
+from typing import Dict, List, Optional
+
+from model_bundle import IdIndex
+
+# Statistiques par article (clés de article_stats hors 'weight') et leur type de stockage
+STAT_DTYPES = {
+    'num_clicks': np.int32,
+    'total_time_seconds': np.float32,
+    'avg_time_seconds': np.float32,
+    'median_time_seconds': np.float32,
+    'first_click_ts': np.int64,
+    'last_click_ts': np.int64,
+    'avg_session_quality': np.float32,
+    'avg_device_quality': np.float32,
+    'avg_env_quality': np.float32,
+    'avg_referrer_quality': np.float32,
+    'avg_os_quality': np.float32,
+    'avg_country_quality': np.float32,
+    'avg_region_quality': np.float32,
+    'avg_session_size': np.float32
+}
+
+# Champs fixes d'un profil; les autres champs scalaires numériques sont gardés par utilisateur
+PROFILE_FIELDS = ('articles_read', 'article_weights', 'article_stats')
+
+
+class ProfileView:
+    """
+    Profil d'un utilisateur: plage [start, stop) des tableaux du store
+
+    Se lit comme l'ancien dict (profile['articles_read'], profile.get(...));
+    les listes et dicts sont construits à la demande, rien n'est copié à la création.
+    """
+
+    __slots__ = ('_store', '_row', '_start', '_stop')
+
+    def __init__(self, store: 'ProfileStore', row: int):
+        self._store = store
+        self._row = row
+        self._start = int(store.offsets[row])
+        self._stop = int(store.offsets[row + 1])
+
+    @property
+    def history(self) -> np.ndarray:
+        """Articles lus (vue sur le tableau, sans copie)"""
+        return self._store.article_ids[self._start:self._stop]
+
+    @property
+    def articles_read(self) -> List[int]:
+        return self.history.tolist()
+
+    @property
+    def article_weights(self) -> Dict[int, float]:
+        weights = self._store.weights[self._start:self._stop]
+        has_weight = ~np.isnan(weights)
+        return dict(zip(self.history[has_weight].tolist(), weights[has_weight].tolist()))
+
+    @property
+    def article_stats(self) -> Dict[int, Dict]:
+        stats = self._store.stats
+        if not stats:
+            return {}
+        keys = ['weight'] + list(stats)
+        columns = [self._store.weights[self._start:self._stop].tolist()] + \
+            [values[self._start:self._stop].tolist() for values in stats.values()]
+        return {article_id: dict(zip(keys, values))
+                for article_id, values in zip(self.articles_read, zip(*columns))}
+
+    def keys(self) -> List[str]:
+        fields = ['articles_read', 'article_weights']
+        if self._store.stats:
+            fields.append('article_stats')
+        return fields + list(self._store.user_columns)
+
+    def __getitem__(self, key: str):
+        if key in PROFILE_FIELDS:
+            return getattr(self, key)
+        if key in self._store.user_columns:
+            return self._store.user_columns[key][self._row].item()
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict:
+        """Profil matérialisé (format de user_profiles_enriched.pkl)"""
+        return {key: self[key] for key in self.keys()}
+
+
+class ProfileStore(Mapping):
+    """
+    Profils utilisateurs en CSR: offsets + article_ids + poids + une colonne par statistique
+
+    user_id -> ProfileView. Les tableaux ne sont jamais modifiés (ils peuvent être en
+    mémoire mappée): une affectation store[user_id] = profil est gardée en surcouche
+    (deltas de profils, profils masqués de l'évaluation) et prime sur le tableau.
+    """
+
+    def __init__(self, user_index: IdIndex, offsets: np.ndarray, article_ids: np.ndarray,
+                 weights: np.ndarray, stats: Optional[Dict[str, np.ndarray]] = None,
+                 user_columns: Optional[Dict[str, np.ndarray]] = None):
+        """
+        Args:
+            user_index: user_id -> ligne
+            offsets: Début des articles de chaque ligne (n_users + 1,)
+            article_ids: Articles lus, dans l'ordre de lecture
+            weights: Poids de chaque article (NaN si pas de poids)
+            stats: Statistiques par article lu (voir STAT_DTYPES), optionnel
+            user_columns: Champs scalaires par utilisateur (num_interactions, ...), optionnel
+        """
+        self.user_index = user_index
+        self.offsets = offsets
+        self.article_ids = article_ids
+        self.weights = weights
+        self.stats = stats or {}
+        self.user_columns = user_columns or {}
+        self._overrides = {}
+
+    @classmethod
+    def from_profiles(cls, profiles: Mapping) -> 'ProfileStore':
+        """
+        Encode un dict de profils (user_profiles*.json / .pkl)
+
+        Les statistiques article_stats ne sont gardées que si tous les profils en ont;
+        les champs non scalaires autres que ceux de PROFILE_FIELDS (ex: top_categories)
+        ne sont pas conservés.
+        """
+        user_ids = np.fromiter((int(user_id) for user_id in profiles), dtype=np.int64, count=len(profiles))
+        lengths = np.zeros(len(user_ids) + 1, dtype=np.int64)
+        article_ids, weights = [], []
+        stats = {name: [] for name in STAT_DTYPES}
+        keep_stats = len(profiles) > 0
+        user_fields = {}
+
+        for i, profile in enumerate(profiles.values()):
+            articles = profile['articles_read']
+            article_weights = profile.get('article_weights') or {}
+            article_ids.extend(articles)
+            weights.extend(article_weights.get(article_id, np.nan) for article_id in articles)
+            lengths[i + 1] = len(articles)
+
+            article_stats = profile.get('article_stats')
+            if keep_stats and article_stats is not None:
+                records = [article_stats.get(article_id, {}) for article_id in articles]
+                for name, values in stats.items():
+                    values.extend(record.get(name, 0) for record in records)
+            else:
+                keep_stats = False
+
+            for key, value in profile.items():
+                if key not in PROFILE_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    user_fields.setdefault(key, {})[i] = value
+
+        user_columns = {}
+        for key, values in user_fields.items():
+            column = np.full(len(user_ids), np.nan)
+            column[list(values)] = list(values.values())
+            if all(isinstance(value, int) for value in values.values()) and len(values) == len(user_ids):
+                column = column.astype(np.int64)
+            user_columns[key] = column
+
+        return cls(
+            IdIndex.from_ids(user_ids),
+            np.cumsum(lengths),
+            np.array(article_ids, dtype=np.int64),
+            np.array(weights, dtype=np.float32),
+            stats={name: np.array(values, dtype=STAT_DTYPES[name]) for name, values in stats.items()}
+            if keep_stats else None,
+            user_columns=user_columns
+        )
+
+    def snapshot(self) -> 'ProfileStore':
+        """Copie en O(surcouche): mêmes tableaux, surcouche copiée (remplace copy.deepcopy)"""
+        copy = ProfileStore(self.user_index, self.offsets, self.article_ids, self.weights,
+                            self.stats, self.user_columns)
+        copy._overrides = dict(self._overrides)
+        return copy
+
+    def __getitem__(self, user_id):
+        if user_id in self._overrides:
+            return self._overrides[user_id]
+        return ProfileView(self, self.user_index[user_id])
+
+    def __setitem__(self, user_id, profile):
+        self._overrides[user_id] = profile
+
+    @property
+    def has_overrides(self) -> bool:
+        """Au moins un profil en surcouche (les tableaux ne reflètent pas tous les profils)"""
+        return bool(self._overrides)
+
+    def reset(self, user_id):
+        """Supprime la surcouche d'un utilisateur (retour au profil des tableaux)"""
+        self._overrides.pop(user_id, None)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._overrides or user_id in self.user_index
+
+    def __iter__(self):
+        added = [user_id for user_id in self._overrides if user_id not in self.user_index]
+        yield from self.user_index
+        yield from added
+
+    def __len__(self) -> int:
+        return len(self.user_index) + sum(1 for user_id in self._overrides if user_id not in self.user_index)
+
+    def history(self, user_id) -> List[int]:
+        """Articles lus par un utilisateur ([] si inconnu), sans construire le profil"""
+        profile = self._overrides.get(user_id)
+        if profile is not None:
+            return list(profile['articles_read'])
+        row = self.user_index.get(user_id)
+        if row is None:
+            return []
+        return self.article_ids[int(self.offsets[row]):int(self.offsets[row + 1])].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        """Taille des tableaux (hors surcouche)"""
+        arrays = [self.offsets, self.article_ids, self.weights, *self.stats.values(), *self.user_columns.values()]
+        return int(sum(array.nbytes for array in arrays))
@@ -0,0 +1,41 @@
+"""
+Conversion unique des CSV de clics en cache colonnaire (.npy par fichier horaire)
+
+Les scripts qui lisent les clics via click_reader (data_preprocessing_parallel,
+compute_weights_ultra_parallel, clean_interaction_data_v3, ...) utilisent
+automatiquement les partitions à jour au lieu de re-parser les CSV.
+
+Relancer le script ne convertit que les fichiers nouveaux ou modifiés.
+
+Sortie: news-portal-user-interactions-by-globocom/clicks_npy/
+"""
+
+from datetime import datetime
+from multiprocessing import cpu_count
+
+from click_reader import CLICKS_DIR, build_click_cache, cache_dir_for
+
+N_WORKERS = max(2, cpu_count() // 2)
+
+
+def main():
+    """Fonction principale"""
+    print("=" * 80)
+    print("CONVERSION DES CLICS EN CACHE COLONNAIRE")
+    print("=" * 80)
+
+    start_time = datetime.now()
+    print(f"\nSource : {CLICKS_DIR}")
+    print(f"Cache  : {cache_dir_for(CLICKS_DIR)}")
+    print(f"Workers parallèles : {N_WORKERS}")
+
+    manifest = build_click_cache(CLICKS_DIR, n_jobs=N_WORKERS)
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    print(f"\n✓ {manifest['converted']} fichiers convertis, {len(manifest['partitions'])} partitions")
+    print(f"✓ {manifest['n_rows']:,} clics (triés par {', '.join(manifest['sort_columns'])})")
+    print(f"\n✅ Cache construit en {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
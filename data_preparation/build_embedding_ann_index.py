@@ -0,0 +1,191 @@
+"""
+Construction d'un index ANN (IVF, NumPy pur) sur les embeddings d'articles
+
+Partitionne les embeddings normalisés de embeddings_filtered.pkl en N_LISTS
+clusters (k-means sphérique). Au service, seuls les n_probe clusters les plus
+proches du profil utilisateur sont scorés exactement : n_probe est le compromis
+rappel/latence (n_probe = N_LISTS équivaut à la recherche exacte).
+
+Sorties (dans models/):
+- embeddings_ivf.npz : centroids, list_offsets, list_article_ids
+- embeddings_ivf_report.json : recall@K vs recherche exacte pour plusieurs n_probe
+"""
+
+import json
+import pickle
+import time
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+
+# Configuration des chemins
+BASE_DIR = Path(__file__).parent.parent
+MODELS_DIR = BASE_DIR / "models"
+
+KMEANS_ITERATIONS = 20
+KMEANS_SAMPLE_SIZE = 50000   # Articles utilisés pour entraîner les centroïdes
+BATCH_SIZE = 8192            # Taille des blocs pour l'assignation
+RANDOM_SEED = 42
+
+# Rapport de rappel
+REPORT_K = 50
+REPORT_N_QUERIES = 500
+REPORT_N_PROBES = [1, 2, 4, 8, 16, 32, 64]
+
+
+def load_normalized_embeddings():
+    """Charge embeddings_filtered.pkl et normalise les vecteurs (L2)"""
+    with open(MODELS_DIR / "embeddings_filtered.pkl", 'rb') as f:
+        embeddings = pickle.load(f)
+
+    article_ids = np.fromiter(embeddings.keys(), dtype=np.int64, count=len(embeddings))
+    matrix = np.ascontiguousarray(np.stack(list(embeddings.values())), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+
+    return article_ids, matrix / norms
+
+
+def assign_to_centroids(vectors, centroids):
+    """Retourne l'index du centroïde le plus proche (cosinus) pour chaque vecteur"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), BATCH_SIZE):
+        block = vectors[start:start + BATCH_SIZE] @ centroids.T
+        assignments[start:start + BATCH_SIZE] = block.argmax(axis=1)
+    return assignments
+
+
+def train_spherical_kmeans(vectors, n_lists: int, n_iterations: int = KMEANS_ITERATIONS):
+    """
+    K-means sphérique (centroïdes renormalisés à chaque itération)
+
+    Returns:
+        Centroïdes normalisés (n_lists × dim, float32)
+    """
+    rng = np.random.default_rng(RANDOM_SEED)
+    if len(vectors) > KMEANS_SAMPLE_SIZE:
+        vectors = vectors[rng.choice(len(vectors), KMEANS_SAMPLE_SIZE, replace=False)]
+
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+
+    for iteration in range(n_iterations):
+        assignments = assign_to_centroids(vectors, centroids)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_lists)
+
+        # Clusters vides: réinitialisés sur des points aléatoires
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+
+        print(f"    Itération {iteration + 1}/{n_iterations} - clusters vides: {int(empty.sum())}", end='\r')
+
+    print()
+    return centroids
+
+
+def build_ivf_index(article_ids, vectors, n_lists: int):
+    """
+    Construit les listes inversées
+
+    Returns:
+        (centroids, list_offsets, list_article_ids) — les articles du cluster c sont
+        list_article_ids[list_offsets[c]:list_offsets[c + 1]]
+    """
+    centroids = train_spherical_kmeans(vectors, n_lists)
+    assignments = assign_to_centroids(vectors, centroids)
+
+    order = np.argsort(assignments, kind='stable')
+    counts = np.bincount(assignments, minlength=n_lists)
+    list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    return centroids, list_offsets, article_ids[order]
+
+
+def ivf_search(query, vectors, row_of_list_entry, centroids, list_offsets, n_probe: int, k: int):
+    """Recherche approchée: scoring exact restreint aux n_probe clusters les plus proches"""
+    probes = np.argpartition(-(centroids @ query), min(n_probe, len(centroids)) - 1)[:n_probe]
+    rows = np.concatenate([row_of_list_entry[list_offsets[c]:list_offsets[c + 1]] for c in probes])
+    scores = vectors[rows] @ query
+    top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+    return rows[top]
+
+
+def recall_report(article_ids, vectors, centroids, list_offsets, list_article_ids):
+    """Recall@K et latence moyenne de l'index IVF vs recherche exacte"""
+    rng = np.random.default_rng(RANDOM_SEED)
+
+    # Requêtes type "profil utilisateur": moyenne de quelques articles, renormalisée
+    queries = np.stack([
+        vectors[rng.choice(len(vectors), rng.integers(1, 10), replace=False)].mean(axis=0)
+        for _ in range(REPORT_N_QUERIES)
+    ])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    row_by_article = np.argsort(article_ids)
+    row_of_list_entry = row_by_article[np.searchsorted(article_ids[row_by_article], list_article_ids)]
+
+    k = min(REPORT_K, len(vectors))
+    start = time.perf_counter()
+    exact = [set(np.argpartition(-(vectors @ q), k - 1)[:k]) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    report = {'k': k, 'n_queries': len(queries), 'exact_latency_ms': exact_ms, 'n_probe': {}}
+    for n_probe in REPORT_N_PROBES:
+        if n_probe > len(centroids):
+            break
+        start = time.perf_counter()
+        approx = [ivf_search(q, vectors, row_of_list_entry, centroids, list_offsets, n_probe, k) for q in queries]
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        recall = np.mean([len(exact[i].intersection(approx[i])) / k for i in range(len(queries))])
+        report['n_probe'][str(n_probe)] = {'recall': float(recall), 'latency_ms': latency_ms}
+        print(f"  n_probe={n_probe:3d}: recall@{k}={recall:.3f}, latence={latency_ms:.2f} ms "
+              f"(exact: {exact_ms:.2f} ms)")
+
+    return report
+
+
+def main():
+    """Fonction principale"""
+    print("=" * 80)
+    print("CONSTRUCTION DE L'INDEX ANN (IVF) DES EMBEDDINGS")
+    print("=" * 80)
+
+    start_time = datetime.now()
+
+    print("\n[1/4] Chargement des embeddings...")
+    article_ids, vectors = load_normalized_embeddings()
+    n_lists = max(1, int(4 * np.sqrt(len(vectors))))
+    print(f"  ✓ {len(vectors):,} articles, dimension {vectors.shape[1]} → {n_lists} clusters")
+
+    print("\n[2/4] Entraînement k-means sphérique...")
+    centroids, list_offsets, list_article_ids = build_ivf_index(article_ids, vectors, n_lists)
+    sizes = np.diff(list_offsets)
+    print(f"  ✓ Taille des clusters: min={sizes.min()}, médiane={int(np.median(sizes))}, max={sizes.max()}")
+
+    print("\n[3/4] Sauvegarde...")
+    output_path = MODELS_DIR / "embeddings_ivf.npz"
+    np.savez(output_path, centroids=centroids, list_offsets=list_offsets, list_article_ids=list_article_ids)
+    print(f"  ✓ {output_path}")
+
+    print("\n[4/4] Rapport de rappel vs recherche exacte...")
+    report = recall_report(article_ids, vectors, centroids, list_offsets, list_article_ids)
+    report['n_lists'] = n_lists
+    report['n_articles'] = int(len(vectors))
+    report['created_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with open(MODELS_DIR / "embeddings_ivf_report.json", 'w') as f:
+        json.dump(report, f, indent=2)
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    print(f"\n✅ Index construit en {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Construction de l'index de voisinage item-item (top-K) pour le collaborative filtering
+
+Calcule hors-ligne la similarité cosinus entre articles à partir de la matrice
+user-item pondérée, conserve les TOP_K voisins de chaque article et sauvegarde
+le résultat en CSR (models/item_neighbors.npz).
+
+Au service, le score collaboratif d'un utilisateur devient un simple produit
+creux ligne_utilisateur × index (coût ∝ historique × TOP_K), indépendant du
+nombre d'utilisateurs de la matrice.
+"""
+
+import os
+import json
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from scipy.sparse import load_npz, save_npz, csr_matrix, diags
+
+# Configuration des chemins
+BASE_DIR = Path(__file__).parent.parent
+MODELS_DIR = BASE_DIR / "models"
+
+TOP_K = 50          # Nombre de voisins conservés par article
+CHUNK_SIZE = 512    # Articles traités par bloc (bloc dense CHUNK_SIZE × n_articles)
+
+
+def load_user_item_matrix():
+    """Charge la matrice pondérée (ou la matrice counts en fallback)"""
+    weighted_path = MODELS_DIR / "user_item_matrix_weighted.npz"
+    if weighted_path.exists():
+        print(f"✓ Matrice pondérée : {weighted_path}")
+        return load_npz(weighted_path), 'weighted'
+
+    counts_path = MODELS_DIR / "user_item_matrix.npz"
+    print(f"⚠️  Matrice pondérée absente, utilisation de {counts_path}")
+    return load_npz(counts_path), 'counts'
+
+
+def build_item_neighbors(matrix, top_k: int = TOP_K, chunk_size: int = CHUNK_SIZE):
+    """
+    Calcule les top-K voisins cosinus de chaque article
+
+    Args:
+        matrix: Matrice sparse user × article
+        top_k: Nombre de voisins par article
+        chunk_size: Nombre d'articles par bloc de calcul
+
+    Returns:
+        csr_matrix (n_articles × n_articles, float32) avec au plus top_k
+        valeurs non nulles par ligne, diagonale exclue
+    """
+    matrix = csr_matrix(matrix, dtype=np.float32)
+    n_items = matrix.shape[1]
+
+    # Normalisation L2 des colonnes (articles) → produit scalaire = cosinus
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = (matrix @ diags(1.0 / norms).astype(np.float32)).tocsc()
+    item_user = normalized.T.tocsr()
+
+    k = min(top_k, n_items - 1)
+    rows, cols, vals = [], [], []
+
+    for start in range(0, n_items, chunk_size):
+        stop = min(start + chunk_size, n_items)
+        block = (item_user[start:stop] @ normalized).toarray()
+
+        # Exclure l'article lui-même
+        block[np.arange(stop - start), np.arange(start, stop)] = 0.0
+
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_vals = np.take_along_axis(block, top, axis=1)
+        keep = top_vals > 0
+
+        rows.append(np.repeat(np.arange(start, stop), k)[keep.ravel()])
+        cols.append(top[keep])
+        vals.append(top_vals[keep])
+
+        print(f"    Articles traités: {stop:,}/{n_items:,}", end='\r')
+
+    print()
+    neighbors = csr_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n_items, n_items),
+        dtype=np.float32
+    )
+    neighbors.sort_indices()
+    return neighbors
+
+
+def main():
+    """Fonction principale"""
+    print("=" * 80)
+    print("CONSTRUCTION DE L'INDEX ITEM-ITEM (TOP-K)")
+    print("=" * 80)
+
+    start_time = datetime.now()
+
+    print("\n[1/3] Chargement de la matrice user-item...")
+    matrix, source = load_user_item_matrix()
+    print(f"  Shape: {matrix.shape[0]:,} users × {matrix.shape[1]:,} articles, nnz={matrix.nnz:,}")
+
+    print(f"\n[2/3] Calcul des {TOP_K} voisins par article (blocs de {CHUNK_SIZE})...")
+    neighbors = build_item_neighbors(matrix)
+    print(f"  ✓ {neighbors.nnz:,} paires conservées "
+          f"({neighbors.nnz / max(neighbors.shape[0], 1):.1f} voisins/article en moyenne)")
+
+    print("\n[3/3] Sauvegarde...")
+    output_path = MODELS_DIR / "item_neighbors.npz"
+    save_npz(output_path, neighbors)
+    size_mb = os.path.getsize(output_path) / (1024**2)
+    print(f"  ✓ {output_path} ({size_mb:.1f} MB)")
+
+    stats = {
+        'source_matrix': source,
+        'top_k': TOP_K,
+        'num_articles': int(neighbors.shape[0]),
+        'num_pairs': int(neighbors.nnz),
+        'created_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(MODELS_DIR / "item_neighbors_stats.json", 'w') as f:
+        json.dump(stats, f, indent=2)
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    print(f"\n✅ Index construit en {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Packaging des modèles en un bundle binaire versionné (tableaux NumPy bruts + manifest)
+
+Convertit les artefacts de models/ (npz, pickles, CSV) en fichiers .npy chargeables
+en mémoire mappée par RecommendationEngine (voir model_bundle.py côté service):
+le démarrage à froid ne désérialise plus aucun pickle ni CSV.
+
+Sortie:
+    models/bundles/<version>/*.npy + manifest.json
+    models/bundles/LATEST (nom de la version active, écrit en dernier)
+"""
+
+import json
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from scipy.sparse import load_npz
+
+from build_user_embeddings import load_user_profiles, compute_user_embeddings
+
+# Configuration des chemins
+BASE_DIR = Path(__file__).parent.parent
+MODELS_DIR = BASE_DIR / "models"
+BUNDLES_DIR = MODELS_DIR / "bundles"
+
+BUNDLE_FORMAT = 1  # Doit correspondre à model_bundle.BUNDLE_FORMAT
+
+
+class BundleWriter:
+    """Écrit les tableaux d'un bundle et collecte le manifest"""
+
+    def __init__(self, bundle_dir: Path):
+        self.bundle_dir = bundle_dir
+        self.bundle_dir.mkdir(parents=True, exist_ok=False)
+        self.arrays = {}
+        self.matrices = {}
+
+    def add_array(self, name: str, array, dtype):
+        array = np.ascontiguousarray(array, dtype=dtype)
+        np.save(self.bundle_dir / f"{name}.npy", array)
+        self.arrays[name] = {'file': f"{name}.npy", 'dtype': str(array.dtype), 'shape': list(array.shape)}
+        print(f"  ✓ {name:32s} {str(array.dtype):8s} {array.shape} ({array.nbytes / 1024**2:.1f} MB)")
+
+    def open_array(self, name: str, shape, dtype):
+        """Tableau .npy ouvert en écriture (np.memmap) pour les sorties trop grosses pour la RAM"""
+        array = np.lib.format.open_memmap(self.bundle_dir / f"{name}.npy", mode='w+', dtype=dtype,
+                                          shape=tuple(shape))
+        self.arrays[name] = {'file': f"{name}.npy", 'dtype': str(array.dtype), 'shape': list(array.shape)}
+        return array
+
+    def add_csr(self, name: str, matrix):
+        """
+        Matrice CSR en trois tableaux (dtype des données conservé)
+
+        Les index restent en int32 tant que nnz le permet: scipy ne convertit
+        alors pas les tableaux mappés au chargement (aucune copie).
+        """
+        matrix = matrix.tocsr()
+        matrix.sort_indices()
+        index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+        self.add_array(f"{name}_indptr", matrix.indptr, index_dtype)
+        self.add_array(f"{name}_indices", matrix.indices, index_dtype)
+        self.add_array(f"{name}_data", matrix.data, matrix.data.dtype)
+        self.matrices[name] = {'shape': list(matrix.shape)}
+
+    def add_id_index(self, name: str, ids):
+        """Tableau position -> id, plus sa version triée pour les recherches id -> position"""
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        self.add_array(name, ids, np.int64)
+        self.add_array(f"{name}_sorted", ids[order], np.int64)
+        self.add_array(f"{name}_sorted_idx", order, np.int64)
+
+    def finalize(self, version: str, source: str):
+        manifest = {
+            'format': BUNDLE_FORMAT,
+            'version': version,
+            'created_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'source': source,
+            'arrays': self.arrays,
+            'matrices': self.matrices
+        }
+        with open(self.bundle_dir / "manifest.json", 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+def encode_profiles(profiles):
+    """Encode les profils en CSR: offsets + article_ids + poids (NaN si absent)"""
+    user_ids = np.array(sorted(profiles.keys()), dtype=np.int64)
+    offsets = np.zeros(len(user_ids) + 1, dtype=np.int64)
+    article_ids, weights = [], []
+
+    for i, user_id in enumerate(user_ids.tolist()):
+        profile = profiles[user_id]
+        articles = [int(a) for a in profile['articles_read']]
+        article_weights = {int(k): float(v) for k, v in profile.get('article_weights', {}).items()}
+        article_ids.extend(articles)
+        weights.extend(article_weights.get(a, np.nan) for a in articles)
+        offsets[i + 1] = offsets[i] + len(articles)
+
+    return user_ids, offsets, np.array(article_ids, dtype=np.int64), np.array(weights, dtype=np.float32)
+
+
+def build_bundle(models_dir: Path = MODELS_DIR, bundles_dir: Path = BUNDLES_DIR, version: str = None):
+    """
+    Construit un bundle à partir des artefacts de models_dir
+
+    Returns:
+        Le manifest du bundle écrit
+    """
+    version = version or datetime.now().strftime('v%Y%m%d_%H%M%S')
+    writer = BundleWriter(bundles_dir / version)
+
+    print("\n[1/6] Matrices user-item...")
+    user_item = load_npz(models_dir / "user_item_matrix.npz")
+    writer.add_csr("user_item", user_item)
+    weighted = None
+    if (models_dir / "user_item_matrix_weighted.npz").exists():
+        weighted = load_npz(models_dir / "user_item_matrix_weighted.npz")
+        writer.add_csr("user_item_weighted", weighted)
+    if (models_dir / "item_neighbors.npz").exists():
+        writer.add_csr("item_neighbors", load_npz(models_dir / "item_neighbors.npz"))
+
+    print("\n[2/6] Mappings et popularité...")
+    with open(models_dir / "mappings.pkl", 'rb') as f:
+        mappings = pickle.load(f)
+    writer.add_id_index("user_ids", [mappings['idx_to_user'][i] for i in range(len(mappings['idx_to_user']))])
+    writer.add_id_index("article_ids", [mappings['idx_to_article'][i] for i in range(len(mappings['idx_to_article']))])
+
+    with open(models_dir / "article_popularity.pkl", 'rb') as f:
+        popularity = pickle.load(f)
+    if isinstance(popularity, dict):
+        writer.add_array("popularity_article_ids", list(popularity.keys()), np.int64)
+        writer.add_array("popularity_scores", list(popularity.values()), np.float64)
+    else:
+        writer.add_array("popularity_article_ids", popularity.index.values, np.int64)
+        writer.add_array("popularity_scores", popularity['popularity_score'].values, np.float64)
+
+    print("\n[3/6] Profils utilisateurs (CSR)...")
+    profiles = load_user_profiles(models_dir)
+    user_ids, offsets, article_ids, weights = encode_profiles(profiles)
+    writer.add_id_index("profile_user_ids", user_ids)
+    writer.add_array("profile_offsets", offsets, np.int64)
+    writer.add_array("profile_article_ids", article_ids, np.int64)
+    writer.add_array("profile_weights", weights, np.float32)
+
+    print("\n[4/6] Embeddings...")
+    with open(models_dir / "embeddings_filtered.pkl", 'rb') as f:
+        embeddings = pickle.load(f)
+    embedding_ids = np.fromiter(embeddings.keys(), dtype=np.int64, count=len(embeddings))
+    matrix = np.stack(list(embeddings.values())).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1)
+    safe_norms = np.where(norms == 0, 1.0, norms)[:, None]
+    writer.add_id_index("embedding_article_ids", embedding_ids)
+    writer.add_array("embedding_matrix", matrix / safe_norms, np.float32)
+    writer.add_array("embedding_norms", norms, np.float32)
+
+    if (models_dir / "embeddings_ivf.npz").exists():
+        ivf = np.load(models_dir / "embeddings_ivf.npz")
+        order = np.argsort(embedding_ids, kind='stable')
+        rows = order[np.searchsorted(embedding_ids[order], ivf['list_article_ids'])]
+        writer.add_array("ivf_centroids", ivf['centroids'], np.float32)
+        writer.add_array("ivf_list_offsets", ivf['list_offsets'], np.int64)
+        writer.add_array("ivf_list_rows", rows, np.int64)
+
+    if weighted is not None:
+        # Embeddings de profil recalculés à partir des profils du bundle (toujours cohérents)
+        print("\n  Embeddings de profil utilisateur...")
+        out = writer.open_array("user_embeddings", (weighted.shape[0], matrix.shape[1]), np.float32)
+        compute_user_embeddings(weighted, mappings['user_to_idx'], mappings['article_to_idx'],
+                                profiles, embeddings, out=out)
+        out.flush()
+        print(f"  ✓ user_embeddings {out.shape} ({out.nbytes / 1024**2:.1f} MB)")
+        del out
+
+    print("\n[5/6] Métadonnées articles...")
+    metadata = pd.read_csv(models_dir / "articles_metadata.csv")
+    writer.add_array("metadata_article_ids", metadata['article_id'].values, np.int64)
+    writer.add_array("metadata_category_id", metadata['category_id'].values, np.int32)
+    writer.add_array("metadata_publisher_id", metadata['publisher_id'].values, np.int32)
+    writer.add_array("metadata_words_count", metadata['words_count'].values, np.int32)
+    writer.add_array("metadata_created_at_ts", metadata['created_at_ts'].values, np.int64)
+
+    print("\n[6/6] Manifest...")
+    manifest = writer.finalize(version, str(models_dir))
+
+    # LATEST écrit en dernier (remplacement atomique): un lecteur ne voit jamais un bundle incomplet
+    latest_tmp = bundles_dir / "LATEST.tmp"
+    with open(latest_tmp, 'w') as f:
+        f.write(version)
+    os.replace(latest_tmp, bundles_dir / "LATEST")
+
+    return manifest
+
+
+def main():
+    """Fonction principale"""
+    print("=" * 80)
+    print("PACKAGING DU BUNDLE BINAIRE DES MODÈLES")
+    print("=" * 80)
+
+    start_time = datetime.now()
+    manifest = build_bundle()
+
+    bundle_dir = BUNDLES_DIR / manifest['version']
+    total_size = sum(os.path.getsize(bundle_dir / f) for f in os.listdir(bundle_dir)) / (1024**2)
+    elapsed = (datetime.now() - start_time).total_seconds()
+
+    print(f"\n✅ Bundle {manifest['version']} créé en {elapsed:.1f}s ({total_size:.1f} MB)")
+    print(f"📁 {bundle_dir}")
+
+
+if __name__ == "__main__":
+    main()
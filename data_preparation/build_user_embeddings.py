@@ -0,0 +1,169 @@
+"""
+Pré-calcul des embeddings de profil utilisateur (float32, alignés sur user_to_idx)
+
+Pour chaque utilisateur de la matrice pondérée: moyenne des embeddings bruts des
+articles lus, pondérée par interaction_weight (× nombre de lectures), normalisée L2.
+C'est exactement la requête que RecommendationEngine._content_profile calculait
+à chaque appel: au service elle devient une simple lecture de ligne.
+
+Une ligne nulle signifie "aucun article lu avec embedding exploitable".
+
+Sorties (dans models/):
+- user_embeddings.npy : n_users × dim, float32 (ligne = user_idx)
+- user_embeddings.json : profils utilisés, dimensions, date (vérifié par le moteur)
+"""
+
+import json
+import pickle
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from scipy.sparse import csr_matrix, load_npz
+
+# Configuration des chemins
+BASE_DIR = Path(__file__).parent.parent
+MODELS_DIR = BASE_DIR / "models"
+
+# Même priorité que RecommendationEngine._load_legacy_profiles (Azure)
+PROFILE_FILES = ("user_profiles_enriched.pkl", "user_profiles_enriched.json", "user_profiles.json")
+CHUNK_SIZE = 8192  # Utilisateurs par produit matrice creuse × embeddings
+
+
+def load_user_profiles(models_dir: Path, return_source: bool = False):
+    """
+    Profils enrichis (pkl > json) ou basiques, comme RecommendationEngine.load_models
+
+    Returns:
+        profils {user_id: profil}, ou (profils, nom du fichier) si return_source
+    """
+    for filename in PROFILE_FILES:
+        path = models_dir / filename
+        if not path.exists():
+            continue
+        if filename.endswith('.pkl'):
+            with open(path, 'rb') as f:
+                profiles = pickle.load(f)
+        else:
+            with open(path, 'r') as f:
+                profiles = json.load(f)
+        print(f"  Profils: {filename}")
+        profiles = {int(k): v for k, v in profiles.items()}
+        return (profiles, filename) if return_source else profiles
+    raise FileNotFoundError(f"Aucun fichier de profils dans {models_dir}")
+
+
+def history_count_matrix(profiles, user_to_idx, article_to_idx, shape) -> csr_matrix:
+    """Nombre de lectures de chaque article par utilisateur (CSR users × articles)"""
+    user_rows, article_cols = [], []
+    for user_id, profile in profiles.items():
+        user_idx = user_to_idx.get(user_id)
+        if user_idx is None:
+            continue
+        for article_id in profile['articles_read']:
+            article_idx = article_to_idx.get(int(article_id))
+            if article_idx is not None:
+                user_rows.append(user_idx)
+                article_cols.append(article_idx)
+
+    # Les doublons (user, article) sont additionnés: un article relu compte autant de fois
+    return csr_matrix((np.ones(len(user_rows), dtype=np.float32), (user_rows, article_cols)),
+                      shape=shape, dtype=np.float32)
+
+
+def compute_user_embeddings(weighted_matrix, user_to_idx, article_to_idx, profiles, embeddings, out=None):
+    """
+    Embeddings de profil de tous les utilisateurs de la matrice pondérée
+
+    Args:
+        weighted_matrix: Matrice users × articles des interaction_weight
+        user_to_idx, article_to_idx: Mappings id -> index de la matrice
+        profiles: {user_id: profil} (historiques articles_read)
+        embeddings: {article_id: embedding brut}
+        out: Tableau de sortie (n_users × dim, ex: np.memmap), alloué si None
+
+    Returns:
+        Tableau float32 n_users × dim, lignes normalisées L2 (nulles si aucun embedding)
+    """
+    weighted_matrix = weighted_matrix.tocsr()
+    n_users, n_articles = weighted_matrix.shape
+    dim = len(next(iter(embeddings.values())))
+
+    # Embeddings bruts alignés sur article_idx (zéro si l'article n'a pas d'embedding)
+    article_embeddings = np.zeros((n_articles, dim), dtype=np.float32)
+    for article_id, vector in embeddings.items():
+        article_idx = article_to_idx.get(int(article_id))
+        if article_idx is not None:
+            article_embeddings[article_idx] = vector
+
+    # Poids = interaction_weight × nombre de lectures, seuls les poids positifs comptent
+    weights = history_count_matrix(profiles, user_to_idx, article_to_idx, weighted_matrix.shape)
+    weights = weights.multiply(weighted_matrix).tocsr()
+    weights.data[weights.data < 0] = 0.0
+    weights.eliminate_zeros()
+
+    if out is None:
+        out = np.empty((n_users, dim), dtype=np.float32)
+    for start in range(0, n_users, CHUNK_SIZE):
+        block = np.asarray(weights[start:start + CHUNK_SIZE] @ article_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        out[start:start + CHUNK_SIZE] = block / np.where(norms == 0, 1.0, norms)
+        print(f"    {min(start + CHUNK_SIZE, n_users):,}/{n_users:,} utilisateurs", end='\r')
+    print()
+
+    return out
+
+
+def build_user_embeddings(models_dir: Path = MODELS_DIR, weighted_matrix=None):
+    """
+    Calcule et sauvegarde user_embeddings.npy (+ user_embeddings.json) dans models_dir
+
+    Args:
+        weighted_matrix: Matrice pondérée déjà en mémoire (rechargée depuis le npz si None)
+    """
+    if weighted_matrix is None:
+        weighted_matrix = load_npz(models_dir / "user_item_matrix_weighted.npz")
+    with open(models_dir / "mappings.pkl", 'rb') as f:
+        mappings = pickle.load(f)
+    with open(models_dir / "embeddings_filtered.pkl", 'rb') as f:
+        embeddings = pickle.load(f)
+    profiles, profiles_file = load_user_profiles(models_dir, return_source=True)
+
+    n_users = weighted_matrix.shape[0]
+    dim = len(next(iter(embeddings.values())))
+    output_path = models_dir / "user_embeddings.npy"
+    out = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32, shape=(n_users, dim))
+    compute_user_embeddings(weighted_matrix, mappings['user_to_idx'], mappings['article_to_idx'],
+                            profiles, embeddings, out=out)
+    n_empty = int((~out.any(axis=1)).sum())
+    out.flush()
+    del out
+
+    meta = {
+        'profiles_file': profiles_file,
+        'n_users': int(n_users),
+        'dim': int(dim),
+        'n_empty': n_empty,
+        'created_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(models_dir / "user_embeddings.json", 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"  ✓ {output_path} ({n_users:,} × {dim}, {n_empty:,} profils sans embedding)")
+    return meta
+
+
+def main():
+    """Fonction principale"""
+    print("=" * 80)
+    print("PRÉ-CALCUL DES EMBEDDINGS DE PROFIL UTILISATEUR")
+    print("=" * 80)
+
+    start_time = datetime.now()
+    build_user_embeddings()
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    print(f"\n✅ Embeddings utilisateurs calculés en {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
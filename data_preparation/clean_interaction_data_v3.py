@@ -7,6 +7,12 @@ Règles de nettoyage:
 2. Si changement de session → ancien article reçoit 0 temps (nouvelle session = ancien article abandonné)
 3. Sinon → plafonner à 1× le temps théorique de lecture (200 mots/min)
 
+Le clic suivant est cherché sur l'ensemble des fichiers horaires (pas seulement
+dans le fichier du clic): le dernier clic de chaque utilisateur est reporté sur
+le fichier suivant. Les utilisateurs sont répartis en partitions (user_id % N)
+nettoyées en parallèle: chaque worker lit les fichiers par chunks et ne garde que
+ses utilisateurs, sans jamais charger tous les clics en mémoire.
+
 Exemples de clics accidentels:
 - Clic par erreur → ferme immédiatement (< 10 sec)
 - Titre trompeur → retour arrière rapide
@@ -18,121 +24,201 @@ import numpy as np
 from pathlib import Path
 import json
 from tqdm import tqdm
+from multiprocessing import Pool, cpu_count
 
-def clean_interaction_data_v3():
-    """
-    Nettoie les données en gérant les clics accidentels, sessions ET plafonnement
-    """
+from click_reader import CLICK_COLUMNS_CORE, cache_dir_for, iter_click_chunks, list_click_files, load_cache_manifest
 
-    print("=" * 80)
-    print("NETTOYAGE DES DONNÉES D'INTERACTION - VERSION 3")
-    print("Détecte les clics accidentels + gère les sessions + plafonnement")
-    print("=" * 80)
+ACCIDENTAL_THRESHOLD = 10  # 10 secondes
+READING_SPEED_WPM = 200    # 200 mots/min
 
-    base_dir = Path(__file__).parent.parent
-    models_dir = base_dir / "models"
-    raw_data_dir = base_dir / "news-portal-user-interactions-by-globocom"
+# Partitions d'utilisateurs (user_id % N_PARTITIONS) nettoyées en parallèle
+N_WORKERS = max(2, cpu_count() // 2)
+CLEANING_REASONS = ['accidental_click', 'session_change', 'capped', 'normal']
 
-    # 1. Charger les métadonnées d'articles
-    print("\n1. Chargement des métadonnées...")
-    articles = pd.read_csv(models_dir / "articles_metadata.csv")
-    articles['expected_time_minutes'] = articles['words_count'] / 200  # 200 mots/min
-    print(f"   - {len(articles):,} articles chargés")
 
-    # 2. Traiter tous les fichiers de clics
-    print("\n2. Traitement des fichiers de clics...")
-    click_files = sorted((raw_data_dir / "clicks").glob("clicks_hour_*.csv"))
-    print(f"   - {len(click_files)} fichiers à traiter")
+def file_min_timestamp(click_file):
+    """Timestamp minimum d'un fichier de clics (seule la colonne click_timestamp est lue)"""
+    minima = [chunk['click_timestamp'].min()
+              for chunk in iter_click_chunks(columns=['click_timestamp'], files=[click_file])]
+    return pd.Series(minima, dtype=np.float64).min()  # NaN si fichier vide
 
-    all_interactions = []
-    total_clicks = 0
-    stats = {
-        'accidental_clicks': 0,  # Clics accidentels (< 10 sec)
-        'session_changes': 0,    # Changements de session (temps = 0)
-        'time_capped': 0,         # Temps plafonnés
-        'normal_time': 0          # Temps normaux (< théorique)
-    }
 
-    ACCIDENTAL_THRESHOLD = 10  # 10 secondes
+def read_partition_clicks(click_file, partition, n_partitions):
+    """Clics d'un fichier appartenant à une partition d'utilisateurs, dans l'ordre du fichier"""
+    parts = [chunk[(chunk['user_id'].to_numpy() % n_partitions) == partition]
+             for chunk in iter_click_chunks(columns=CLICK_COLUMNS_CORE, files=[click_file])]
+    if not parts:
+        return pd.DataFrame(columns=CLICK_COLUMNS_CORE)
+    return pd.concat(parts, ignore_index=True)
+
+
+def file_watermarks(min_timestamps):
+    """
+    Borne inférieure des timestamps des fichiers suivants, pour chaque fichier
+
+    Après le fichier i, aucun clic à venir n'est antérieur à watermarks[i]: un clic
+    dont le suivant (même utilisateur) est <= watermarks[i] a son suivant définitif.
+
+    Args:
+        min_timestamps: Timestamp minimum de chaque fichier, dans l'ordre des fichiers
+    """
+    min_timestamps = np.asarray(min_timestamps, dtype=np.float64)
+    # Minimum des fichiers STRICTEMENT suivants (+inf après le dernier)
+    suffix_min = np.minimum.accumulate(min_timestamps[::-1])[::-1]
+    return np.append(suffix_min[1:], np.inf)
 
-    for click_file in tqdm(click_files, desc="Traitement"):
-        # Charger le fichier
-        clicks = pd.read_csv(click_file)
-        total_clicks += len(clicks)
 
-        # Merger avec les métadonnées
-        clicks = clicks.merge(
-            articles[['article_id', 'words_count', 'expected_time_minutes']],
-            left_on='click_article_id',
-            right_on='article_id',
-            how='left'
-        )
+def apply_cleaning_rules(clicks, words_by_article):
+    """
+    Applique les 3 règles aux clics dont le clic suivant est connu
 
-        # Trier par utilisateur et timestamp
-        clicks = clicks.sort_values(['user_id', 'click_timestamp'])
+    Args:
+        clicks: Clics triés (user_id, click_timestamp) avec next_timestamp / next_session
+        words_by_article: words_count indexé par article_id (NaN si inconnu)
 
-        # Calculer les infos du prochain clic
-        clicks['next_timestamp'] = clicks.groupby('user_id')['click_timestamp'].shift(-1)
-        clicks['next_session'] = clicks.groupby('user_id')['session_id'].shift(-1)
+    Returns:
+        Interactions avec temps (time_spent_cleaned, cleaning_reason)
+    """
+    article_ids = clicks['click_article_id'].to_numpy()
+    in_range = article_ids < len(words_by_article)
+    words_count = np.full(len(clicks), np.nan)
+    words_count[in_range] = words_by_article[article_ids[in_range]]
+    expected_time_seconds = words_count / READING_SPEED_WPM * 60
+
+    time_between_clicks = (clicks['next_timestamp'] - clicks['click_timestamp']).to_numpy(dtype=np.float64)
+    session_change = (clicks['session_id'] != clicks['next_session']).to_numpy()
+
+    # Masque pour les lignes valides (suivant connu, article avec métadonnées)
+    valid = ~np.isnan(time_between_clicks) & ~np.isnan(expected_time_seconds)
+
+    # Règle 1: clic accidentel; règle 2: changement de session; règle 3: plafonnement
+    accidental = valid & (time_between_clicks < ACCIDENTAL_THRESHOLD)
+    session_changed = valid & ~accidental & session_change
+    same_session = valid & ~accidental & ~session_changed
+    capped = same_session & (time_between_clicks > expected_time_seconds)
+    normal = same_session & ~capped
+
+    reason = np.select([accidental, session_changed, capped, normal], CLEANING_REASONS, default='no_next')
+    time_spent = np.select([accidental | session_changed, capped, normal],
+                           [0.0, expected_time_seconds, time_between_clicks], default=np.nan)
+
+    interactions = pd.DataFrame({
+        'user_id': clicks['user_id'].to_numpy(),
+        'article_id': article_ids,
+        'click_timestamp': clicks['click_timestamp'].to_numpy(),
+        'time_spent_cleaned': time_spent,
+        'session_id': clicks['session_id'].to_numpy(),
+        'words_count': words_count,
+        'cleaning_reason': reason
+    })
+    return interactions[valid]
+
+
+def clean_partition(args):
+    """
+    Nettoie les clics d'une partition d'utilisateurs en parcourant les fichiers dans l'ordre
 
-        # Calculer le temps brut entre clics (en secondes)
-        clicks['time_between_clicks'] = (clicks['next_timestamp'] - clicks['click_timestamp'])
+    Args:
+        args: (fichiers de clics, watermarks, words_by_article, partition, nombre de partitions)
 
-        # Calculer le temps théorique maximum
-        clicks['expected_time_seconds'] = clicks['expected_time_minutes'] * 60
+    Seuls les clics de la partition d'un fichier (lu par chunks) et les clics en
+    attente sont en mémoire: chaque worker relit tous les fichiers, mais aucun n'est
+    chargé en entier ni transmis entre processus.
 
-        # Appliquer les règles de nettoyage (approche vectorisée)
+    Le dernier clic de chaque utilisateur (et tout clic dont le suivant pourrait
+    encore arriver dans un fichier ultérieur) reste en attente et est rejoué avec le
+    fichier suivant: les sessions à cheval sur deux fichiers horaires sont correctes.
 
-        # Initialiser les colonnes
-        clicks['time_spent_cleaned'] = np.nan
-        clicks['cleaning_reason'] = 'no_next'
+    Returns:
+        (interactions avec temps, nombre de clics de la partition)
+    """
+    click_files, watermarks, words_by_article, partition, n_partitions = args
 
-        # Masque pour les lignes valides (pas dernier clic)
-        valid_mask = clicks['time_between_clicks'].notna() & clicks['expected_time_seconds'].notna()
+    pending = None
+    resolved = []
+    total_clicks = 0
+    for click_file, watermark in zip(click_files, watermarks):
+        clicks = read_partition_clicks(click_file, partition, n_partitions)
+        total_clicks += len(clicks)
+        if pending is not None:
+            clicks = pd.concat([pending, clicks], ignore_index=True)
 
-        # Règle 1: Clic accidentel (temps < 10 secondes) → temps = 0
-        accidental_mask = valid_mask & (clicks['time_between_clicks'] < ACCIDENTAL_THRESHOLD)
-        clicks.loc[accidental_mask, 'time_spent_cleaned'] = 0.0
-        clicks.loc[accidental_mask, 'cleaning_reason'] = 'accidental_click'
+        # Trier par utilisateur et timestamp (stable: à égalité, l'ordre des fichiers est conservé)
+        clicks = clicks.sort_values(['user_id', 'click_timestamp'], kind='stable', ignore_index=True)
+        by_user = clicks.groupby('user_id', sort=False)
+        clicks['next_timestamp'] = by_user['click_timestamp'].shift(-1)
+        clicks['next_session'] = by_user['session_id'].shift(-1)
 
-        # Règle 2: Changement de session (ET pas accidentel) → temps = 0
-        session_change_mask = valid_mask & ~accidental_mask & clicks['next_session'].notna() & (clicks['session_id'] != clicks['next_session'])
-        clicks.loc[session_change_mask, 'time_spent_cleaned'] = 0.0
-        clicks.loc[session_change_mask, 'cleaning_reason'] = 'session_change'
+        final = (clicks['next_timestamp'] <= watermark).to_numpy()
+        resolved.append(apply_cleaning_rules(clicks[final], words_by_article))
+        pending = clicks.loc[~final, CLICK_COLUMNS_CORE]
 
-        # Règle 3: Même session ET pas accidentel → plafonner au temps théorique
-        same_session_mask = valid_mask & ~accidental_mask & ~session_change_mask
+    # Les clics encore en attente n'ont pas de suivant ('no_next'): pas de temps mesurable
+    if not resolved:
+        return apply_cleaning_rules(pd.DataFrame(columns=CLICK_COLUMNS_CORE + ['next_timestamp', 'next_session']),
+                                    words_by_article), total_clicks
+    return pd.concat(resolved, ignore_index=True), total_clicks
 
-        # Comparer temps observé vs temps max
-        time_ok_mask = same_session_mask & (clicks['time_between_clicks'] <= clicks['expected_time_seconds'])
-        time_excessive_mask = same_session_mask & (clicks['time_between_clicks'] > clicks['expected_time_seconds'])
 
-        # Appliquer
-        clicks.loc[time_ok_mask, 'time_spent_cleaned'] = clicks.loc[time_ok_mask, 'time_between_clicks']
-        clicks.loc[time_ok_mask, 'cleaning_reason'] = 'normal'
+def clean_interaction_data_v3():
+    """
+    Nettoie les données en gérant les clics accidentels, sessions ET plafonnement
+    """
+
+    print("=" * 80)
+    print("NETTOYAGE DES DONNÉES D'INTERACTION - VERSION 3")
+    print("Détecte les clics accidentels + gère les sessions + plafonnement")
+    print("=" * 80)
 
-        clicks.loc[time_excessive_mask, 'time_spent_cleaned'] = clicks.loc[time_excessive_mask, 'expected_time_seconds']
-        clicks.loc[time_excessive_mask, 'cleaning_reason'] = 'capped'
+    base_dir = Path(__file__).parent.parent
+    models_dir = base_dir / "models"
+    raw_data_dir = base_dir / "news-portal-user-interactions-by-globocom"
 
-        # Compter les statistiques
-        stats['accidental_clicks'] += (clicks['cleaning_reason'] == 'accidental_click').sum()
-        stats['session_changes'] += (clicks['cleaning_reason'] == 'session_change').sum()
-        stats['time_capped'] += (clicks['cleaning_reason'] == 'capped').sum()
-        stats['normal_time'] += (clicks['cleaning_reason'] == 'normal').sum()
+    # 1. Charger les métadonnées d'articles
+    print("\n1. Chargement des métadonnées...")
+    articles = pd.read_csv(models_dir / "articles_metadata.csv")
+    words_by_article = np.full(articles['article_id'].max() + 1, np.nan)
+    words_by_article[articles['article_id'].to_numpy()] = articles['words_count'].to_numpy()
+    print(f"   - {len(articles):,} articles chargés")
 
-        # Garder uniquement les colonnes utiles
-        interactions = clicks[clicks['time_spent_cleaned'].notna()][[
-            'user_id', 'click_article_id', 'click_timestamp', 'time_spent_cleaned',
-            'session_id', 'words_count', 'cleaning_reason'
-        ]].copy()
+    # 2. Traiter tous les fichiers de clics
+    print("\n2. Traitement des fichiers de clics...")
+    click_files = list_click_files(raw_data_dir / "clicks")
+    print(f"   - {len(click_files)} fichiers à traiter")
 
-        interactions.rename(columns={'click_article_id': 'article_id'}, inplace=True)
+    # Cache colonnaire utilisé s'il existe déjà (build_click_cache.py), jamais construit ici
+    cache_manifest = load_cache_manifest(cache_dir_for(raw_data_dir / "clicks"))
+    print(f"   - Cache colonnaire: {'oui' if cache_manifest else 'non (lecture des CSV)'}")
+    print(f"   - {N_WORKERS} partitions d'utilisateurs en parallèle")
 
-        all_interactions.append(interactions)
+    all_interactions = []
+    total_clicks = 0
+    with Pool(N_WORKERS) as pool:
+        # Premier passage léger (colonne click_timestamp seule) pour les watermarks
+        min_timestamps = list(tqdm(pool.imap(file_min_timestamp, click_files),
+                                   total=len(click_files), desc="Watermarks"))
+        watermarks = file_watermarks(min_timestamps)
+
+        # Chaque partition lit elle-même ses clics: rien n'est accumulé ici ni sérialisé vers les workers
+        tasks = [(click_files, watermarks, words_by_article, partition, N_WORKERS)
+                 for partition in range(N_WORKERS)]
+        for interactions, n_clicks in tqdm(pool.imap_unordered(clean_partition, tasks),
+                                           total=len(tasks), desc="Traitement"):
+            all_interactions.append(interactions)
+            total_clicks += n_clicks
 
     # 3. Consolider toutes les interactions
     print("\n3. Consolidation des interactions...")
     interactions_df = pd.concat(all_interactions, ignore_index=True)
+    interactions_df = interactions_df.sort_values(['user_id', 'click_timestamp'], kind='stable', ignore_index=True)
+
+    reason_counts = interactions_df['cleaning_reason'].value_counts()
+    stats = {
+        'accidental_clicks': int(reason_counts.get('accidental_click', 0)),  # Clics accidentels (< 10 sec)
+        'session_changes': int(reason_counts.get('session_change', 0)),      # Changements de session (temps = 0)
+        'time_capped': int(reason_counts.get('capped', 0)),                  # Temps plafonnés
+        'normal_time': int(reason_counts.get('normal', 0))                   # Temps normaux (< théorique)
+    }
 
     total_with_time = len(interactions_df)
 
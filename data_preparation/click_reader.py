@@ -0,0 +1,279 @@
+"""
+Lecture en flux des fichiers de clics Globo.com (clicks_hour_*.csv)
+
+Point d'entrée unique pour tous les scripts de préparation et d'évaluation:
+- dtypes compacts explicites (ids int32, codes catégoriels int8, timestamps int64):
+  ~35 octets par clic au lieu de ~100 avec les int64 par défaut de pandas
+- sélection des colonnes à la lecture (les colonnes inutiles ne sont jamais parsées)
+- interface générateur: la mémoire de pointe est bornée par la taille d'un chunk
+- cache colonnaire optionnel (build_click_cache.py): une partition de colonnes .npy
+  par fichier horaire, lue à la place du CSV quand elle est à jour
+
+Cache (à côté du dossier des CSV):
+    clicks_npy/manifest.json               colonnes, dtypes, partitions (taille/mtime du CSV source)
+    clicks_npy/clicks_hour_000/user_id.npy  une colonne, lignes triées par user/session/timestamp
+
+Usage:
+    from click_reader import iter_click_chunks, load_clicks
+
+    for chunk in iter_click_chunks(columns=['user_id', 'click_article_id']):
+        ...  # agrégation incrémentale (chunks de DEFAULT_CHUNK_ROWS lignes au plus)
+
+    df_clicks = load_clicks(columns=CLICK_COLUMNS_CORE)  # tout en mémoire (dtypes compacts)
+"""
+
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence
+
+# Configuration des chemins
+BASE_DIR = Path(__file__).parent.parent
+DATA_DIR = BASE_DIR / "news-portal-user-interactions-by-globocom"
+CLICKS_DIR = DATA_DIR / "clicks"
+
+CLICK_FILE_PATTERN = "clicks_hour_*.csv"
+
+# Lignes max par chunk de iter_click_chunks (~3.5 Mo avec toutes les colonnes compactes)
+DEFAULT_CHUNK_ROWS = 100_000
+
+CACHE_SUFFIX = "_npy"
+CACHE_MANIFEST = "manifest.json"
+CACHE_SORT_COLUMNS = ['user_id', 'session_id', 'click_timestamp']
+
+# session_id / timestamps (ms epoch) dépassent int32; les codes catégoriels tiennent sur int8
+CLICK_DTYPES = {
+    'user_id': np.int32,
+    'session_id': np.int64,
+    'session_start': np.int64,
+    'session_size': np.int16,
+    'click_article_id': np.int32,
+    'click_timestamp': np.int64,
+    'click_environment': np.int8,
+    'click_deviceGroup': np.int8,
+    'click_os': np.int8,
+    'click_country': np.int8,
+    'click_region': np.int8,
+    'click_referrer_type': np.int8
+}
+
+# Sous-ensemble utilisé par la plupart des scripts (matrices, profils, popularité)
+CLICK_COLUMNS_CORE = ['user_id', 'session_id', 'click_article_id', 'click_timestamp']
+
+# Colonnes des 9 signaux de poids (compute_weights_*, update_profiles_incremental)
+CLICK_COLUMNS_SIGNALS = CLICK_COLUMNS_CORE + [
+    'session_size', 'click_environment', 'click_deviceGroup', 'click_os',
+    'click_country', 'click_region', 'click_referrer_type'
+]
+
+_CACHE_DTYPES = {name: np.dtype(dtype).name for name, dtype in CLICK_DTYPES.items()}
+
+
+def list_click_files(clicks_dir=CLICKS_DIR, limit: Optional[int] = None) -> List[Path]:
+    """Fichiers horaires triés (ordre chronologique), les `limit` premiers si précisé"""
+    files = sorted(Path(clicks_dir).glob(CLICK_FILE_PATTERN))
+    return files[:limit] if limit is not None else files
+
+
+def _dtypes(columns: Optional[Sequence[str]]):
+    names = CLICK_DTYPES.keys() if columns is None else columns
+    return {name: CLICK_DTYPES[name] for name in names if name in CLICK_DTYPES}
+
+
+def cache_dir_for(clicks_dir) -> Path:
+    """Dossier du cache colonnaire associé à un dossier de CSV (clicks -> clicks_npy)"""
+    clicks_dir = Path(clicks_dir)
+    return clicks_dir.with_name(clicks_dir.name + CACHE_SUFFIX)
+
+
+@lru_cache(maxsize=8)
+def _read_manifest(path: str, mtime_ns: int) -> Dict:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def load_cache_manifest(cache_dir) -> Optional[Dict]:
+    """Manifest du cache (relu seulement s'il a changé), None si pas de cache"""
+    path = Path(cache_dir) / CACHE_MANIFEST
+    if not path.exists():
+        return None
+    return _read_manifest(str(path), path.stat().st_mtime_ns)
+
+
+def _source_signature(path: Path) -> Dict:
+    stat = path.stat()
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def cached_partition(path) -> Optional[Path]:
+    """Partition du cache pour ce CSV, None si absente ou plus ancienne que le CSV"""
+    path = Path(path)
+    cache_dir = cache_dir_for(path.parent)
+    manifest = load_cache_manifest(cache_dir)
+    if manifest is None or manifest.get('dtypes') != _CACHE_DTYPES:
+        return None
+    entry = manifest['partitions'].get(path.stem)
+    if entry is None or not path.exists():
+        return None
+    signature = _source_signature(path)
+    if any(entry[key] != value for key, value in signature.items()):
+        return None
+    return cache_dir / path.stem
+
+
+def _partition_columns(partition: Path, columns: Optional[Sequence[str]], mmap_mode=None) -> Dict:
+    names = CLICK_DTYPES.keys() if columns is None else columns
+    return {name: np.load(partition / f"{name}.npy", mmap_mode=mmap_mode) for name in names}
+
+
+def read_click_file(path, columns: Optional[Sequence[str]] = None, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Lit un fichier de clics complet avec les dtypes compacts
+
+    Args:
+        path: Fichier clicks_hour_*.csv
+        columns: Colonnes à garder (None = toutes)
+        use_cache: Lire la partition .npy à jour si elle existe (lignes triées
+            par user/session/timestamp) au lieu de parser le CSV
+    """
+    partition = cached_partition(path) if use_cache else None
+    if partition is not None:
+        return pd.DataFrame(_partition_columns(partition, columns))
+    return pd.read_csv(path, usecols=list(columns) if columns is not None else None,
+                       dtype=_dtypes(columns))
+
+
+def iter_click_chunks(clicks_dir=CLICKS_DIR, columns: Optional[Sequence[str]] = None,
+                      files: Optional[Sequence] = None,
+                      chunk_rows: Optional[int] = DEFAULT_CHUNK_ROWS,
+                      use_cache: bool = True) -> Iterator[pd.DataFrame]:
+    """
+    Générateur de DataFrames de clics (dtypes compacts, colonnes sélectionnées)
+
+    Args:
+        clicks_dir: Dossier des fichiers horaires (ignoré si files est donné)
+        columns: Colonnes à garder (None = toutes)
+        files: Fichiers à lire (défaut: tous les clicks_hour_*.csv de clicks_dir, triés)
+        chunk_rows: Lignes max par chunk (défaut: DEFAULT_CHUNK_ROWS; None = un chunk
+            par fichier horaire, sans borne sur la mémoire)
+        use_cache: Lire les partitions .npy à jour quand elles existent
+
+    Yields:
+        Un DataFrame par bloc d'au plus chunk_rows lignes (un chunk ne couvre jamais deux fichiers)
+    """
+    if files is None:
+        files = list_click_files(clicks_dir)
+
+    for path in files:
+        partition = cached_partition(path) if use_cache and chunk_rows is not None else None
+        if chunk_rows is None:
+            yield read_click_file(path, columns, use_cache=use_cache)
+        elif partition is not None:
+            # Colonnes en mémoire mappée: seul le chunk courant est copié
+            arrays = _partition_columns(partition, columns, mmap_mode='r')
+            n_rows = len(next(iter(arrays.values())))
+            for start in range(0, n_rows, chunk_rows):
+                yield pd.DataFrame({name: np.array(values[start:start + chunk_rows])
+                                    for name, values in arrays.items()})
+        else:
+            yield from pd.read_csv(path, usecols=list(columns) if columns is not None else None,
+                                   dtype=_dtypes(columns), chunksize=chunk_rows)
+
+
+def load_clicks(clicks_dir=CLICKS_DIR, columns: Optional[Sequence[str]] = None,
+                files: Optional[Sequence] = None, n_jobs: int = 1) -> pd.DataFrame:
+    """
+    Tous les clics dans un seul DataFrame (dtypes compacts)
+
+    Pour les traitements qui ont besoin de l'ensemble en mémoire; préférer
+    iter_click_chunks pour les agrégations qui se font chunk par chunk.
+
+    Args:
+        n_jobs: Fichiers lus en parallèle (joblib) si > 1
+    """
+    if files is None:
+        files = list_click_files(clicks_dir)
+
+    if n_jobs > 1:
+        from joblib import Parallel, delayed
+        frames = Parallel(n_jobs=n_jobs)(delayed(read_click_file)(path, columns) for path in files)
+    else:
+        frames = list(iter_click_chunks(columns=columns, files=files, chunk_rows=None))
+
+    if not frames:
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in _dtypes(columns).items()})
+    return pd.concat(frames, ignore_index=True)
+
+
+def _convert_file(path: Path, cache_dir: Path) -> Dict:
+    """Convertit un CSV en partition de colonnes .npy triées (écriture atomique du dossier)"""
+    df = read_click_file(path, use_cache=False)
+    df = df.sort_values(CACHE_SORT_COLUMNS, kind='stable')
+
+    tmp_dir = cache_dir / f".{path.stem}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    for name in CLICK_DTYPES:
+        np.save(tmp_dir / f"{name}.npy", df[name].to_numpy())
+
+    partition = cache_dir / path.stem
+    shutil.rmtree(partition, ignore_errors=True)
+    os.replace(tmp_dir, partition)
+    return {'rows': len(df), **_source_signature(path)}
+
+
+def build_click_cache(clicks_dir=CLICKS_DIR, cache_dir=None, n_jobs: int = 1) -> Dict:
+    """
+    Convertit les CSV horaires en cache colonnaire (seuls les CSV nouveaux ou modifiés)
+
+    Args:
+        clicks_dir: Dossier des fichiers horaires
+        cache_dir: Dossier du cache (défaut: cache_dir_for(clicks_dir))
+        n_jobs: Fichiers convertis en parallèle (joblib) si > 1
+
+    Returns:
+        Manifest écrit
+    """
+    clicks_dir = Path(clicks_dir)
+    cache_dir = Path(cache_dir) if cache_dir is not None else cache_dir_for(clicks_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    previous = load_cache_manifest(cache_dir) or {}
+    partitions = previous.get('partitions', {})
+    files = list_click_files(clicks_dir)
+    todo = [path for path in files
+            if partitions.get(path.stem, {}).get('source_size') != path.stat().st_size
+            or partitions.get(path.stem, {}).get('source_mtime_ns') != path.stat().st_mtime_ns
+            or not (cache_dir / path.stem).is_dir()]
+
+    if n_jobs > 1 and len(todo) > 1:
+        from joblib import Parallel, delayed
+        entries = Parallel(n_jobs=n_jobs)(delayed(_convert_file)(path, cache_dir) for path in todo)
+    else:
+        entries = [_convert_file(path, cache_dir) for path in todo]
+
+    # Le manifest ne référence que les CSV encore présents; il est écrit en dernier
+    names = {path.stem for path in files}
+    partitions = {name: entry for name, entry in partitions.items() if name in names}
+    partitions.update({path.stem: entry for path, entry in zip(todo, entries)})
+
+    manifest = {
+        'columns': list(CLICK_DTYPES),
+        'dtypes': _CACHE_DTYPES,
+        'sort_columns': CACHE_SORT_COLUMNS,
+        'n_rows': int(sum(entry['rows'] for entry in partitions.values())),
+        'partitions': dict(sorted(partitions.items())),
+        'created_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    tmp_path = cache_dir / f".{CACHE_MANIFEST}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, cache_dir / CACHE_MANIFEST)
+
+    manifest['converted'] = len(todo)
+    return manifest
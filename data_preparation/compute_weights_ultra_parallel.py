@@ -6,12 +6,17 @@ UTILISE 9 SIGNAUX: temps, clicks, session, device, env, referrer, OS, country, r
 
 import pandas as pd
 import numpy as np
-import glob
 import json
+import os
 import pickle
+import shutil
+import tempfile
 from tqdm import tqdm
 from multiprocessing import Pool, cpu_count
 import warnings
+
+from click_reader import CLICK_COLUMNS_SIGNALS, cache_dir_for, list_click_files, load_cache_manifest, read_click_file
+from profile_builder import ColumnarProfiles
 warnings.filterwarnings('ignore')
 
 print("="*80)
@@ -23,17 +28,61 @@ OUTPUT_PATH = "/home/ser/Bureau/P10_reco/models/"
 N_CORES = cpu_count()
 MAX_TIME_SPENT = 600
 MIN_TIME_SPENT = 5
+CHUNKS_PER_CORE = 4  # Plages de lignes par worker (équilibrage de charge)
 
 print(f"\nConfiguration: {N_CORES} threads pour TOUTES les étapes")
 
+# Colonnes partagées avec les workers: fichiers .npy en mémoire mappée (pages
+# communes à tous les processus, aucune copie par worker)
+SHARED_DIR = tempfile.mkdtemp(prefix="compute_weights_")
+_shared_columns = {}
+
+
+def share_columns(name, frame):
+    """Écrit les colonnes de frame dans SHARED_DIR/name/ (une colonne .npy par fichier)"""
+    directory = os.path.join(SHARED_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    for column in frame.columns:
+        np.save(os.path.join(directory, f"{column}.npy"), frame[column].to_numpy())
+    _shared_columns.pop(name, None)
+
+
+def shared_slice(name, start, stop):
+    """DataFrame des lignes [start, stop) des colonnes partagées (ouvertes une fois par processus)"""
+    if name not in _shared_columns:
+        directory = os.path.join(SHARED_DIR, name)
+        _shared_columns[name] = {
+            filename[:-len('.npy')]: np.load(os.path.join(directory, filename), mmap_mode='r')
+            for filename in sorted(os.listdir(directory))
+        }
+    return pd.DataFrame({column: np.asarray(values[start:stop])
+                         for column, values in _shared_columns[name].items()})
+
+
+def user_range_bounds(user_ids, n_chunks):
+    """
+    Plages [start, stop) de tailles proches, coupées uniquement entre deux utilisateurs
+
+    Args:
+        user_ids: user_id de chaque ligne, triés (lignes d'un utilisateur contiguës)
+        n_chunks: Nombre de plages visé
+    """
+    n_rows = len(user_ids)
+    user_starts = np.flatnonzero(np.r_[True, user_ids[1:] != user_ids[:-1]])
+    targets = np.linspace(0, n_rows, n_chunks + 1)[1:-1]
+    cuts = user_starts[np.minimum(np.searchsorted(user_starts, targets), len(user_starts) - 1)]
+    edges = np.unique(np.r_[0, cuts, n_rows])
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
 # === ÉTAPE 1: Chargement parallélisé ===
 print("\n1. Chargement PARALLÉLISÉ (28 threads)...")
-click_files = sorted(glob.glob(f"{CLICKS_PATH}clicks_hour_*.csv"))
+click_files = list_click_files(CLICKS_PATH)
 print(f"   Fichiers: {len(click_files)}")
+print(f"   Cache colonnaire: {'oui' if load_cache_manifest(cache_dir_for(CLICKS_PATH)) else 'non (build_click_cache.py)'}")
 
 def load_and_preprocess_file(filepath):
     """Charge ET prétraite un fichier (parallélisé)"""
-    df = pd.read_csv(filepath)
+    df = read_click_file(filepath, columns=CLICK_COLUMNS_SIGNALS)
     # Tri par user, session, timestamp
     df = df.sort_values(['user_id', 'session_id', 'click_timestamp'])
     return df
@@ -111,17 +160,23 @@ print("   ✓ Features calculées (9 signaux)")
 # === ÉTAPE 3: Agrégation PARALLÉLISÉE par chunks d'utilisateurs ===
 print("\n3. Agrégation PARALLÉLISÉE par chunks d'utilisateurs...")
 
-unique_users = df_clicks['user_id'].unique()
-n_users = len(unique_users)
-chunk_size = max(1, n_users // N_CORES)  # Diviser en 28 chunks
-user_chunks = [unique_users[i:i+chunk_size] for i in range(0, n_users, chunk_size)]
+# Tri unique par utilisateur: chaque chunk est une plage contiguë de lignes (O(lignes))
+CLICK_AGG_COLUMNS = [
+    'user_id', 'click_article_id', 'click_timestamp', 'time_spent_seconds',
+    'session_quality', 'device_quality', 'env_quality', 'referrer_quality',
+    'os_quality', 'country_quality', 'region_quality', 'session_size'
+]
+df_clicks = df_clicks[CLICK_AGG_COLUMNS].sort_values('user_id', kind='stable', ignore_index=True)
+share_columns('clicks', df_clicks)
+user_chunks = user_range_bounds(df_clicks['user_id'].to_numpy(), N_CORES * CHUNKS_PER_CORE)
+n_users = df_clicks['user_id'].nunique()
+del df_clicks
 
-print(f"   Users: {n_users:,} | Chunks: {len(user_chunks)} | Size: ~{chunk_size}")
+print(f"   Users: {n_users:,} | Chunks: {len(user_chunks)} | Size: ~{n_users // len(user_chunks)}")
 
-def aggregate_user_chunk(user_list):
-    """Agrège les interactions pour un chunk d'utilisateurs"""
-    # Filtrer le DataFrame pour ces utilisateurs
-    chunk_df = df_clicks[df_clicks['user_id'].isin(user_list)]
+def aggregate_user_chunk(bounds):
+    """Agrège les interactions d'une plage contiguë d'utilisateurs"""
+    chunk_df = shared_slice('clicks', *bounds)
 
     # Agrégation (9 signaux)
     agg_dict = {
@@ -162,6 +217,7 @@ with Pool(N_CORES) as pool:
 # Fusionner tous les chunks
 interaction_stats = pd.concat(chunk_results, ignore_index=True)
 del chunk_results
+shutil.rmtree(SHARED_DIR, ignore_errors=True)
 print(f"   ✓ {len(interaction_stats):,} interactions agrégées")
 
 # === ÉTAPE 4: Calcul poids (vectorisé) ===
@@ -188,67 +244,68 @@ interaction_stats['interaction_weight'] = (
 print(f"   ✓ Poids: mean={interaction_stats['interaction_weight'].mean():.3f}, "
       f"median={interaction_stats['interaction_weight'].median():.3f}")
 
-# === ÉTAPE 5: Construction profils PARALLÉLISÉE ===
-print("\n5. Construction profils PARALLÉLISÉE (28 threads)...")
-
-def build_user_profile(user_id):
-    """Construit profil pour 1 utilisateur"""
-    user_data = interaction_stats[interaction_stats['user_id'] == user_id].sort_values('first_click')
-
-    if len(user_data) == 0:
-        return None
-
-    articles_read = user_data['article_id'].tolist()
-    article_weights = dict(zip(user_data['article_id'], user_data['interaction_weight']))
-
-    article_stats = {
-        int(row['article_id']): {
-            'weight': float(row['interaction_weight']),
-            'num_clicks': int(row['num_clicks']),
-            'total_time_seconds': float(row['total_time_seconds']),
-            'avg_time_seconds': float(row['avg_time_seconds']),
-            'median_time_seconds': float(row['median_time_seconds']),
-            'first_click_ts': int(row['first_click']),
-            'last_click_ts': int(row['last_click']),
-            'avg_session_quality': float(row['avg_session_quality']),
-            'avg_device_quality': float(row['avg_device_quality']),
-            'avg_env_quality': float(row['avg_env_quality']),
-            'avg_referrer_quality': float(row['avg_referrer_quality']),
-            'avg_os_quality': float(row['avg_os_quality']),           # NOUVEAU
-            'avg_country_quality': float(row['avg_country_quality']), # NOUVEAU
-            'avg_region_quality': float(row['avg_region_quality']),   # NOUVEAU
-            'avg_session_size': float(row['avg_session_size'])
-        }
-        for _, row in user_data.iterrows()
-    }
-
-    return (int(user_id), {
-        'articles_read': [int(a) for a in articles_read],
-        'article_weights': {int(k): float(v) for k, v in article_weights.items()},
-        'article_stats': article_stats,
-        'num_interactions': int(user_data['num_clicks'].sum()),
+# === ÉTAPE 5: Construction profils (vectorisée) ===
+print("\n5. Construction profils (vectorisée, une passe de tri)...")
+
+# Clé de article_stats -> colonne de interaction_stats
+ARTICLE_STATS_COLUMNS = {
+    'weight': 'interaction_weight',
+    'num_clicks': 'num_clicks',
+    'total_time_seconds': 'total_time_seconds',
+    'avg_time_seconds': 'avg_time_seconds',
+    'median_time_seconds': 'median_time_seconds',
+    'first_click_ts': 'first_click',
+    'last_click_ts': 'last_click',
+    'avg_session_quality': 'avg_session_quality',
+    'avg_device_quality': 'avg_device_quality',
+    'avg_env_quality': 'avg_env_quality',
+    'avg_referrer_quality': 'avg_referrer_quality',
+    'avg_os_quality': 'avg_os_quality',           # NOUVEAU
+    'avg_country_quality': 'avg_country_quality', # NOUVEAU
+    'avg_region_quality': 'avg_region_quality',   # NOUVEAU
+    'avg_session_size': 'avg_session_size'
+}
+
+# Profils en colonnes: lignes triées par utilisateur puis premier clic, offsets par utilisateur
+profiles = ColumnarProfiles.from_frame(interaction_stats, sort_columns=['first_click'])
+print(f"   Building {len(profiles):,} profiles...")
+
+user_summary = {
+    'num_interactions': profiles.user_sum('num_clicks'),
+    'total_time_seconds': profiles.user_sum('total_time_seconds'),
+    'avg_weight': profiles.user_mean('interaction_weight'),
+    'avg_session_quality': profiles.user_mean('avg_session_quality'),
+    'avg_device_quality': profiles.user_mean('avg_device_quality'),
+    'avg_referrer_quality': profiles.user_mean('avg_referrer_quality'),
+    'avg_os_quality': profiles.user_mean('avg_os_quality'),           # NOUVEAU
+    'avg_country_quality': profiles.user_mean('avg_country_quality'), # NOUVEAU
+    'avg_region_quality': profiles.user_mean('avg_region_quality')    # NOUVEAU
+}
+user_summary = {key: values.tolist() for key, values in user_summary.items()}
+
+# Export: dicts construits à partir des listes (aucun accès pandas par utilisateur)
+stats_keys = list(ARTICLE_STATS_COLUMNS)
+user_profiles_enriched = {}
+for i, (user_id, rows) in enumerate(profiles.iter_users(['article_id'] + list(ARTICLE_STATS_COLUMNS.values()))):
+    articles_read = rows['article_id']
+    stats_rows = zip(*(rows[column] for column in ARTICLE_STATS_COLUMNS.values()))
+    user_profiles_enriched[user_id] = {
+        'articles_read': articles_read,
+        'article_weights': dict(zip(articles_read, rows['interaction_weight'])),
+        'article_stats': {article_id: dict(zip(stats_keys, values))
+                          for article_id, values in zip(articles_read, stats_rows)},
+        'num_interactions': user_summary['num_interactions'][i],
         'num_articles': len(articles_read),
-        'total_time_seconds': float(user_data['total_time_seconds'].sum()),
-        'avg_weight': float(user_data['interaction_weight'].mean()),
-        'avg_session_quality': float(user_data['avg_session_quality'].mean()),
-        'avg_device_quality': float(user_data['avg_device_quality'].mean()),
-        'avg_referrer_quality': float(user_data['avg_referrer_quality'].mean()),
-        'avg_os_quality': float(user_data['avg_os_quality'].mean()),           # NOUVEAU
-        'avg_country_quality': float(user_data['avg_country_quality'].mean()), # NOUVEAU
-        'avg_region_quality': float(user_data['avg_region_quality'].mean())    # NOUVEAU
-    })
-
-unique_users_final = interaction_stats['user_id'].unique()
-print(f"   Building {len(unique_users_final):,} profiles...")
-
-with Pool(N_CORES) as pool:
-    results = list(tqdm(
-        pool.imap(build_user_profile, unique_users_final, chunksize=100),
-        total=len(unique_users_final),
-        desc="Building profiles"
-    ))
-
-user_profiles_enriched = {user_id: profile for user_id, profile in results if profile is not None}
+        'total_time_seconds': user_summary['total_time_seconds'][i],
+        'avg_weight': user_summary['avg_weight'][i],
+        'avg_session_quality': user_summary['avg_session_quality'][i],
+        'avg_device_quality': user_summary['avg_device_quality'][i],
+        'avg_referrer_quality': user_summary['avg_referrer_quality'][i],
+        'avg_os_quality': user_summary['avg_os_quality'][i],           # NOUVEAU
+        'avg_country_quality': user_summary['avg_country_quality'][i], # NOUVEAU
+        'avg_region_quality': user_summary['avg_region_quality'][i]    # NOUVEAU
+    }
+del profiles, user_summary
 print(f"   ✓ {len(user_profiles_enriched):,} profils créés")
 
 # === ÉTAPE 6: Sauvegarde ===
@@ -265,6 +322,18 @@ print(f"   ✓ user_profiles_enriched.pkl")
 interaction_stats.to_csv(f"{OUTPUT_PATH}interaction_stats_enriched.csv", index=False)
 print(f"   ✓ interaction_stats_enriched.csv")
 
+# Paramètres globaux des poids: figés pour les mises à jour incrémentales (update_profiles_incremental.py)
+weight_params = {
+    'max_clicks': int(max_clicks),
+    'max_time': float(max_time),
+    'os_map': {str(int(k)): v for k, v in os_map.items()},
+    'country_map': {str(int(k)): v for k, v in country_map.items()},
+    'region_map': {str(int(k)): v for k, v in region_map.items()}
+}
+with open(f"{OUTPUT_PATH}weight_params.json", 'w') as f:
+    json.dump(weight_params, f, indent=2)
+print(f"   ✓ weight_params.json")
+
 # === STATISTIQUES ===
 print("\n" + "="*80)
 print("STATISTIQUES FINALES")
@@ -3,19 +3,23 @@ Create Weighted User-Item Matrix from Enriched Interactions
 
 This script creates a sparse matrix using interaction_weight instead of simple counts.
 The weighted matrix captures engagement quality, not just click quantity.
+It also precomputes the user profile embeddings (models/user_embeddings.npy).
 """
 import pandas as pd
 import numpy as np
 from scipy.sparse import csr_matrix, save_npz
 import pickle
+from pathlib import Path
 from tqdm import tqdm
 
+from build_user_embeddings import build_user_embeddings
+
 print("="*80)
 print("CREATING WEIGHTED USER-ITEM MATRIX")
 print("="*80)
 
 # Load enriched interactions
-print("\n[1/5] Loading enriched interactions...")
+print("\n[1/6] Loading enriched interactions...")
 df = pd.read_csv('models/interaction_stats_enriched.csv')
 print(f"  Loaded: {len(df):,} interactions")
 print(f"  Weight stats: min={df['interaction_weight'].min():.3f}, "
@@ -23,7 +27,7 @@ print(f"  Weight stats: min={df['interaction_weight'].min():.3f}, "
       f"mean={df['interaction_weight'].mean():.3f}")
 
 # Load mappings
-print("\n[2/5] Loading user/article mappings...")
+print("\n[2/6] Loading user/article mappings...")
 with open('models/mappings.pkl', 'rb') as f:
     mappings = pickle.load(f)
 
@@ -33,7 +37,7 @@ print(f"  Users: {n_users:,}")
 print(f"  Articles: {n_articles:,}")
 
 # Create weighted matrix
-print("\n[3/5] Building weighted matrix...")
+print("\n[3/6] Building weighted matrix...")
 
 # Filter to only users/articles in mappings
 df_filtered = df[
@@ -53,7 +57,7 @@ df_filtered = df_filtered.dropna(subset=['user_idx', 'article_idx', 'interaction
 print(f"  Final interactions: {len(df_filtered):,}")
 
 # Create sparse matrix
-print("\n[4/5] Creating sparse matrix...")
+print("\n[4/6] Creating sparse matrix...")
 row_indices = df_filtered['user_idx'].astype(int).values
 col_indices = df_filtered['article_idx'].astype(int).values
 weights = df_filtered['interaction_weight'].astype(float).values
@@ -77,11 +81,18 @@ print(f"    Mean: {weighted_matrix.data.mean():.3f}")
 print(f"    Median: {np.median(weighted_matrix.data):.3f}")
 
 # Save
-print("\n[5/5] Saving weighted matrix...")
+print("\n[5/6] Saving weighted matrix...")
 output_path = 'models/user_item_matrix_weighted.npz'
 save_npz(output_path, weighted_matrix)
 print(f"  ✓ Saved to: {output_path}")
 
+# Precompute user profile embeddings (read directly by the engine for content-based)
+print("\n[6/6] Building user profile embeddings...")
+if Path('models/embeddings_filtered.pkl').exists():
+    build_user_embeddings(Path('models'), weighted_matrix)
+else:
+    print("  ⚠ models/embeddings_filtered.pkl not found, skipped")
+
 # Compare with count-based matrix
 print("\n" + "="*80)
 print("COMPARISON WITH COUNT-BASED MATRIX")
@@ -1,13 +1,18 @@
 """
 Script de preprocessing PARALLÉLISÉ des données Globo.com
-Utilise multiprocessing pour charger plusieurs fichiers en même temps
+Utilise multiprocessing pour traiter plusieurs fichiers en même temps
 Beaucoup plus rapide que la version séquentielle
+
+Les clics ne sont jamais chargés en un seul DataFrame: chaque fichier est lu en chunks
+(iter_click_chunks) réduits à des agrégats additionnables, fusionnés ensuite:
+- nombre de clics par paire (user, article)   -> matrice user-item, popularité
+- paires (article, session) distinctes          -> popularité (sessions par article)
+- (user, article) de chaque clic, dans l'ordre  -> profils (articles_read, moyennes)
 """
 
 import pandas as pd
 import numpy as np
 import pickle
-import glob
 import os
 from pathlib import Path
 from datetime import datetime
@@ -16,6 +21,9 @@ import json
 from joblib import Parallel, delayed
 from multiprocessing import cpu_count
 
+from click_reader import CLICK_COLUMNS_CORE, cache_dir_for, iter_click_chunks, list_click_files, load_cache_manifest
+from profile_builder import ColumnarProfiles
+
 # Configuration des chemins
 BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / "news-portal-user-interactions-by-globocom"
@@ -26,64 +34,91 @@ MODELS_DIR.mkdir(exist_ok=True)
 # Nombre de workers parallèles (50% des CPU pour laisser de la place)
 N_WORKERS = max(2, cpu_count() // 2)
 
-def load_single_file(filepath):
-    """Charge un seul fichier CSV (fonction pour multiprocessing)"""
+def aggregate_chunk(chunk):
+    """
+    Réduit un chunk de clics aux agrégats du preprocessing
+
+    Returns:
+        (clics par paire user-article, paires article-session distinctes,
+         user_id et article_id de chaque clic dans l'ordre de lecture)
+    """
+    pair_counts = chunk.groupby(['user_id', 'click_article_id']).size()
+    article_sessions = chunk[['click_article_id', 'session_id']].drop_duplicates()
+    return (pair_counts, article_sessions,
+            chunk['user_id'].to_numpy(), chunk['click_article_id'].to_numpy())
+
+def merge_aggregates(parts):
+    """Fusionne les agrégats de plusieurs chunks (les clics gardent l'ordre des chunks)"""
+    pair_counts = pd.concat([part[0] for part in parts]).groupby(level=[0, 1]).sum()
+    article_sessions = pd.concat([part[1] for part in parts], ignore_index=True).drop_duplicates()
+    click_users = np.concatenate([part[2] for part in parts])
+    click_articles = np.concatenate([part[3] for part in parts])
+    return pair_counts, article_sessions, click_users, click_articles
+
+def aggregate_single_file(filepath):
+    """Agrège un fichier chunk par chunk (fonction pour multiprocessing)"""
     try:
-        return pd.read_csv(filepath)
+        parts = [aggregate_chunk(chunk)
+                 for chunk in iter_click_chunks(columns=CLICK_COLUMNS_CORE, files=[filepath])]
+        return merge_aggregates(parts) if parts else None
     except Exception as e:
         print(f"Erreur chargement {filepath}: {e}")
         return None
 
-def load_all_clicks_parallel():
-    """Charge et agrège tous les fichiers de clics EN PARALLÈLE avec joblib"""
+def aggregate_all_clicks_parallel():
+    """Agrège tous les fichiers de clics EN PARALLÈLE avec joblib"""
     print("=" * 80)
-    print("CHARGEMENT DES CLICS (VERSION PARALLÈLE - JOBLIB)")
+    print("AGRÉGATION DES CLICS (VERSION PARALLÈLE - JOBLIB)")
     print("=" * 80)
 
-    click_files = sorted(glob.glob(str(CLICKS_DIR / "clicks_hour_*.csv")))
+    click_files = list_click_files(CLICKS_DIR)
     print(f"\nNombre de fichiers trouvés : {len(click_files)}")
     print(f"Workers parallèles : {N_WORKERS}")
-    print("\n⚙️  Chargement en cours...")
+    print(f"Cache colonnaire : {'oui' if load_cache_manifest(cache_dir_for(CLICKS_DIR)) else 'non (build_click_cache.py)'}")
+    print("\n⚙️  Agrégation en cours...")
 
-    # Charger tous les fichiers en parallèle avec joblib
-    all_clicks = Parallel(n_jobs=N_WORKERS, verbose=10)(
-        delayed(load_single_file)(f) for f in click_files
+    # Agréger tous les fichiers en parallèle avec joblib (chunks bornés dans chaque worker)
+    all_parts = Parallel(n_jobs=N_WORKERS, verbose=10)(
+        delayed(aggregate_single_file)(f) for f in click_files
     )
 
-    # Filtrer les None (erreurs)
-    all_clicks = [df for df in all_clicks if df is not None]
+    # Filtrer les None (erreurs, fichiers vides)
+    all_parts = [part for part in all_parts if part is not None]
 
-    print(f"\n✓ {len(all_clicks)} fichiers chargés")
-    print("\n⚙️  Concaténation des données...")
-    df_clicks = pd.concat(all_clicks, ignore_index=True)
+    print(f"\n✓ {len(all_parts)} fichiers agrégés")
+    print("\n⚙️  Fusion des agrégats...")
+    pair_counts, article_sessions, click_users, click_articles = merge_aggregates(all_parts)
 
-    print(f"\n✓ Total d'interactions : {len(df_clicks):,}")
-    print(f"✓ Utilisateurs uniques : {df_clicks['user_id'].nunique():,}")
-    print(f"✓ Articles uniques cliqués : {df_clicks['click_article_id'].nunique():,}")
-    print(f"✓ Sessions uniques : {df_clicks['session_id'].nunique():,}")
+    print(f"\n✓ Total d'interactions : {len(click_users):,}")
+    print(f"✓ Utilisateurs uniques : {pair_counts.index.get_level_values(0).nunique():,}")
+    print(f"✓ Articles uniques cliqués : {pair_counts.index.get_level_values(1).nunique():,}")
+    print(f"✓ Sessions uniques : {article_sessions['session_id'].nunique():,}")
+    memory = (pair_counts.memory_usage(deep=True) + article_sessions.memory_usage(deep=True).sum()
+              + click_users.nbytes + click_articles.nbytes)
+    print(f"✓ Mémoire des agrégats : {memory / 1024**2:.1f} Mo")
 
-    return df_clicks
+    return pair_counts, article_sessions, click_users, click_articles
 
-def create_user_item_matrix(df_clicks, min_interactions=5):
-    """Crée la matrice user-item pour le collaborative filtering"""
+def create_user_item_matrix(pair_counts, min_interactions=5):
+    """Crée la matrice user-item pour le collaborative filtering (à partir des clics par paire)"""
     print("\n" + "=" * 80)
     print("CRÉATION DE LA MATRICE USER-ITEM")
     print("=" * 80)
 
     # Filtrer les utilisateurs avec peu d'interactions
     print("\n⚙️  Filtrage des utilisateurs actifs...")
-    user_counts = df_clicks['user_id'].value_counts()
+    user_counts = pair_counts.groupby(level='user_id').sum()
     active_users = user_counts[user_counts >= min_interactions].index
 
-    df_filtered = df_clicks[df_clicks['user_id'].isin(active_users)].copy()
+    interactions = pair_counts[pair_counts.index.get_level_values('user_id').isin(active_users)]
+    interactions = interactions.reset_index(name='count')
+    num_kept = int(interactions['count'].sum())
+    num_clicks = int(user_counts.sum())
 
     print(f"\n👥 Utilisateurs actifs (>= {min_interactions} interactions) : {len(active_users):,}")
-    print(f"📊 Interactions conservées : {len(df_filtered):,} ({len(df_filtered)/len(df_clicks)*100:.1f}%)")
-
-    # Créer la matrice d'interactions (nombre de clics par user-article)
-    print("\n⚙️  Création de la matrice d'interactions...")
-    interactions = df_filtered.groupby(['user_id', 'click_article_id']).size().reset_index(name='count')
+    print(f"📊 Interactions conservées : {num_kept:,} ({num_kept/num_clicks*100:.1f}%)")
 
+    # Matrice d'interactions (nombre de clics par user-article, paires triées par user puis article)
     print(f"✓ Paires user-article uniques : {len(interactions):,}")
 
     # Créer des mappings
@@ -107,18 +142,18 @@ def create_user_item_matrix(df_clicks, min_interactions=5):
     print(f"\n✓ Matrice créée : {matrix.shape[0]:,} users × {matrix.shape[1]:,} articles")
     print(f"✓ Sparsité : {100 * (1 - matrix.nnz / (matrix.shape[0] * matrix.shape[1])):.2f}%")
 
-    return matrix, user_to_idx, article_to_idx, idx_to_user, idx_to_article, df_filtered
+    return matrix, user_to_idx, article_to_idx, idx_to_user, idx_to_article, interactions
 
-def compute_article_popularity(df_clicks):
+def compute_article_popularity(pair_counts, article_sessions):
     """Calcule la popularité des articles"""
     print("\n" + "=" * 80)
     print("CALCUL DE LA POPULARITÉ DES ARTICLES")
     print("=" * 80)
 
-    article_stats = df_clicks.groupby('click_article_id').agg({
-        'user_id': 'count',
-        'session_id': 'nunique'
-    }).rename(columns={'user_id': 'num_clicks', 'session_id': 'num_sessions'})
+    article_stats = pd.DataFrame({
+        'num_clicks': pair_counts.groupby(level='click_article_id').sum(),
+        'num_sessions': article_sessions.groupby('click_article_id').size()
+    })
 
     article_stats['popularity_score'] = (
         0.7 * (article_stats['num_clicks'] / article_stats['num_clicks'].max()) +
@@ -133,44 +168,45 @@ def compute_article_popularity(df_clicks):
 
     return article_stats
 
-def create_user_profiles(df_clicks, df_metadata):
+def create_user_profiles(pair_counts, click_users, click_articles, df_metadata):
     """Crée des profils utilisateurs basés sur leurs interactions"""
     print("\n" + "=" * 80)
     print("CRÉATION DES PROFILS UTILISATEURS")
     print("=" * 80)
 
-    # Joindre avec les métadonnées
-    print("\n⚙️  Jointure avec métadonnées...")
-    df_with_meta = df_clicks.merge(
-        df_metadata[['article_id', 'category_id', 'words_count']],
-        left_on='click_article_id',
-        right_on='article_id',
-        how='left'
-    )
+    metadata = df_metadata[['article_id', 'category_id', 'words_count']]
 
-    # Calculer les préférences de catégories par utilisateur
+    # Préférences de catégories par utilisateur (somme des clics par paire)
     print("\n⚙️  Calcul des préférences par catégorie...")
-    user_categories = df_with_meta.groupby(['user_id', 'category_id']).size().reset_index(name='count')
+    pairs_with_meta = pair_counts.reset_index(name='count').merge(
+        metadata, left_on='click_article_id', right_on='article_id', how='left'
+    )
+    user_categories = pairs_with_meta.groupby(['user_id', 'category_id'])['count'].sum().reset_index(name='count')
     user_top_categories = user_categories.sort_values('count', ascending=False).groupby('user_id').head(5)
 
-    # Créer un dictionnaire de profils
+    # Profils en colonnes: un seul tri par utilisateur (ordre des clics conservé)
     print("\n⚙️  Génération des profils...")
-    user_profiles = {}
-    unique_users = df_clicks['user_id'].unique()
-
-    for i, user_id in enumerate(unique_users):
-        if (i + 1) % 10000 == 0:
-            print(f"    Profils créés: {i+1}/{len(unique_users)}")
+    clicks_with_meta = pd.DataFrame({'user_id': click_users, 'click_article_id': click_articles}).merge(
+        metadata[['article_id', 'words_count']], left_on='click_article_id', right_on='article_id', how='left'
+    )
+    clicks = ColumnarProfiles.from_frame(clicks_with_meta, columns=['click_article_id', 'words_count'])
+    del clicks_with_meta
+    num_interactions = clicks.counts().tolist()
+    num_articles = clicks.user_nunique('click_article_id').tolist()
+    avg_words = clicks.user_mean('words_count', skipna=True).tolist()
 
-        user_data = df_with_meta[df_with_meta['user_id'] == user_id]
-        top_cats = user_top_categories[user_top_categories['user_id'] == user_id]['category_id'].tolist()
+    top_categories = ColumnarProfiles.from_frame(user_top_categories, columns=['category_id'])
+    top_cats_by_user = {user_id: rows['category_id'] for user_id, rows in top_categories.iter_users(['category_id'])}
 
-        user_profiles[int(user_id)] = {
-            'num_interactions': len(user_data),
-            'num_articles': user_data['click_article_id'].nunique(),
-            'top_categories': top_cats,
-            'avg_words': float(user_data['words_count'].mean()),
-            'articles_read': user_data['click_article_id'].tolist()
+    # Export en dicts
+    user_profiles = {}
+    for i, (user_id, rows) in enumerate(clicks.iter_users(['click_article_id'])):
+        user_profiles[user_id] = {
+            'num_interactions': num_interactions[i],
+            'num_articles': num_articles[i],
+            'top_categories': top_cats_by_user.get(user_id, []),
+            'avg_words': avg_words[i],
+            'articles_read': rows['click_article_id']
         }
 
     print(f"\n✓ Profils créés pour {len(user_profiles):,} utilisateurs")
@@ -294,23 +330,24 @@ def main():
             embeddings_array = pickle.load(f)
         print(f"✓ Embeddings chargés : {embeddings_array.shape}")
 
-        # 3. Charger tous les clics EN PARALLÈLE
-        print("\n[3/8] Chargement des clics (PARALLÈLE)...")
-        df_clicks = load_all_clicks_parallel()
+        # 3. Agréger tous les clics EN PARALLÈLE (chunk par chunk)
+        print("\n[3/8] Agrégation des clics (PARALLÈLE)...")
+        pair_counts, article_sessions, click_users, click_articles = aggregate_all_clicks_parallel()
 
         # 4. Créer la matrice user-item
         print("\n[4/8] Création de la matrice user-item...")
-        matrix, user_to_idx, article_to_idx, idx_to_user, idx_to_article, df_filtered = create_user_item_matrix(
-            df_clicks, min_interactions=5
+        matrix, user_to_idx, article_to_idx, idx_to_user, idx_to_article, interactions = create_user_item_matrix(
+            pair_counts, min_interactions=5
         )
 
         # 5. Calculer la popularité des articles
         print("\n[5/8] Calcul de la popularité...")
-        article_stats = compute_article_popularity(df_clicks)
+        article_stats = compute_article_popularity(pair_counts, article_sessions)
+        del article_sessions
 
         # 6. Créer les profils utilisateurs
         print("\n[6/8] Création des profils utilisateurs...")
-        user_profiles = create_user_profiles(df_clicks, df_metadata)
+        user_profiles = create_user_profiles(pair_counts, click_users, click_articles, df_metadata)
 
         # 7. Préparer les embeddings
         print("\n[7/8] Préparation des embeddings...")
@@ -0,0 +1,136 @@
+"""
+Pré-calcul hors ligne des candidats de recommandation pour tous les utilisateurs connus
+
+Pour chaque utilisateur de user_profiles_enriched, calcule les top-WIDTH candidats
+collaborative et content-based (recommend_batch du moteur) et les écrit dans une
+table à largeur fixe, lue en mémoire mappée par RecommendationEngine.recommend:
+au service, seuls les poids, la popularité (fraîcheur) et la diversité sont appliqués.
+
+Sortie (models/precomputed/):
+    user_ids.npy                                   (n_users,) int64, trié
+    {collab,content}_article_ids.npy               (n_users, WIDTH) int32, -1 = vide
+    {collab,content}_scores.npy                    (n_users, WIDTH) float32
+    manifest.json                                  (écrit en dernier)
+
+La table porte la version des modèles (model_version: version du bundle, ou empreinte
+des fichiers legacy): elle est ignorée par le moteur si les modèles ont été reconstruits
+ou réécrits depuis, ou si sa recherche content-based (n_probe IVF) diffère.
+"""
+
+import json
+import os
+import sys
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+
+# Configuration des chemins
+BASE_DIR = Path(__file__).parent.parent
+MODELS_DIR = BASE_DIR / "models"
+OUTPUT_DIR = MODELS_DIR / "precomputed"
+
+sys.path.insert(0, str(BASE_DIR / "azure_function"))
+from recommendation_engine import RecommendationEngine
+from model_bundle import PRECOMPUTED_FORMAT, PrecomputedCandidates
+
+WIDTH = 100          # Candidats par source: couvre n_recommendations <= 10 (n_candidates = n × 10)
+CHUNK_SIZE = 1024    # Utilisateurs par appel aux méthodes batch du moteur
+
+
+def fill_rows(ids_table, scores_table, offset: int, user_ids, recs_by_user):
+    """Écrit les candidats d'un chunk dans les tables (lignes offset..offset+len(user_ids))"""
+    for i, user_id in enumerate(user_ids):
+        recs = recs_by_user.get(user_id, [])
+        if recs:
+            ids_table[offset + i, :len(recs)] = [article_id for article_id, _ in recs]
+            scores_table[offset + i, :len(recs)] = [score for _, score in recs]
+
+
+def precompute(engine: RecommendationEngine, output_dir: Path = OUTPUT_DIR, width: int = WIDTH):
+    """
+    Calcule et écrit la table de candidats
+
+    Returns:
+        Le manifest écrit
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / "manifest.json"
+    if manifest_path.exists():
+        # Table en cours de réécriture: invisible pour le moteur jusqu'au nouveau manifest
+        os.remove(manifest_path)
+
+    user_ids = np.array(sorted(int(user_id) for user_id in engine.user_profiles), dtype=np.int64)
+    n_users = len(user_ids)
+    np.save(output_dir / "user_ids.npy", user_ids)
+
+    tables = {}
+    for source in PrecomputedCandidates.SOURCES:
+        ids_table = np.lib.format.open_memmap(output_dir / f"{source}_article_ids.npy", mode='w+',
+                                              dtype=np.int32, shape=(n_users, width))
+        scores_table = np.lib.format.open_memmap(output_dir / f"{source}_scores.npy", mode='w+',
+                                                 dtype=np.float32, shape=(n_users, width))
+        ids_table[:] = -1
+        scores_table[:] = 0.0
+        tables[source] = (ids_table, scores_table)
+
+    for offset in range(0, n_users, CHUNK_SIZE):
+        chunk = user_ids[offset:offset + CHUNK_SIZE].tolist()
+        histories = {user_id: engine._get_user_history(user_id) for user_id in chunk}
+        active_users = [user_id for user_id in chunk if histories[user_id]]
+
+        collab_recs = engine._collaborative_filtering_batch(active_users, n_recommendations=width)
+        content_recs = engine._content_based_filtering_batch(
+            {user_id: histories[user_id] for user_id in active_users}, n_recommendations=width)
+
+        fill_rows(*tables['collab'], offset, chunk, collab_recs)
+        fill_rows(*tables['content'], offset, chunk, content_recs)
+
+        done = min(offset + CHUNK_SIZE, n_users)
+        print(f"  Progression: {done:,}/{n_users:,} utilisateurs ({done / n_users * 100:.1f}%)", end='\r')
+    print()
+
+    for ids_table, scores_table in tables.values():
+        ids_table.flush()
+        scores_table.flush()
+
+    manifest = {
+        'format': PRECOMPUTED_FORMAT,
+        'model_version': engine.model_version,
+        # Même recherche content-based qu'au service (index IVF s'il est chargé, n_probe du moteur)
+        'content_search': 'ivf' if engine.ann_centroids is not None else 'exact',
+        'ann_n_probe': engine.ANN_N_PROBE,
+        'width': width,
+        'n_users': n_users,
+        'created_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def main():
+    """Fonction principale"""
+    print("=" * 80)
+    print("PRÉ-CALCUL DES CANDIDATS DE RECOMMANDATION")
+    print("=" * 80)
+
+    start_time = datetime.now()
+
+    print("\n[1/2] Chargement du moteur...")
+    engine = RecommendationEngine(models_path=str(MODELS_DIR), use_precomputed=False)
+    engine.load_models()
+    print(f"  ✓ Modèles {engine.model_version}: {len(engine.user_profiles):,} utilisateurs")
+
+    print(f"\n[2/2] Calcul des top-{WIDTH} candidats collaborative et content-based...")
+    manifest = precompute(engine)
+
+    size_mb = sum(os.path.getsize(OUTPUT_DIR / f) for f in os.listdir(OUTPUT_DIR)) / (1024**2)
+    elapsed = (datetime.now() - start_time).total_seconds()
+    print(f"\n✅ Table pré-calculée: {manifest['n_users']:,} utilisateurs × {WIDTH} candidats "
+          f"({size_mb:.1f} MB) en {elapsed:.1f}s")
+    print(f"📁 {OUTPUT_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Construction vectorisée des profils utilisateurs (format colonnaire type CSR)
+
+Toutes les lignes (utilisateur, article) sont triées UNE fois par utilisateur;
+les profils sont des plages [offsets[i], offsets[i+1]) dans des colonnes numpy.
+Les agrégats par utilisateur (sommes, moyennes, nombre d'articles distincts) sont
+des np.add.reduceat sur ces plages: aucun filtrage ni iterrows par utilisateur.
+
+Les dicts de profils ({user_id: {...}}) ne sont construits qu'à l'export
+(pickle / JSON), à partir de listes Python converties en une fois par colonne.
+
+Usage:
+    profiles = ColumnarProfiles.from_frame(interaction_stats, sort_columns=['first_click'])
+    total_time = profiles.user_sum('total_time_seconds')
+    for user_id, rows in profiles.iter_users(['article_id', 'interaction_weight']):
+        ...
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+class ColumnarProfiles:
+    """
+    Lignes de profils groupées par utilisateur
+
+    Attributes:
+        user_ids: user_id de chaque profil (n_users,), croissants
+        offsets: Début des lignes de chaque profil (n_users + 1,)
+        columns: {nom: valeurs par ligne} (n_lignes,), lignes d'un profil contiguës
+    """
+
+    def __init__(self, user_ids: np.ndarray, offsets: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.user_ids = user_ids
+        self.offsets = offsets
+        self.columns = columns
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, user_column: str = 'user_id',
+                   sort_columns: Optional[Sequence[str]] = None,
+                   columns: Optional[Sequence[str]] = None) -> 'ColumnarProfiles':
+        """
+        Un seul tri (stable) par utilisateur, puis par sort_columns à l'intérieur d'un profil
+
+        Args:
+            frame: Une ligne par (utilisateur, article) ou par clic
+            user_column: Colonne des identifiants utilisateur
+            sort_columns: Ordre des lignes dans un profil (None = ordre de frame)
+            columns: Colonnes à garder (None = toutes sauf user_column)
+        """
+        order_by = [user_column] + list(sort_columns or [])
+        frame = frame.sort_values(order_by, kind='stable')
+        user_values = frame[user_column].to_numpy()
+
+        starts = np.flatnonzero(np.r_[True, user_values[1:] != user_values[:-1]]) if len(frame) else \
+            np.zeros(0, dtype=np.int64)
+        offsets = np.r_[starts, len(frame)].astype(np.int64)
+
+        if columns is None:
+            columns = [c for c in frame.columns if c != user_column]
+        return cls(user_values[starts], offsets, {c: frame[c].to_numpy() for c in columns})
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def counts(self) -> np.ndarray:
+        """Nombre de lignes de chaque profil"""
+        return np.diff(self.offsets)
+
+    def user_sum(self, column: str) -> np.ndarray:
+        if len(self) == 0:
+            return np.zeros(0)
+        return np.add.reduceat(self.columns[column], self.offsets[:-1])
+
+    def user_mean(self, column: str, skipna: bool = False) -> np.ndarray:
+        """Moyenne par profil (skipna: NaN ignorés, NaN si aucune valeur)"""
+        if not skipna:
+            return self.user_sum(column) / self.counts()
+        values = self.columns[column].astype(np.float64)
+        present = ~np.isnan(values)
+        if len(self) == 0:
+            return np.zeros(0)
+        sums = np.add.reduceat(np.where(present, values, 0.0), self.offsets[:-1])
+        n_present = np.add.reduceat(present.astype(np.int64), self.offsets[:-1])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / n_present
+
+    def user_nunique(self, column: str) -> np.ndarray:
+        """Nombre de valeurs distinctes par profil"""
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64)
+        values = self.columns[column]
+        entry_user = np.repeat(np.arange(len(self)), self.counts())
+        order = np.lexsort((values, entry_user))
+        sorted_values = values[order]
+        first = np.r_[True, (entry_user[order][1:] != entry_user[order][:-1]) |
+                      (sorted_values[1:] != sorted_values[:-1])]
+        return np.add.reduceat(first.astype(np.int64), self.offsets[:-1])
+
+    def iter_users(self, columns: Sequence[str]) -> Iterator[Tuple[int, Dict[str, List]]]:
+        """
+        (user_id, {colonne: liste des valeurs du profil}) pour chaque profil
+
+        Les colonnes sont converties en listes Python une seule fois (export).
+        """
+        values = {c: self.columns[c].tolist() for c in columns}
+        bounds = self.offsets.tolist()
+        for i, user_id in enumerate(self.user_ids.tolist()):
+            start, stop = bounds[i], bounds[i + 1]
+            yield user_id, {c: column[start:stop] for c, column in values.items()}
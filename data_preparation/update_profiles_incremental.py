@@ -0,0 +1,420 @@
+"""
+Mise à jour incrémentale des profils utilisateurs à partir du flux de clics
+
+Évite de relancer compute_weights_ultra_parallel.py sur les 385 fichiers horaires
+à chaque nouveau clic: seuls les nouveaux fichiers clicks_hour_*.csv (ou les
+nouvelles lignes d'un journal de clics JSONL en ajout seul) sont lus, et seuls
+les utilisateurs touchés sont recalculés.
+
+Pour ces utilisateurs:
+- article_stats fusionnées (clics, temps, signaux de qualité) et interaction_weight
+  recalculé avec les paramètres globaux figés (weight_params.json)
+- lignes des matrices user_item_matrix(.npz) et user_item_matrix_weighted(.npz)
+- lignes de user_embeddings.npy
+- compteurs de popularité des articles cliqués (article_popularity.pkl)
+
+Un delta (models/deltas/delta_*.npz, voir azure_function/profile_delta.py) est
+écrit pour que le moteur en service l'applique sans rechargement complet
+(RecommendationEngine.apply_delta / apply_pending_deltas). Il porte la version des
+modèles de départ (bundle actif, socle du dernier recalcul complet): les deltas
+d'un socle antérieur sont déplacés dans models/deltas/archive/.
+
+Limites (résolues au prochain recalcul complet):
+- les nouveaux utilisateurs/articles n'entrent pas dans les matrices (mappings figés)
+- median_time_seconds fusionnée = moyenne des médianes pondérée par les clics
+- une session à cheval sur deux lots: son dernier clic du premier lot reçoit le temps médian
+
+Usage:
+    python update_profiles_incremental.py --clicks-dir /chemin/clicks/
+    python update_profiles_incremental.py --click-log /chemin/clicks.jsonl
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from scipy.sparse import load_npz, save_npz
+
+from build_user_embeddings import compute_user_embeddings
+from click_reader import CLICK_COLUMNS_SIGNALS, iter_click_chunks, list_click_files
+
+# Configuration des chemins
+BASE_DIR = Path(__file__).parent.parent
+MODELS_DIR = BASE_DIR / "models"
+
+sys.path.insert(0, str(BASE_DIR / "azure_function"))
+from profile_delta import (archive_stale_deltas, delta_base_versions, load_delta, replace_csr_rows,
+                           write_delta)
+
+STATE_FILE = "incremental_state.json"     # Fichiers / offset du journal déjà traités
+WEIGHT_PARAMS_FILE = "weight_params.json"  # Écrit par compute_weights_ultra_parallel.py
+PROFILES_FILE = "user_profiles_enriched.pkl"
+
+# Identiques à compute_weights_ultra_parallel.py
+MAX_TIME_SPENT = 600
+MIN_TIME_SPENT = 5
+DEVICE_MAP = {1: 0.6, 3: 0.8, 4: 1.0}
+ENV_MAP = {2: 0.7, 4: 1.0}
+REFERRER_MAP = {1: 1.0, 2: 0.8, 3: 0.8, 4: 0.7, 5: 0.6, 6: 0.5, 7: 0.5}
+QUALITY_SIGNALS = ['session', 'device', 'env', 'referrer', 'os', 'country', 'region']
+
+
+def load_weight_params(models_dir: Path):
+    """Paramètres globaux des poids (max_clicks, max_time, encodages OS/pays/région)"""
+    path = models_dir / WEIGHT_PARAMS_FILE
+    if path.exists():
+        with open(path, 'r') as f:
+            params = json.load(f)
+        for name in ('os_map', 'country_map', 'region_map'):
+            params[name] = {int(k): v for k, v in params[name].items()}
+        return params
+
+    # Anciens modèles: bornes reconstruites depuis les stats, encodages par défaut
+    print(f"  ⚠ {WEIGHT_PARAMS_FILE} absent: paramètres déduits de interaction_stats_enriched.csv")
+    stats = pd.read_csv(models_dir / "interaction_stats_enriched.csv",
+                        usecols=['num_clicks', 'total_time_seconds'])
+    return {
+        'max_clicks': int(stats['num_clicks'].max()),
+        'max_time': float(stats['total_time_seconds'].quantile(0.99)),
+        'os_map': {}, 'country_map': {}, 'region_map': {}
+    }
+
+
+def load_state(models_dir: Path):
+    path = models_dir / STATE_FILE
+    if path.exists():
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {'processed_files': [], 'click_log_offset': 0}
+
+
+def save_state(models_dir: Path, state):
+    tmp_path = models_dir / f"{STATE_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, models_dir / STATE_FILE)
+
+
+def read_new_clicks(state, clicks_dir: str = None, click_log: str = None):
+    """
+    Clics non encore traités (fichiers horaires nouveaux ou fin du journal JSONL)
+
+    Returns:
+        (DataFrame des clics, état mis à jour)
+    """
+    state = dict(state)
+    frames = []
+
+    if clicks_dir:
+        processed = set(state['processed_files'])
+        new_files = [str(f) for f in list_click_files(clicks_dir) if f.name not in processed]
+        print(f"  Fichiers horaires nouveaux: {len(new_files)}")
+        # Lot assemblé en entier: temps passé (écart dans la session) et médiane par
+        # utilisateur ne se calculent pas chunk par chunk; seuls les fichiers nouveaux sont lus
+        frames.extend(iter_click_chunks(columns=CLICK_COLUMNS_SIGNALS, files=new_files))
+        state['processed_files'] = sorted(processed | {os.path.basename(f) for f in new_files})
+
+    if click_log:
+        # Journal en ajout seul: lecture à partir du dernier offset, lignes complètes uniquement
+        with open(click_log, 'rb') as f:
+            f.seek(state.get('click_log_offset', 0))
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        records = [json.loads(line) for line in complete.splitlines() if line.strip()]
+        print(f"  Journal: {len(records):,} nouveaux clics")
+        if records:
+            frames.append(pd.DataFrame.from_records(records))
+        state['click_log_offset'] = state.get('click_log_offset', 0) + len(complete)
+
+    if not frames:
+        return pd.DataFrame(), state
+    return pd.concat(frames, ignore_index=True), state
+
+
+def compute_click_features(df_clicks, params):
+    """Temps passé et signaux de qualité par clic (mêmes formules que compute_weights_ultra_parallel.py)"""
+    df_clicks = df_clicks.sort_values(['user_id', 'session_id', 'click_timestamp']).reset_index(drop=True)
+
+    df_clicks['time_spent_seconds'] = df_clicks.groupby(['user_id', 'session_id'])['click_timestamp'].diff(-1) / -1000
+    df_clicks['time_spent_seconds'] = df_clicks['time_spent_seconds'].clip(MIN_TIME_SPENT, MAX_TIME_SPENT)
+    median_time = df_clicks.groupby('user_id')['time_spent_seconds'].transform('median')
+    df_clicks['time_spent_seconds'] = df_clicks['time_spent_seconds'].fillna(median_time).fillna(60)
+
+    df_clicks['session_quality'] = (df_clicks['session_size'] - 2) / (9 - 2)
+    df_clicks['device_quality'] = df_clicks['click_deviceGroup'].map(DEVICE_MAP).fillna(0.7)
+    df_clicks['env_quality'] = df_clicks['click_environment'].map(ENV_MAP).fillna(0.85)
+    df_clicks['referrer_quality'] = df_clicks['click_referrer_type'].map(REFERRER_MAP).fillna(0.7)
+    df_clicks['os_quality'] = df_clicks['click_os'].map(params['os_map']).fillna(0.80)
+    df_clicks['country_quality'] = df_clicks['click_country'].map(params['country_map']).fillna(0.85)
+    df_clicks['region_quality'] = df_clicks['click_region'].map(params['region_map']).fillna(0.85)
+    return df_clicks
+
+
+def aggregate_interactions(df_clicks):
+    """Statistiques par (user, article) du lot, colonnes de interaction_stats_enriched.csv"""
+    agg_dict = {
+        'click_timestamp': ['count', 'min', 'max'],
+        'time_spent_seconds': ['sum', 'mean', 'median'],
+        **{f"{signal}_quality": 'mean' for signal in QUALITY_SIGNALS},
+        'session_size': 'mean'
+    }
+    result = df_clicks.groupby(['user_id', 'click_article_id']).agg(agg_dict).reset_index()
+    result.columns = (['user_id', 'article_id', 'num_clicks', 'first_click', 'last_click',
+                       'total_time_seconds', 'avg_time_seconds', 'median_time_seconds']
+                      + [f"avg_{signal}_quality" for signal in QUALITY_SIGNALS]
+                      + ['avg_session_size'])
+    return result
+
+
+def merge_article_stats(old, new):
+    """Fusionne les stats d'un article (profil existant + lot): sommes, min/max, moyennes pondérées"""
+    if old is None:
+        return new
+    n_old, n_new = old['num_clicks'], new['num_clicks']
+    n_total = n_old + n_new
+    merged = {
+        'num_clicks': n_total,
+        'total_time_seconds': old['total_time_seconds'] + new['total_time_seconds'],
+        'first_click_ts': min(old['first_click_ts'], new['first_click_ts']),
+        'last_click_ts': max(old['last_click_ts'], new['last_click_ts']),
+    }
+    merged['avg_time_seconds'] = merged['total_time_seconds'] / n_total
+    for name in ['median_time_seconds', 'avg_session_size'] + [f"avg_{s}_quality" for s in QUALITY_SIGNALS]:
+        merged[name] = (old.get(name, new[name]) * n_old + new[name] * n_new) / n_total
+    return merged
+
+
+def interaction_weight(stats, params) -> float:
+    """interaction_weight d'un article (formule à 9 signaux, bornes globales figées)"""
+    clicks_norm = min(np.log1p(stats['num_clicks']) / np.log1p(params['max_clicks']), 1.0)
+    time_norm = min(max(stats['total_time_seconds'], 0.0), params['max_time']) / params['max_time']
+    weight = (0.35 * time_norm + 0.20 * clicks_norm
+              + 0.15 * stats['avg_session_quality'] + 0.10 * stats['avg_device_quality']
+              + 0.05 * stats['avg_env_quality'] + 0.05 * stats['avg_referrer_quality']
+              + 0.05 * stats['avg_os_quality'] + 0.03 * stats['avg_country_quality']
+              + 0.02 * stats['avg_region_quality'])
+    return float(min(max(weight, 0.1), 1.0))
+
+
+def update_profiles(profiles, interaction_stats, params):
+    """
+    Fusionne les stats du lot dans les profils enrichis (modifiés en place)
+
+    Returns:
+        Liste des user_id mis à jour
+    """
+    updated_users = []
+    for user_id, rows in interaction_stats.groupby('user_id', sort=True):
+        user_id = int(user_id)
+        profile = profiles.setdefault(user_id, {'articles_read': [], 'article_weights': {}})
+        article_stats = profile.setdefault('article_stats', {})
+        article_weights = profile.setdefault('article_weights', {})
+
+        for row in rows.to_dict('records'):
+            article_id = int(row['article_id'])
+            new_stats = {
+                'num_clicks': int(row['num_clicks']),
+                'total_time_seconds': float(row['total_time_seconds']),
+                'avg_time_seconds': float(row['avg_time_seconds']),
+                'median_time_seconds': float(row['median_time_seconds']),
+                'first_click_ts': int(row['first_click']),
+                'last_click_ts': int(row['last_click']),
+                **{f"avg_{s}_quality": float(row[f"avg_{s}_quality"]) for s in QUALITY_SIGNALS},
+                'avg_session_size': float(row['avg_session_size'])
+            }
+            stats = merge_article_stats(article_stats.get(article_id), new_stats)
+            stats['weight'] = interaction_weight(stats, params)
+            article_stats[article_id] = stats
+            article_weights[article_id] = stats['weight']
+
+        # Historique ordonné par premier clic (articles sans stats conservés en tête, ordre d'origine)
+        known = [a for a in profile['articles_read'] if a not in article_stats]
+        profile['articles_read'] = known + sorted(article_stats, key=lambda a: article_stats[a]['first_click_ts'])
+
+        all_stats = list(article_stats.values())
+        profile['num_interactions'] = int(sum(s['num_clicks'] for s in all_stats))
+        profile['num_articles'] = len(profile['articles_read'])
+        profile['total_time_seconds'] = float(sum(s['total_time_seconds'] for s in all_stats))
+        profile['avg_weight'] = float(np.mean([s['weight'] for s in all_stats]))
+        for signal in ('session', 'device', 'referrer', 'os', 'country', 'region'):
+            profile[f"avg_{signal}_quality"] = float(np.mean([s[f"avg_{signal}_quality"] for s in all_stats]))
+
+        updated_users.append(user_id)
+    return updated_users
+
+
+def update_popularity(models_dir: Path, df_clicks):
+    """
+    Ajoute les clics/sessions du lot aux compteurs de article_popularity.pkl
+
+    Returns:
+        (article_ids, popularity_scores) pour le delta, None si la popularité n'a pas de compteurs
+    """
+    with open(models_dir / "article_popularity.pkl", 'rb') as f:
+        popularity = pickle.load(f)
+    if not isinstance(popularity, pd.DataFrame) or 'num_sessions' not in popularity.columns:
+        print("  ⚠ Popularité sans compteurs (num_clicks/num_sessions): inchangée")
+        return None
+
+    batch = df_clicks.groupby('click_article_id').agg({'user_id': 'count', 'session_id': 'nunique'})
+    batch = batch.rename(columns={'user_id': 'num_clicks', 'session_id': 'num_sessions'})
+    counts = popularity[['num_clicks', 'num_sessions']].add(batch, fill_value=0).astype(np.int64)
+    counts.index.name = popularity.index.name
+
+    counts['popularity_score'] = (
+        0.7 * (counts['num_clicks'] / counts['num_clicks'].max()) +
+        0.3 * (counts['num_sessions'] / counts['num_sessions'].max())
+    )
+    popularity = counts.sort_values('popularity_score', ascending=False)
+
+    tmp_path = models_dir / "article_popularity.pkl.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(popularity, f)
+    os.replace(tmp_path, models_dir / "article_popularity.pkl")
+    print(f"  ✓ Popularité: {len(batch):,} articles mis à jour ({len(popularity):,} au total)")
+    return popularity.index.values, popularity['popularity_score'].values
+
+
+def update_matrices(models_dir: Path, delta, mappings):
+    """Remplace les lignes des utilisateurs du delta dans les matrices user-item"""
+    user_rows = np.array([mappings['user_to_idx'].get(user_id, -1) for user_id in delta.user_ids.tolist()],
+                         dtype=np.int64)
+    article_cols = np.array([mappings['article_to_idx'].get(article_id, -1)
+                             for article_id in delta.article_ids.tolist()], dtype=np.int64)
+    known_rows = user_rows[user_rows >= 0]
+    if len(known_rows) == 0:
+        return None
+
+    for filename, values in (("user_item_matrix.npz", delta.num_clicks),
+                             ("user_item_matrix_weighted.npz", delta.weights)):
+        path = models_dir / filename
+        if not path.exists():
+            continue
+        matrix = load_npz(path).tocsr()
+        rows = delta.matrix_rows(user_rows, article_cols, values, matrix.shape[1])
+        tmp_path = models_dir / f"{filename}.tmp"
+        with open(tmp_path, 'wb') as f:
+            save_npz(f, replace_csr_rows(matrix, known_rows, rows.astype(matrix.dtype)))
+        os.replace(tmp_path, path)
+        print(f"  ✓ {filename}: {len(known_rows):,} lignes remplacées")
+
+    return user_rows
+
+
+def update_user_embeddings(models_dir: Path, profiles, delta, user_rows, mappings):
+    """Recalcule les lignes de user_embeddings.npy des utilisateurs connus du delta"""
+    meta_path = models_dir / "user_embeddings.json"
+    if not meta_path.exists() or user_rows is None:
+        return
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    if meta.get('profiles_file') != PROFILES_FILE:
+        print(f"  ⚠ user_embeddings.npy calculé depuis {meta.get('profiles_file')}: non mis à jour")
+        return
+
+    known = np.flatnonzero(user_rows >= 0)
+    user_ids = delta.user_ids[known].tolist()
+    weighted = load_npz(models_dir / "user_item_matrix_weighted.npz").tocsr()[user_rows[known]]
+    with open(models_dir / "embeddings_filtered.pkl", 'rb') as f:
+        embeddings = pickle.load(f)
+
+    rows = compute_user_embeddings(weighted, {user_id: i for i, user_id in enumerate(user_ids)},
+                                   mappings['article_to_idx'], {u: profiles[u] for u in user_ids}, embeddings)
+    # Copie complète puis remplacement atomique: les moteurs en service lisent le fichier
+    # en mémoire mappée, une écriture en place leur exposerait des lignes à moitié écrites
+    user_embeddings = np.load(models_dir / "user_embeddings.npy")
+    user_embeddings[user_rows[known]] = rows
+    tmp_path = models_dir / "user_embeddings.npy.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, user_embeddings)
+    os.replace(tmp_path, models_dir / "user_embeddings.npy")
+    print(f"  ✓ user_embeddings.npy: {len(known):,} lignes recalculées")
+
+
+def update_incremental(models_dir: Path = MODELS_DIR, clicks_dir: str = None, click_log: str = None):
+    """
+    Traite les nouveaux clics et écrit le delta correspondant
+
+    Returns:
+        Chemin du delta écrit, None si aucun nouveau clic
+    """
+    print("\n[1/5] Lecture des nouveaux clics...")
+    state = load_state(models_dir)
+    df_clicks, state = read_new_clicks(state, clicks_dir, click_log)
+    if df_clicks.empty:
+        save_state(models_dir, state)
+        print("  Aucun nouveau clic")
+        return None
+    print(f"  ✓ {len(df_clicks):,} clics, {df_clicks['user_id'].nunique():,} utilisateurs")
+
+    print("\n[2/5] Poids d'interaction des utilisateurs touchés...")
+    params = load_weight_params(models_dir)
+    interaction_stats = aggregate_interactions(compute_click_features(df_clicks, params))
+    with open(models_dir / PROFILES_FILE, 'rb') as f:
+        profiles = pickle.load(f)
+    updated_users = update_profiles(profiles, interaction_stats, params)
+    print(f"  ✓ {len(updated_users):,} profils mis à jour ({len(interaction_stats):,} paires user-article)")
+
+    print("\n[3/5] Popularité...")
+    popularity = update_popularity(models_dir, df_clicks)
+
+    print("\n[4/5] Delta, matrices et embeddings de profil...")
+    base_versions = delta_base_versions(str(models_dir))
+    archived = archive_stale_deltas(str(models_dir), base_versions)
+    if archived:
+        print(f"  ✓ {len(archived)} deltas d'anciens modèles archivés")
+    delta_path = write_delta(str(models_dir), {user_id: profiles[user_id] for user_id in updated_users},
+                             popularity, base_versions)
+    delta = load_delta(delta_path)
+    with open(models_dir / "mappings.pkl", 'rb') as f:
+        mappings = pickle.load(f)
+    user_rows = update_matrices(models_dir, delta, mappings)
+    update_user_embeddings(models_dir, profiles, delta, user_rows, mappings)
+
+    print("\n[5/5] Sauvegarde des profils et de l'état...")
+    tmp_path = models_dir / f"{PROFILES_FILE}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(profiles, f)
+    os.replace(tmp_path, models_dir / PROFILES_FILE)
+    save_state(models_dir, state)
+    print(f"  ✓ {PROFILES_FILE}")
+    print(f"  ✓ Delta: {delta_path}")
+
+    return delta_path
+
+
+def main():
+    """Fonction principale"""
+    parser = argparse.ArgumentParser(description='Mise à jour incrémentale des profils depuis le flux de clics')
+    parser.add_argument('--clicks-dir', type=str, default=None,
+                        help='Dossier des clicks_hour_*.csv (seuls les fichiers non traités sont lus)')
+    parser.add_argument('--click-log', type=str, default=None,
+                        help='Journal de clics JSONL en ajout seul (lu depuis le dernier offset)')
+    parser.add_argument('--models-dir', type=str, default=str(MODELS_DIR),
+                        help='Dossier des modèles (défaut: models/)')
+    args = parser.parse_args()
+
+    if not args.clicks_dir and not args.click_log:
+        parser.error("--clicks-dir ou --click-log requis")
+
+    print("=" * 80)
+    print("MISE À JOUR INCRÉMENTALE DES PROFILS")
+    print("=" * 80)
+
+    start_time = datetime.now()
+    delta_path = update_incremental(Path(args.models_dir), args.clicks_dir, args.click_log)
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    if delta_path:
+        print(f"\n✅ Mise à jour terminée en {elapsed:.1f}s")
+    else:
+        print(f"\n✅ Rien à mettre à jour ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Métriques d'évaluation vectorisées, pour tous les utilisateurs évalués à la fois
+
+Remplace les boucles par utilisateur (appartenance à une liste, filtres pandas sur
+les métadonnées) par des opérations NumPy / scipy.sparse sur deux matrices:
+
+- recommended: (n_users, k) article_id recommandés dans l'ordre du ranking,
+  complétée par PAD quand un utilisateur a moins de k recommandations
+- ground_truth: CSR (n_users, n_articles) des articles de validation
+  (colonnes = position dans article_ids, valeurs = nombre d'occurrences)
+
+Chaque métrique renvoie un vecteur (n_users,) avec les mêmes conventions que les
+méthodes par utilisateur de ImprovedRecommendationEvaluator (0.0 si non définie).
+
+Usage:
+    recommended = recommendation_matrix(recommendations, k=10)
+    ground_truth, article_ids = ground_truth_matrix(relevant_lists)
+    hits = hit_matrix(recommended, ground_truth, article_ids)
+    metrics = ranking_metrics(hits, relevant_counts(ground_truth), ks=(5, 10))
+"""
+
+import numpy as np
+from itertools import chain
+from scipy.sparse import csr_matrix
+from typing import Dict, Optional, Sequence, Tuple
+
+# Case vide de la matrice des recommandations
+PAD = -1
+
+
+def recommendation_matrix(recommendations: Sequence[Sequence[int]], k: int) -> np.ndarray:
+    """Listes de recommandations -> matrice (n_users, k) complétée par PAD"""
+    recommended = np.full((len(recommendations), k), PAD, dtype=np.int64)
+    for row, articles in enumerate(recommendations):
+        articles = list(articles)[:k]
+        recommended[row, :len(articles)] = articles
+    return recommended
+
+
+def dense_index(article_ids: np.ndarray) -> np.ndarray:
+    """Table article_id -> position dans article_ids (-1 si absent), ids >= 0"""
+    article_ids = np.asarray(article_ids, dtype=np.int64)
+    table = np.full(int(article_ids.max()) + 1 if len(article_ids) else 0, -1, dtype=np.int64)
+    table[article_ids] = np.arange(len(article_ids))
+    return table
+
+
+def _positions(table: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Position de chaque id dans la table (-1 si absent ou PAD), accès direct sans recherche"""
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(table) == 0:
+        return np.full(ids.shape, -1, dtype=np.int64)
+    inside = (ids >= 0) & (ids < len(table))
+    return np.where(inside, table[np.where(inside, ids, 0)], -1)
+
+
+def ground_truth_matrix(relevant: Sequence[Sequence[int]],
+                        article_ids: Optional[np.ndarray] = None) -> Tuple[csr_matrix, np.ndarray]:
+    """
+    Articles de validation de chaque utilisateur -> matrice CSR
+
+    Args:
+        relevant: Liste des articles pertinents de chaque utilisateur (doublons comptés)
+        article_ids: Vocabulaire des colonnes (défaut: articles présents dans relevant, triés);
+            les articles hors vocabulaire sont ignorés
+
+    Returns:
+        (ground_truth, article_ids)
+    """
+    lengths = np.fromiter(map(len, relevant), dtype=np.int64, count=len(relevant))
+    flat = np.fromiter(chain.from_iterable(relevant), dtype=np.int64, count=int(lengths.sum()))
+    if article_ids is None:
+        article_ids = np.flatnonzero(np.bincount(flat)) if len(flat) else np.zeros(0, dtype=np.int64)
+
+    rows = np.repeat(np.arange(len(relevant)), lengths)
+    columns = _positions(dense_index(article_ids), flat)
+    known = columns >= 0
+    ground_truth = csr_matrix((np.ones(int(known.sum()), dtype=np.float32), (rows[known], columns[known])),
+                              shape=(len(relevant), len(article_ids)))
+    ground_truth.sum_duplicates()
+    return ground_truth, article_ids
+
+
+def relevant_counts(ground_truth: csr_matrix) -> np.ndarray:
+    """Nombre d'articles pertinents de chaque utilisateur (len(relevant), doublons compris)"""
+    return np.asarray(ground_truth.sum(axis=1)).ravel()
+
+
+def hit_matrix(recommended: np.ndarray, ground_truth: csr_matrix, article_ids: np.ndarray) -> np.ndarray:
+    """Booléens (n_users, k): la recommandation en position j est un article de validation"""
+    columns = _positions(dense_index(article_ids), recommended)
+
+    # Clés (ligne, colonne) des cases non nulles, triées (CSR aux indices triés): une recherche binaire
+    ground_truth = ground_truth.tocsr()
+    ground_truth.sort_indices()
+    n_columns = np.int64(len(article_ids))
+    present = ground_truth.data > 0
+    keys = (np.repeat(np.arange(ground_truth.shape[0], dtype=np.int64), np.diff(ground_truth.indptr)) * n_columns
+            + ground_truth.indices)[present]
+    if len(keys) == 0:
+        return np.zeros(recommended.shape, dtype=bool)
+
+    # Requêtes dans l'ordre des lignes (quasi triées): recherche binaire locale
+    queries = np.arange(len(recommended), dtype=np.int64)[:, None] * n_columns + columns
+    positions = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+    return (columns >= 0) & (keys[positions] == queries)
+
+
+def _discounts(k: int) -> np.ndarray:
+    return 1.0 / np.log2(np.arange(k) + 2)
+
+
+def precision_at_k(hits: np.ndarray, k: int) -> np.ndarray:
+    """Precision@K: hits parmi les k premiers / k (0 sans recommandation)"""
+    if k == 0:
+        return np.zeros(len(hits))
+    return hits[:, :k].sum(axis=1) / k
+
+
+def recall_at_k(hits: np.ndarray, n_relevant: np.ndarray, k: int) -> np.ndarray:
+    """Recall@K: hits parmi les k premiers / nombre d'articles pertinents"""
+    n_hits = hits[:, :k].sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n_relevant > 0, n_hits / n_relevant, 0.0)
+
+
+def ndcg_at_k(hits: np.ndarray, n_relevant: np.ndarray, k: int) -> np.ndarray:
+    """NDCG@K (gain binaire, IDCG sur min(k, nombre d'articles pertinents) positions)"""
+    if k == 0 or hits.shape[1] == 0:
+        return np.zeros(len(hits))
+    discounts = _discounts(k)
+    gains = np.where(hits[:, :k], discounts[:hits[:, :k].shape[1]], 0.0)
+    dcg = np.cumsum(gains, axis=1)[:, -1]
+
+    ideal = np.r_[0.0, np.cumsum(discounts)]
+    idcg = ideal[np.minimum(k, n_relevant.astype(np.int64))]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(idcg > 0, dcg / idcg, 0.0)
+
+
+def mrr(hits: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """Reciprocal rank du premier article pertinent (parmi les k premiers si précisé)"""
+    hits = hits[:, :k] if k is not None else hits
+    if hits.shape[1] == 0:
+        return np.zeros(len(hits))
+    first = hits.argmax(axis=1)
+    return np.where(hits.any(axis=1), 1.0 / (first + 1), 0.0)
+
+
+def ranking_metrics(hits: np.ndarray, n_relevant: np.ndarray, ks: Sequence[int] = (5, 10)) -> Dict[str, np.ndarray]:
+    """precision@k, recall@k, ndcg@k pour chaque k, et mrr@max(ks)"""
+    metrics = {f'precision@{k}': precision_at_k(hits, k) for k in ks}
+    metrics.update({f'recall@{k}': recall_at_k(hits, n_relevant, k) for k in ks})
+    metrics.update({f'ndcg@{k}': ndcg_at_k(hits, n_relevant, k) for k in ks})
+    metrics[f'mrr@{max(ks)}'] = mrr(hits, max(ks))
+    return metrics
+
+
+def article_lookup(recommended: np.ndarray, article_ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Valeur d'un attribut d'article pour chaque case de recommended (NaN si inconnu ou PAD)
+
+    Args:
+        article_ids: Articles ayant l'attribut (ordre quelconque)
+        values: Valeur de l'attribut pour chaque article de article_ids
+    """
+    positions = _positions(dense_index(article_ids), recommended)
+    looked_up = np.full(recommended.shape, np.nan)
+    known = positions >= 0
+    looked_up[known] = np.asarray(values, dtype=np.float64)[positions[known]]
+    return looked_up
+
+
+def _row_nunique(values: np.ndarray) -> np.ndarray:
+    """Nombre de valeurs distinctes (hors NaN) de chaque ligne"""
+    sorted_values = np.sort(values, axis=1)  # NaN en fin de ligne
+    known = ~np.isnan(sorted_values)
+    new = np.ones(sorted_values.shape, dtype=bool)
+    new[:, 1:] = sorted_values[:, 1:] != sorted_values[:, :-1]
+    return (new & known).sum(axis=1)
+
+
+def category_diversity(categories: np.ndarray, n_recommended: np.ndarray) -> np.ndarray:
+    """Catégories distinctes / articles connus (diversity_score)"""
+    n_known = (~np.isnan(categories)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where((n_recommended > 0) & (n_known > 0), _row_nunique(categories) / n_known, 0.0)
+
+
+def intra_user_diversity(categories: np.ndarray, publishers: np.ndarray, n_recommended: np.ndarray) -> np.ndarray:
+    """0.7 × diversité des catégories + 0.3 × diversité des publishers (0 si <= 1 recommandation)"""
+    n_known = (~np.isnan(categories)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        diversity = 0.7 * (_row_nunique(categories) / n_known) + 0.3 * (_row_nunique(publishers) / n_known)
+    return np.where((n_recommended > 1) & (n_known > 0), diversity, 0.0)
+
+
+def novelty(popularity: np.ndarray, max_popularity: float, n_recommended: np.ndarray) -> np.ndarray:
+    """Moyenne de 1 - popularité / popularité max sur les articles de popularité connue"""
+    scores = 1.0 - popularity / max_popularity
+    known = ~np.isnan(scores)
+    n_known = known.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(known, scores, 0.0).sum(axis=1) / n_known
+    return np.where((n_recommended > 0) & (n_known > 0), mean, 0.0)
+
+
+def temporal_diversity(created_ts: np.ndarray, now_ts: int, n_recommended: np.ndarray) -> np.ndarray:
+    """Coefficient de variation de l'âge des articles, plafonné à 1 (0 si <= 1 article daté)"""
+    ages_days = (now_ts - created_ts) / (86400 * 1000)
+    known = ~np.isnan(ages_days)
+    n_known = known.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_age = np.where(known, ages_days, 0.0).sum(axis=1) / n_known
+        variance = np.where(known, (ages_days - mean_age[:, None]) ** 2, 0.0).sum(axis=1) / n_known
+        cv = np.minimum(np.sqrt(variance) / mean_age, 1.0)
+    return np.where((n_recommended > 1) & (n_known > 1) & (mean_age != 0), cv, 0.0)
+
+
+def gini_coefficient(recommended: np.ndarray) -> float:
+    """Gini de la distribution des articles recommandés (0 = équilibré, 1 = bulle de filtre)"""
+    _, counts = np.unique(recommended[recommended != PAD], return_counts=True)
+    n = len(counts)
+    if n == 0:
+        return 0.0
+    counts = np.sort(counts)
+    index = np.arange(1, n + 1)
+    return float((2 * np.sum(index * counts)) / (n * np.sum(counts)) - (n + 1) / n)
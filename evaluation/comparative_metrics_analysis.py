@@ -14,6 +14,7 @@ But: Comparer ces deux approches et voir laquelle est plus pertinente
      pour mesurer l'intérêt réel de l'utilisateur
 """
 
+import sys
 import pandas as pd
 import numpy as np
 import json
@@ -24,6 +25,9 @@ from datetime import datetime
 BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / "news-portal-user-interactions-by-globocom"
 CLICKS_DIR = DATA_DIR / "clicks"
+
+sys.path.insert(0, str(BASE_DIR / "data_preparation"))
+from click_reader import iter_click_chunks, list_click_files
 OUTPUT_DIR = Path(__file__).parent
 
 # Paramètres de lecture
@@ -31,6 +35,9 @@ READING_SPEED_WPM = 200  # Mots par minute (vitesse moyenne de lecture)
 MIN_READ_TIME_SECONDS = 5  # Minimum pour considérer qu'un article a été lu
 MAX_READ_TIME_MINUTES = 60  # Maximum raisonnable pour lire un article
 
+# Colonnes lues (session_id inutile aux métriques par utilisateur)
+SEQUENCE_COLUMNS = ['user_id', 'click_article_id', 'click_timestamp']
+
 class ComparativeMetricsAnalyzer:
     def __init__(self):
         self.metadata = None
@@ -46,14 +53,15 @@ class ComparativeMetricsAnalyzer:
         print(f"  ✓ {len(self.metadata):,} articles chargés")
 
         # Charger un échantillon de clics (premiers 10 fichiers pour rapidité)
-        clicks_files = sorted(CLICKS_DIR.glob("clicks_hour_*.csv"))[:10]
+        # Les métriques portent sur la séquence complète de chaque utilisateur (écarts entre
+        # clics consécutifs): l'échantillon est assemblé, réduit aux colonnes utiles
+        clicks_files = list_click_files(CLICKS_DIR, limit=10)
 
         clicks_list = []
-        for i, file in enumerate(clicks_files, 1):
-            df = pd.read_csv(file)
+        for i, df in enumerate(iter_click_chunks(columns=SEQUENCE_COLUMNS, files=clicks_files), 1):
             clicks_list.append(df)
             if i % 5 == 0:
-                print(f"  ✓ {i} fichiers de clics chargés...")
+                print(f"  ✓ {i} chunks de clics chargés...")
 
         self.clicks = pd.concat(clicks_list, ignore_index=True)
         print(f"  ✓ {len(self.clicks):,} interactions chargées")
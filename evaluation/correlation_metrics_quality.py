@@ -8,6 +8,7 @@ Question: Si on augmente le temps passé (+83%), est-ce que:
   C) Un mix des deux ?
 """
 
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -17,12 +18,18 @@ import json
 BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = BASE_DIR / "news-portal-user-interactions-by-globocom"
 CLICKS_DIR = DATA_DIR / "clicks"
+
+sys.path.insert(0, str(BASE_DIR / "data_preparation"))
+from click_reader import iter_click_chunks, list_click_files
 OUTPUT_DIR = Path(__file__).parent
 
 READING_SPEED_WPM = 200
 MIN_READ_TIME_SECONDS = 5
 MAX_READ_TIME_MINUTES = 60
 
+# Colonnes lues (session_id inutile aux métriques par utilisateur)
+SEQUENCE_COLUMNS = ['user_id', 'click_article_id', 'click_timestamp']
+
 print("="*80)
 print("ANALYSE: RATIO D'ENGAGEMENT → TAUX DE LECTURE")
 print("="*80)
@@ -44,13 +51,11 @@ class QualityCorrelationAnalyzer:
         self.metadata = pd.read_csv(metadata_path)
 
         # Charger échantillon de clics (10 premiers fichiers)
-        clicks_files = sorted(CLICKS_DIR.glob("clicks_hour_*.csv"))[:10]
-        clicks_list = []
-        for file in clicks_files:
-            df = pd.read_csv(file)
-            clicks_list.append(df)
-
-        self.clicks = pd.concat(clicks_list, ignore_index=True)
+        # Les métriques portent sur la séquence complète de chaque utilisateur (écarts entre
+        # clics consécutifs): l'échantillon est assemblé, réduit aux colonnes utiles
+        clicks_files = list_click_files(CLICKS_DIR, limit=10)
+        self.clicks = pd.concat(iter_click_chunks(columns=SEQUENCE_COLUMNS, files=clicks_files),
+                                ignore_index=True)
         print(f"  ✓ {len(self.clicks):,} interactions chargées")
         print(f"  ✓ {self.clicks['user_id'].nunique():,} utilisateurs uniques")
 
@@ -61,8 +61,6 @@ print(f"\n" + "="*80)
 print("RECOMMANDATIONS GÉNÉRÉES")
 print("="*80)
 
-evaluator._mask_user_profile(user_id)
-
 recommendations = evaluator.engine.recommend(
     user_id=user_id,
     n_recommendations=10,
@@ -70,11 +68,10 @@ recommendations = evaluator.engine.recommend(
     weight_content=0.40,
     weight_trend=0.30,
     use_diversity=False,
-    reference_timestamp=ref_ts
+    reference_timestamp=ref_ts,
+    user_history=train_articles  # Historique train uniquement (le profil du moteur n'est pas modifié)
 )
 
-evaluator._restore_user_profile(user_id)
-
 print(f"\n{len(recommendations)} recommandations:")
 recommended_ids = [rec['article_id'] for rec in recommendations]
 
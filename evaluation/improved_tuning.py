@@ -1,6 +1,7 @@
 """
-Script d'optimisation amélioré avec masking des profils utilisateurs
-Résout le problème des métriques à 0 en créant des profils train/test séparés
+Script d'optimisation amélioré avec split temporel train/validation des profils utilisateurs
+Résout le problème des métriques à 0 en recommandant à partir de l'historique train uniquement
+(vues en lecture seule du split: le moteur n'est jamais modifié, évaluation multi-thread possible)
 """
 
 import sys
@@ -10,13 +11,18 @@ import numpy as np
 import pandas as pd
 import pickle
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime
 from recommendation_engine import RecommendationEngine
+from batch_metrics import (PAD, recommendation_matrix, ground_truth_matrix, relevant_counts, hit_matrix,
+                           ranking_metrics, article_lookup, category_diversity, intra_user_diversity,
+                           temporal_diversity, novelty)
+from temporal_split import TemporalSplit
 import logging
 from itertools import product
 from tqdm import tqdm
-import copy
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,22 +31,40 @@ logger = logging.getLogger(__name__)
 class ImprovedRecommendationEvaluator:
     """Classe améliorée pour évaluer les performances du système de recommandation"""
 
-    def __init__(self, models_path: str = "../models"):
+    def __init__(self, models_path: str = "../models", use_bundle: bool = True):
         self.models_path = models_path
+        self.use_bundle = use_bundle  # Bundle en mémoire mappée (pages partagées entre processus)
         self.engine = None
-        self.original_user_profiles = None
+        self.split = None  # TemporalSplit: offsets de coupure train/validation dans les historiques
         self.train_interactions = None
         self.val_interactions = None
         self.user_reference_timestamps = {}  # Date de référence (dernier article train) par utilisateur
+        # Candidats bruts des 3 sources, recombinés pour chaque jeu de poids (voir evaluate_user)
+        # clé (user, version des profils, date de référence, fenêtre, k) -> ComponentScores
+        self.split_version = 0
+        # Poids d'interaction des historiques train (ProfileStore, ex: poids d'un trial de tuning_12),
+        # None = matrice pondérée du moteur; weights_version identifie le jeu de poids courant
+        self.interaction_weights = None
+        self.weights_version = 0
+        self.profile_version = 0  # Voir _current_profile_version
+        self._cache_state = None
+        self.component_cache = {}
+        self.personal_cache = {}  # (user, version des profils, k) -> ComponentScores (collab/content)
+        self.article_features = None  # Attributs des articles en tableaux (voir _article_features)
 
     def load_engine(self):
         """Charge le moteur de recommandation"""
         logger.info("Chargement du moteur de recommandation...")
-        self.engine = RecommendationEngine(models_path=self.models_path)
+        # Historiques train passés en paramètre (user_history): le moteur n'est pas modifié,
+        # le bundle peut donc rester en lecture seule (mmap) et être partagé entre workers;
+        # candidats pré-calculés et cache de résultats (profils complets) inutiles ici
+        self.engine = RecommendationEngine(models_path=self.models_path, use_bundle=self.use_bundle,
+                                           use_precomputed=False, use_result_cache=False)
         self.engine.load_models()
 
-        # Sauvegarder les profils originaux
-        self.original_user_profiles = copy.deepcopy(self.engine.user_profiles)
+        self.component_cache.clear()
+        self.personal_cache.clear()
+        self.article_features = None
 
         logger.info("✓ Moteur chargé")
 
@@ -54,302 +78,251 @@ class ImprovedRecommendationEvaluator:
         """
         logger.info(f"Création du split temporel (train: {train_ratio*100:.0f}%, val: {(1-train_ratio)*100:.0f}%)...")
 
-        train_interactions = {}
-        val_interactions = {}
-        user_reference_timestamps = {}
+        # Split temporel: les articles sont déjà triés chronologiquement; seuls les offsets
+        # de coupure sont stockés (vues sur les historiques du moteur, sans copie)
+        self.split = TemporalSplit.from_profiles(self.engine.user_profiles, train_ratio=train_ratio,
+                                                 min_interactions=min_interactions,
+                                                 article_store=self.engine.article_store)
 
-        # Pour chaque utilisateur, split ses interactions par temps
-        for user_id, profile in tqdm(self.original_user_profiles.items(), desc="Split des utilisateurs"):
-            articles = profile['articles_read']
+        self.train_interactions = self.split.train
+        self.val_interactions = self.split.val
+        # Date de référence = timestamp du dernier article train
+        self.user_reference_timestamps = self.split.reference_timestamps()
 
-            if len(articles) < min_interactions:  # Besoin de suffisamment d'interactions
-                continue
+        # Historiques train modifiés: les candidats en cache ne sont plus valides
+        self.split_version += 1
+        self.component_cache.clear()
+        self.personal_cache.clear()
 
-            # Split temporel : les articles sont déjà triés chronologiquement
-            split_idx = int(len(articles) * train_ratio)
+        logger.info(f"✓ Split créé: {len(self.split)} utilisateurs")
+        logger.info(f"  - Train: {self.train_interactions.n_interactions()} interactions")
+        logger.info(f"  - Val: {self.val_interactions.n_interactions()} interactions")
 
-            # S'assurer qu'on a au moins 1 article dans chaque split
-            if split_idx > 0 and split_idx < len(articles):
-                train_interactions[user_id] = articles[:split_idx]
-                val_interactions[user_id] = articles[split_idx:]
+        return self.train_interactions, self.val_interactions
 
-                # Calculer la date de référence = timestamp du dernier article train
-                last_train_article_id = articles[split_idx - 1]
-                if last_train_article_id in self.engine.article_timestamps:
-                    user_reference_timestamps[user_id] = self.engine.article_timestamps[last_train_article_id]
-
-        self.train_interactions = train_interactions
-        self.val_interactions = val_interactions
-        self.user_reference_timestamps = user_reference_timestamps
-
-        logger.info(f"✓ Split créé: {len(train_interactions)} utilisateurs")
-        logger.info(f"  - Train: {sum(len(v) for v in train_interactions.values())} interactions")
-        logger.info(f"  - Val: {sum(len(v) for v in val_interactions.values())} interactions")
-
-        return train_interactions, val_interactions
-
-    def _mask_user_profile(self, user_id: int):
+    def set_interaction_weights(self, weights_store, version=None):
         """
-        Remplace temporairement le profil utilisateur par le profil train uniquement
+        Poids d'interaction à utiliser pour l'embedding de profil content-based des historiques train
 
         Args:
-            user_id: ID de l'utilisateur
+            weights_store: ProfileStore dont les poids donnent celui de chaque (utilisateur, article),
+                None = lignes de la matrice pondérée du moteur
+            version: Identifiant du jeu de poids (ex: numéro de trial); les tableaux pouvant être
+                réécrits en place, une nouvelle version invalide les candidats en cache
+                (défaut: version suivante)
         """
-        if user_id in self.train_interactions:
-            self.engine.user_profiles[user_id] = {
-                'articles_read': self.train_interactions[user_id]
-            }
+        self.interaction_weights = weights_store
+        self.weights_version = self.weights_version + 1 if version is None else version
 
-    def _restore_user_profile(self, user_id: int):
+    def _train_weights(self, user_id: int) -> Optional[np.ndarray]:
         """
-        Restaure le profil utilisateur original
-
-        Args:
-            user_id: ID de l'utilisateur
-        """
-        if user_id in self.original_user_profiles:
-            self.engine.user_profiles[user_id] = self.original_user_profiles[user_id]
-
-    def precision_at_k(self, recommended: List[int], relevant: List[int], k: int) -> float:
-        """Calcule Precision@K"""
-        if k == 0 or len(recommended) == 0:
-            return 0.0
-
-        recommended_at_k = recommended[:k]
-        relevant_set = set(relevant)
-
-        hits = len([article for article in recommended_at_k if article in relevant_set])
+        Poids des articles de l'historique train d'un utilisateur (set_interaction_weights)
 
-        return hits / k
-
-    def recall_at_k(self, recommended: List[int], relevant: List[int], k: int) -> float:
-        """Calcule Recall@K"""
-        if len(relevant) == 0:
-            return 0.0
-
-        recommended_at_k = recommended[:k]
-        relevant_set = set(relevant)
-
-        hits = len([article for article in recommended_at_k if article in relevant_set])
-
-        return hits / len(relevant)
-
-    def ndcg_at_k(self, recommended: List[int], relevant: List[int], k: int) -> float:
-        """Calcule NDCG@K (Normalized Discounted Cumulative Gain)"""
-        if len(relevant) == 0:
-            return 0.0
-
-        recommended_at_k = recommended[:k]
-        relevant_set = set(relevant)
-
-        # DCG
-        dcg = 0.0
-        for i, article in enumerate(recommended_at_k):
-            if article in relevant_set:
-                dcg += 1.0 / np.log2(i + 2)
-
-        # IDCG (DCG idéal)
-        idcg = sum(1.0 / np.log2(i + 2) for i in range(min(k, len(relevant))))
-
-        if idcg == 0:
-            return 0.0
-
-        return dcg / idcg
-
-    def mrr(self, recommended: List[int], relevant: List[int]) -> float:
-        """
-        Calcule MRR (Mean Reciprocal Rank)
-        Mesure à quelle position apparaît le premier article pertinent
+        Returns:
+            Un poids par article (0 si l'article n'a pas de poids), None si pas de poids fournis
+            ou utilisateur inconnu du store
         """
-        relevant_set = set(relevant)
-
-        for i, article in enumerate(recommended):
-            if article in relevant_set:
-                return 1.0 / (i + 1)
-
-        return 0.0
+        store = self.interaction_weights
+        if store is None:
+            return None
+        row = store.user_index.rows([user_id])[0]
+        if row < 0:
+            return None
 
-    def diversity_score(self, recommended_articles: List[int]) -> float:
+        history = self.train_interactions[user_id]
+        weights = np.zeros(len(history), dtype=np.float32)
+        start, stop = int(store.offsets[row]), int(store.offsets[row + 1])
+        if stop == start:
+            return weights
+
+        # Lookup (utilisateur, article) -> poids par recherche dichotomique dans la ligne du store
+        articles = store.article_ids[start:stop]
+        order = np.argsort(articles, kind='stable')
+        pos = np.minimum(np.searchsorted(articles[order], history), stop - start - 1)
+        found = articles[order][pos] == history
+        weights[found] = store.weights[start:stop][order[pos[found]]]
+        return weights
+
+    def profiles_changed(self):
         """
-        Calcule un score de diversité basé sur les catégories
+        Invalide les candidats en cache après une modification en place des profils ou des poids
 
-        Returns:
-            Score entre 0 et 1 (1 = très diversifié)
+        Remplacer engine.user_profiles, appliquer un delta (engine.apply_delta) ou refaire le
+        split est détecté automatiquement; une réécriture en place des tableaux ne l'est pas.
         """
-        if len(recommended_articles) == 0:
-            return 0.0
+        self._cache_state = None
 
-        categories = []
-        for article_id in recommended_articles:
-            article_info = self.engine.metadata[self.engine.metadata['article_id'] == article_id]
-            if not article_info.empty:
-                categories.append(article_info.iloc[0]['category_id'])
-
-        if len(categories) == 0:
-            return 0.0
-
-        # Diversité = nombre de catégories uniques / nombre total d'articles
-        return len(set(categories)) / len(categories)
-
-    def novelty_score(self, recommended_articles: List[int], user_id: int) -> float:
+    def _current_profile_version(self) -> int:
         """
-        Calcule un score de nouveauté (articles peu populaires)
+        Version des profils et des poids servant aux candidats en cache
 
-        Returns:
-            Score moyen de nouveauté (popularité inversée, normalisée)
+        Incrémentée (et caches vidés) dès que le split, l'objet engine.user_profiles,
+        les deltas appliqués au moteur ou le jeu de poids d'interaction changent, ou
+        après profiles_changed().
         """
-        if len(recommended_articles) == 0:
-            return 0.0
-
-        novelty_scores = []
-        max_popularity = self.engine.article_popularity['popularity_score'].max()
-
-        for article_id in recommended_articles:
-            if article_id in self.engine.article_popularity.index:
-                popularity = self.engine.article_popularity.loc[article_id, 'popularity_score']
-                # Nouveauté = 1 - popularité normalisée
-                novelty = 1.0 - (popularity / max_popularity)
-                novelty_scores.append(novelty)
-
-        if len(novelty_scores) == 0:
-            return 0.0
-
-        return np.mean(novelty_scores)
-
-    def gini_coefficient(self, all_recommendations: List[List[int]]) -> float:
+        # Compteurs comparés par valeur, profils et poids par identité (pas de comparaison de contenu)
+        versions = (self.split_version, len(self.engine.applied_deltas), self.weights_version)
+        sources = (self.engine.user_profiles, self.interaction_weights)
+        cached = self._cache_state
+        if cached is None or cached[0] != versions or any(a is not b for a, b in zip(cached[1], sources)):
+            self.component_cache.clear()
+            self.personal_cache.clear()
+            self.profile_version += 1
+            self._cache_state = (versions, sources)
+        return self.profile_version
+
+    def _component_scores(self, user_id: int, k: int, max_article_age_days: Optional[float] = None):
         """
-        Calcule le coefficient de Gini pour mesurer la bulle de filtre
+        Candidats bruts (collab, content, tendance) du profil train d'un utilisateur, en cache
 
-        Le coefficient de Gini mesure l'inégalité de distribution des articles recommandés:
-        - 0 = parfaitement équilibré (tous les articles recommandés autant)
-        - 1 = inégalité extrême (bulle de filtre, seuls quelques articles dominent)
+        Collaborative et content-based ne dépendent que de l'historique train (et des poids
+        d'interaction, voir set_interaction_weights): ils sont
+        réutilisés quand seule la fenêtre temporelle change (hyperparamètre Optuna),
+        seule la tendance est alors recalculée.
 
         Args:
-            all_recommendations: Liste de listes d'articles recommandés par utilisateur
+            user_id: ID de l'utilisateur
+            k: Nombre de recommandations
+            max_article_age_days: Fenêtre temporelle de la tendance
+        """
+        # Obtenir le timestamp de référence pour cet utilisateur (date du dernier article train)
+        reference_ts = self.user_reference_timestamps.get(user_id, None)
+        profile_version = self._current_profile_version()
+        key = (user_id, profile_version, reference_ts, max_article_age_days, k)
+
+        components = self.component_cache.get(key)
+        if components is not None:
+            return components
+
+        personal_key = (user_id, profile_version, k)
+        components = self.engine.component_scores(
+            user_id,
+            n_recommendations=k,
+            reference_timestamp=reference_ts,  # Date de référence pour calcul d'âge des articles
+            max_article_age_days=max_article_age_days,  # Fenêtre temporelle (optuna hyperparamètre)
+            personal=self.personal_cache.get(personal_key),
+            user_history=self.train_interactions[user_id],  # IMPORTANT: historique train uniquement
+            user_weights=self._train_weights(user_id)  # Poids du trial (None = matrice pondérée)
+        )
+
+        self.personal_cache[personal_key] = components
+        self.component_cache[key] = components
+        return components
+
+    def _article_features(self) -> Dict[str, np.ndarray]:
+        """
+        Attributs des articles en tableaux alignés (métriques vectorisées), construits une fois
 
         Returns:
-            Coefficient de Gini entre 0 et 1
-
-        Note:
-            State-of-Art: Gini < 0.5 est acceptable, < 0.3 est bon
-            Paper: "Filter Bubbles in Recommender Systems: Fact or Fallacy" (2024)
+            {'article_ids', 'category_id', 'publisher_id', 'created_at_ts'} (métadonnées) et
+            {'popularity_ids', 'popularity'} (score de popularité de base)
         """
-        if len(all_recommendations) == 0:
-            return 0.0
-
-        # Compter la fréquence de chaque article recommandé
-        from collections import Counter
-        article_counts = Counter()
-        for recs in all_recommendations:
-            article_counts.update(recs)
-
-        if len(article_counts) == 0:
-            return 0.0
-
-        # Trier les comptages
-        counts = np.array(sorted(article_counts.values()))
-        n = len(counts)
-
-        if n == 0 or counts.sum() == 0:
-            return 0.0
-
-        # Calcul du coefficient de Gini
-        # Formule: G = (2 * sum(i * x_i)) / (n * sum(x_i)) - (n + 1) / n
-        index = np.arange(1, n + 1)
-        gini = (2 * np.sum(index * counts)) / (n * np.sum(counts)) - (n + 1) / n
-
-        return float(gini)
+        if self.article_features is None:
+            store = self.engine.article_store
+            self.article_features = {
+                'article_ids': store.article_ids,
+                'category_id': store.category_id,
+                'publisher_id': store.publisher_id,
+                'created_at_ts': store.created_at_ts,
+                'popularity_ids': self.engine.popularity_article_ids,
+                'popularity': self.engine.popularity_base_scores
+            }
+        return self.article_features
 
-    def intra_user_diversity(self, recommended_articles: List[int]) -> float:
+    def compute_metrics(self, user_ids: List[int], recommendations: List[List[int]]) -> Dict[str, np.ndarray]:
         """
-        Calcule la diversité intra-utilisateur (variété du contenu pour un seul utilisateur)
-
-        Mesure la variété thématique et temporelle dans les recommandations d'un utilisateur.
-        Plus haute = recommandations plus variées (évite la bulle de filtre)
+        Métriques de ranking, diversité et nouveauté de tous les utilisateurs à la fois (batch_metrics)
 
         Args:
-            recommended_articles: Liste d'articles recommandés pour un utilisateur
+            user_ids: Utilisateurs évalués (ground truth: val_interactions)
+            recommendations: Articles recommandés de chaque utilisateur, dans l'ordre du ranking
 
         Returns:
-            Score de diversité entre 0 et 1 (1 = très diversifié)
-
-        Note:
-            State-of-Art: > 0.6 est bon pour news recommendation
-            Combine diversité de catégories ET de publishers
+            {métrique: vecteur (n_users,)}, mêmes clés que evaluate_user
         """
-        if len(recommended_articles) <= 1:
-            return 0.0
-
-        categories = []
-        publishers = []
-
-        for article_id in recommended_articles:
-            article_info = self.engine.metadata[self.engine.metadata['article_id'] == article_id]
-            if not article_info.empty:
-                categories.append(article_info.iloc[0]['category_id'])
-                publishers.append(article_info.iloc[0]['publisher_id'])
-
-        if len(categories) == 0:
-            return 0.0
+        k = max([10] + [len(recs) for recs in recommendations])
+        recommended = recommendation_matrix(recommendations, k)
+        n_recommended = (recommended != PAD).sum(axis=1)
+
+        ground_truth, article_ids = ground_truth_matrix([self.val_interactions[user_id] for user_id in user_ids])
+        hits = hit_matrix(recommended, ground_truth, article_ids)
+        metrics = ranking_metrics(hits, relevant_counts(ground_truth), ks=(5, 10))  # Métriques de ranking (accuracy)
+
+        features = self._article_features()
+        categories = article_lookup(recommended, features['article_ids'], features['category_id'])
+        publishers = article_lookup(recommended, features['article_ids'], features['publisher_id'])
+        created_ts = article_lookup(recommended, features['article_ids'], features['created_at_ts'])
+        popularity = article_lookup(recommended, features['popularity_ids'], features['popularity'])
+
+        # Métriques de diversité (State-of-Art 2024)
+        metrics['diversity'] = category_diversity(categories, n_recommended)  # Diversité catégories (legacy)
+        metrics['intra_diversity'] = intra_user_diversity(categories, publishers, n_recommended)  # Diversité intra-user
+        metrics['temporal_diversity'] = temporal_diversity(created_ts, int(time.time() * 1000),
+                                                           n_recommended)  # Diversité temporelle
+
+        # Métriques de nouveauté/découverte
+        metrics['novelty'] = novelty(popularity, features['popularity'].max(), n_recommended)
+
+        return metrics
+
+    def _recommend_train(self, user_id: int, weight_collab: float, weight_content: float,
+                         weight_trend: float, k: int,
+                         max_article_age_days: Optional[float] = None) -> Optional[List[int]]:
+        """Articles recommandés à partir de l'historique train (None si pas de ground truth ou erreur)"""
+        # Obtenir les articles de validation (ground truth)
+        if len(self.val_interactions.get(user_id, [])) == 0:
+            return None
 
-        # Diversité = moyenne de diversité de catégories et de publishers
-        category_diversity = len(set(categories)) / len(categories)
-        publisher_diversity = len(set(publishers)) / len(publishers) if len(publishers) > 0 else 0
+        try:
+            # Candidats des 3 sources (ne dépendent pas des poids): calculés une fois par
+            # utilisateur, puis seulement recombinés à chaque essai de poids
+            components = self._component_scores(user_id, k, max_article_age_days)
 
-        # Moyenne pondérée: catégories plus importantes que publishers
-        diversity = 0.7 * category_diversity + 0.3 * publisher_diversity
+            # Générer les recommandations avec les poids donnés
+            recommendations = self.engine.recommend_from_components(
+                components,
+                n_recommendations=k,
+                weight_collab=weight_collab,
+                weight_content=weight_content,
+                weight_trend=weight_trend,
+                use_diversity=False  # Désactiver pour avoir un ranking pur par score
+            )
+        except Exception as e:
+            logger.warning(f"Erreur pour user {user_id}: {e}")
+            return None
 
-        return float(diversity)
+        return [rec['article_id'] for rec in recommendations]
 
-    def temporal_diversity(self, recommended_articles: List[int]) -> float:
+    def evaluate_users(self, user_ids: List[int], weight_collab: float, weight_content: float,
+                       weight_trend: float, k: int = 10, max_article_age_days: Optional[float] = None,
+                       n_threads: int = 1) -> Tuple[List[int], Dict[str, np.ndarray]]:
         """
-        Calcule la diversité temporelle (équilibre articles récents vs anciens)
-
-        Mesure si les recommandations couvrent bien la fenêtre temporelle:
-        - Score élevé = bon équilibre entre articles très récents et moins récents
-        - Score bas = tous les articles ont le même âge (manque de diversité temporelle)
+        Évalue un lot d'utilisateurs: recommandations sur le profil train, puis métriques vectorisées
 
         Args:
-            recommended_articles: Liste d'articles recommandés
+            user_ids: IDs des utilisateurs
+            weight_collab, weight_content, weight_trend: Poids des approches
+            k: Nombre de recommandations à générer
+            max_article_age_days: Fenêtre temporelle (optuna hyperparamètre)
+            n_threads: Utilisateurs évalués en parallèle sur le moteur partagé (lecture seule)
 
         Returns:
-            Score de diversité temporelle entre 0 et 1
-
-        Note:
-            State-of-Art: Variance normalisée de l'âge des articles
-            Pour news: diversité temporelle évite de recommander que du "breaking news"
+            (utilisateurs évalués, {métrique: vecteur par utilisateur évalué})
         """
-        if len(recommended_articles) <= 1:
-            return 0.0
-
-        import time
-        now_ts = int(time.time() * 1000)
+        def recommend_one(user_id):
+            return self._recommend_train(user_id, weight_collab, weight_content, weight_trend,
+                                         k, max_article_age_days)
 
-        ages_days = []
-        for article_id in recommended_articles:
-            if article_id in self.engine.article_timestamps:
-                created_ts = self.engine.article_timestamps[article_id]
-                age_ms = now_ts - created_ts
-                age_days = age_ms / (86400 * 1000)
-                ages_days.append(age_days)
+        if n_threads > 1:
+            with ThreadPoolExecutor(max_workers=n_threads) as executor:
+                all_recommendations = list(executor.map(recommend_one, user_ids))
+        else:
+            all_recommendations = [recommend_one(user_id) for user_id in user_ids]
 
-        if len(ages_days) <= 1:
-            return 0.0
+        evaluated = [user_id for user_id, recs in zip(user_ids, all_recommendations) if recs is not None]
+        recommendations = [recs for recs in all_recommendations if recs is not None]
 
-        # Diversité = coefficient de variation normalisé
-        # Plus l'écart-type est élevé par rapport à la moyenne, plus c'est diversifié
-        ages_array = np.array(ages_days)
-        mean_age = np.mean(ages_array)
-        std_age = np.std(ages_array)
-
-        if mean_age == 0:
-            return 0.0
-
-        # Coefficient de variation normalisé entre 0 et 1
-        # Plafonner à 1 pour éviter valeurs > 1
-        cv = min(std_age / mean_age, 1.0)
-
-        return float(cv)
+        return evaluated, self.compute_metrics(evaluated, recommendations)
 
     def evaluate_user(self, user_id: int, weight_collab: float, weight_content: float,
                       weight_trend: float, k: int = 10, max_article_age_days: Optional[float] = None) -> Dict[str, float]:
@@ -362,75 +335,23 @@ class ImprovedRecommendationEvaluator:
             k: Nombre de recommandations à générer
 
         Returns:
-            Dictionnaire avec les métriques
+            Dictionnaire avec les métriques (None si pas de ground truth ou erreur)
         """
-        # Obtenir les articles de validation (ground truth)
-        relevant_articles = self.val_interactions.get(user_id, [])
-
-        if len(relevant_articles) == 0:
-            return None
-
-        try:
-            # IMPORTANT: Masquer le profil utilisateur pour n'utiliser que le train
-            self._mask_user_profile(user_id)
-
-            # Obtenir le timestamp de référence pour cet utilisateur (date du dernier article train)
-            reference_ts = self.user_reference_timestamps.get(user_id, None)
-
-            # Générer les recommandations avec les poids donnés
-            recommendations = self.engine.recommend(
-                user_id=user_id,
-                n_recommendations=k,
-                weight_collab=weight_collab,
-                weight_content=weight_content,
-                weight_trend=weight_trend,
-                use_diversity=False,  # Désactiver pour avoir un ranking pur par score
-                reference_timestamp=reference_ts,  # Date de référence pour calcul d'âge des articles
-                max_article_age_days=max_article_age_days  # Fenêtre temporelle (optuna hyperparamètre)
-            )
-
-            # Restaurer le profil original
-            self._restore_user_profile(user_id)
-
-            # Extraire les IDs des articles recommandés
-            recommended_articles = [rec['article_id'] for rec in recommendations]
-
-            # Calculer les métriques de performance
-            metrics = {
-                # Métriques de ranking (accuracy)
-                'precision@5': self.precision_at_k(recommended_articles, relevant_articles, 5),
-                'precision@10': self.precision_at_k(recommended_articles, relevant_articles, 10),
-                'recall@5': self.recall_at_k(recommended_articles, relevant_articles, 5),
-                'recall@10': self.recall_at_k(recommended_articles, relevant_articles, 10),
-                'ndcg@5': self.ndcg_at_k(recommended_articles, relevant_articles, 5),
-                'ndcg@10': self.ndcg_at_k(recommended_articles, relevant_articles, 10),
-                'mrr@10': self.mrr(recommended_articles[:10], relevant_articles),  # MRR@10
-
-                # Métriques de diversité (State-of-Art 2024)
-                'diversity': self.diversity_score(recommended_articles),  # Diversité catégories (legacy)
-                'intra_diversity': self.intra_user_diversity(recommended_articles),  # Diversité intra-user
-                'temporal_diversity': self.temporal_diversity(recommended_articles),  # Diversité temporelle
-
-                # Métriques de nouveauté/découverte
-                'novelty': self.novelty_score(recommended_articles, user_id),
-            }
-
-            return metrics
-
-        except Exception as e:
-            logger.warning(f"Erreur pour user {user_id}: {e}")
-            # Toujours restaurer le profil en cas d'erreur
-            self._restore_user_profile(user_id)
+        evaluated, metrics = self.evaluate_users([user_id], weight_collab, weight_content, weight_trend,
+                                                 k=k, max_article_age_days=max_article_age_days)
+        if not evaluated:
             return None
+        return {name: float(values[0]) for name, values in metrics.items()}
 
     def evaluate_weights(self, weight_collab: float, weight_content: float,
-                        weight_trend: float, sample_users: int = None) -> Dict[str, float]:
+                        weight_trend: float, sample_users: int = None, n_threads: int = 1) -> Dict[str, float]:
         """
         Évalue une combinaison de poids sur l'ensemble de validation
 
         Args:
             weight_collab, weight_content, weight_trend: Poids à évaluer
             sample_users: Nombre d'utilisateurs à échantillonner (None = tous)
+            n_threads: Threads d'évaluation (voir evaluate_users)
 
         Returns:
             Moyennes des métriques sur tous les utilisateurs
@@ -440,22 +361,16 @@ class ImprovedRecommendationEvaluator:
         if sample_users and sample_users < len(users):
             users = np.random.choice(users, sample_users, replace=False)
 
-        all_metrics = []
-
-        for user_id in users:
-            metrics = self.evaluate_user(user_id, weight_collab, weight_content, weight_trend, k=10)
-            if metrics:
-                all_metrics.append(metrics)
+        evaluated, metrics = self.evaluate_users(users, weight_collab, weight_content, weight_trend, k=10,
+                                                 n_threads=n_threads)
 
-        if len(all_metrics) == 0:
+        if len(evaluated) == 0:
             return None
 
         # Calculer les moyennes
-        avg_metrics = {}
-        for key in all_metrics[0].keys():
-            avg_metrics[key] = np.mean([m[key] for m in all_metrics])
+        avg_metrics = {key: np.mean(values) for key, values in metrics.items()}
 
-        avg_metrics['n_users_evaluated'] = len(all_metrics)
+        avg_metrics['n_users_evaluated'] = len(evaluated)
 
         return avg_metrics
 
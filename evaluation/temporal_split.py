@@ -0,0 +1,144 @@
+"""
+Split temporel train/validation sans copie des profils utilisateurs
+
+Pour chaque utilisateur retenu, le split ne stocke que trois offsets dans l'historique
+colonnaire du ProfileStore (début, coupure train/validation, fin): les parties train et
+validation sont des vues numpy en lecture seule sur les tableaux du moteur.
+
+Les historiques train sont passés à RecommendationEngine.recommend / component_scores
+(paramètre user_history): le moteur n'est jamais modifié pendant l'évaluation, qui peut
+donc tourner dans plusieurs threads sur un seul moteur partagé.
+
+Usage:
+    split = TemporalSplit.from_profiles(engine.user_profiles, train_ratio=0.8,
+                                        min_interactions=10, article_store=engine.article_store)
+    engine.recommend(user_id, user_history=split.train[user_id],
+                     reference_timestamp=split.reference_timestamp(user_id))
+"""
+
+import numpy as np
+from collections.abc import Mapping
+from itertools import chain
+from typing import Dict, Optional
+
+from profile_store import ProfileStore
+
+
+class HistoryView(Mapping):
+    """user_id -> partie train ou validation de l'historique (vue numpy en lecture seule)"""
+
+    def __init__(self, split: 'TemporalSplit', starts: np.ndarray, stops: np.ndarray):
+        self._split = split
+        self._starts = starts
+        self._stops = stops
+
+    def __getitem__(self, user_id) -> np.ndarray:
+        row = self._split.row(user_id)
+        if row < 0:
+            raise KeyError(user_id)
+        return self._split.article_ids[self._starts[row]:self._stops[row]]
+
+    def __contains__(self, user_id) -> bool:
+        return self._split.row(user_id) >= 0
+
+    def __iter__(self):
+        return iter(self._split.user_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self._split.user_ids)
+
+    def n_interactions(self) -> int:
+        """Nombre total d'articles de cette partie"""
+        return int((self._stops - self._starts).sum())
+
+
+class TemporalSplit:
+    """
+    Split temporel: offset de coupure de chaque utilisateur dans l'historique colonnaire
+
+    Attributes:
+        article_ids: Historiques concaténés (tableau du ProfileStore, en lecture seule)
+        user_ids: Utilisateurs retenus, dans l'ordre des profils
+        starts, cuts, stops: train = article_ids[start:cut], validation = article_ids[cut:stop]
+        reference_ts: Date de référence (création du dernier article train), -1 si inconnue
+        train, val: Mappings user_id -> vue de l'historique
+    """
+
+    def __init__(self, article_ids: np.ndarray, user_ids: np.ndarray, starts: np.ndarray,
+                 cuts: np.ndarray, stops: np.ndarray, reference_ts: np.ndarray):
+        self.article_ids = article_ids.view()
+        self.article_ids.flags.writeable = False
+        self.user_ids = user_ids
+        self.starts = starts
+        self.cuts = cuts
+        self.stops = stops
+        self.reference_ts = reference_ts
+        self._rows = {user_id: row for row, user_id in enumerate(user_ids.tolist())}
+        self.train = HistoryView(self, starts, cuts)
+        self.val = HistoryView(self, cuts, stops)
+
+    @classmethod
+    def from_profiles(cls, profiles: Mapping, train_ratio: float = 0.8, min_interactions: int = 10,
+                      article_store=None) -> 'TemporalSplit':
+        """
+        Coupe chaque historique (déjà trié chronologiquement) à int(len * train_ratio)
+
+        Args:
+            profiles: ProfileStore du moteur (tableaux utilisés sans copie), ou dict de profils
+            train_ratio: Ratio de données pour le train (0.8 = 80%)
+            min_interactions: Nombre minimum d'interactions pour inclure un utilisateur
+            article_store: ArticleMetadataStore pour les dates de référence (None = pas de date)
+        """
+        if isinstance(profiles, ProfileStore) and not profiles.has_overrides:
+            # Historiques du store: ordre d'itération = user_id croissants
+            user_ids = profiles.user_index.sorted_ids
+            rows = profiles.user_index.positions
+            article_ids = profiles.article_ids
+            starts = profiles.offsets[rows]
+            stops = profiles.offsets[rows + 1]
+        else:
+            user_ids = np.fromiter((int(user_id) for user_id in profiles), dtype=np.int64, count=len(profiles))
+            histories = [profiles[user_id]['articles_read'] for user_id in profiles]
+            lengths = np.fromiter(map(len, histories), dtype=np.int64, count=len(histories))
+            article_ids = np.fromiter(chain.from_iterable(histories), dtype=np.int64, count=int(lengths.sum()))
+            offsets = np.r_[0, np.cumsum(lengths)]
+            starts, stops = offsets[:-1], offsets[1:]
+
+        counts = stops - starts
+        split_idx = (counts * train_ratio).astype(np.int64)
+
+        # Besoin de suffisamment d'interactions, et d'au moins 1 article dans chaque split
+        keep = (counts >= min_interactions) & (split_idx > 0) & (split_idx < counts)
+        starts, stops = starts[keep], stops[keep]
+        cuts = starts + split_idx[keep]
+
+        # Date de référence = timestamp du dernier article train
+        reference_ts = np.full(len(cuts), -1, dtype=np.int64)
+        if article_store is not None and len(cuts):
+            article_rows = article_store.rows(article_ids[cuts - 1])
+            found = article_rows >= 0
+            reference_ts[found] = article_store.created_at_ts[article_rows[found]]
+
+        return cls(article_ids, user_ids[keep], starts, cuts, stops, reference_ts)
+
+    def row(self, user_id) -> int:
+        """Ligne de l'utilisateur dans le split (-1 s'il n'a pas été retenu)"""
+        return self._rows.get(user_id, -1)
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self._rows
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def reference_timestamp(self, user_id) -> Optional[int]:
+        """Date de référence en ms (None si l'utilisateur ou son dernier article train est inconnu)"""
+        row = self.row(user_id)
+        if row < 0 or self.reference_ts[row] < 0:
+            return None
+        return int(self.reference_ts[row])
+
+    def reference_timestamps(self) -> Dict[int, int]:
+        """user_id -> date de référence, pour les utilisateurs dont elle est connue"""
+        known = self.reference_ts >= 0
+        return dict(zip(self.user_ids[known].tolist(), self.reference_ts[known].tolist()))
@@ -1,6 +1,8 @@
 """
 TUNING PARALLÉLISÉ AVEC CONTRAINTES STATE-OF-ART (v8 - 27 DEC 2024)
-- Parallélisation des évaluations utilisateurs (adapté pour 16 cores / 30GB RAM)
+- Parallélisation des évaluations utilisateurs (un worker par cœur)
+- Workers en lecture seule: bundle de modèles en mémoire mappée (pages partagées) et
+  poids d'interaction en mémoire partagée, réécrits par le processus principal à chaque trial
 - Early stopping progressif: 10 → 30 → 50 users
 - 13 HYPERPARAMÈTRES: 9 niveau 1 (signaux) + 3 niveau 2 (stratégies) + 1 fenêtre temporelle
 
@@ -29,15 +31,20 @@ import json
 import numpy as np
 import pandas as pd
 import multiprocessing
+from multiprocessing import shared_memory
 from functools import partial
+from typing import Dict, List, Tuple
 from improved_tuning import ImprovedRecommendationEvaluator
+from model_bundle import IdIndex
+from profile_store import ProfileStore
 import optuna
 from optuna.samplers import TPESampler
 
-# Configuration adaptée pour Ryzen 7 Pro 7735U (16 threads, 30GB RAM)
+# Configuration
 N_TRIALS = 30
 N_USERS = 50
-N_WORKERS = 12  # 30GB RAM / 2.5GB par worker = 12 workers max (garder marge)
+# Modèles mappés et poids partagés: un worker ne coûte plus que son split (quelques Mo)
+N_WORKERS = os.cpu_count() or 1
 BASELINE_SCORE = 0.2124
 
 # Seuils early stopping
@@ -48,23 +55,154 @@ THRESHOLD_PHASE2 = 0.08  # Ajusté pour score revenue-optimized (Precision-based
 STATS_PATH = "../models/interaction_stats_enriched.csv"
 
 
-def init_worker():
-    """Initialise chaque worker avec son propre evaluator"""
-    global worker_evaluator
+def share_array(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, np.ndarray, Tuple]:
+    """Copie un tableau dans un segment de mémoire partagée -> (segment, tableau, spec pour attach_array)"""
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+    shared[:] = array
+    return segment, shared, (segment.name, array.shape, array.dtype.str)
+
+
+def attach_array(spec: Tuple) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """Ouvre un tableau créé par share_array dans un autre processus (sans copie)"""
+    name, shape, dtype = spec
+    segment = shared_memory.SharedMemory(name=name)
+    return segment, np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+
+
+# Signaux de niveau 1: paramètre Optuna -> colonne de InteractionSignals.matrix
+SIGNAL_COLUMNS = ('w_time', 'w_clicks', 'w_session', 'w_device', 'w_env',
+                  'w_referrer', 'w_os', 'w_country', 'w_region')
+
+# Facteur de visibilité pub in-article basé sur temps de lecture
+# Transition douce entre 20s et 40s (sigmoid)
+SEUIL_PUB_INARTICLE = 30  # secondes (temps pour scroller jusqu'à la pub)
+TRANSITION_WIDTH = 5       # largeur de la transition
+
+
+class InteractionSignals:
+    """
+    Les 9 signaux normalisés de stats_df, calculés une seule fois (matrice float32 lignes × 9)
+
+    Lignes triées par utilisateur (ordre des lignes conservé pour chaque utilisateur):
+    l'utilisateur user_ids[i] occupe les lignes offsets[i]:offsets[i + 1]. Un jeu de poids
+    niveau 1 ne coûte plus qu'un produit matrice-vecteur, le facteur de visibilité et un clip.
+
+    Facteur de visibilité de pub in-article basé sur le temps de lecture:
+    - Temps ≥30s → Facteur 1.0 (pub interstitielle + in-article vues)
+    - Temps <30s → Facteur 0.6 (probablement seulement pub interstitielle vue)
+
+    Justification: 96% du dataset a temps ≥30s, médiane à 30s
+    """
+
+    def __init__(self, stats_df: pd.DataFrame):
+        user_ids = stats_df['user_id'].to_numpy(dtype=np.int64)
+        order = np.argsort(user_ids, kind='stable')
+        sorted_users = user_ids[order]
+        starts = np.flatnonzero(np.r_[True, sorted_users[1:] != sorted_users[:-1]]) if len(sorted_users) \
+            else np.zeros(0, dtype=np.int64)
+        self.user_ids = sorted_users[starts]
+        self.offsets = np.r_[starts, len(sorted_users)].astype(np.int64)
+        self.article_ids = stats_df['article_id'].to_numpy(dtype=np.int64)[order]
+
+        # Normaliser les features
+        num_clicks = stats_df['num_clicks'].to_numpy(dtype=np.float64)[order]
+        total_time = stats_df['total_time_seconds'].to_numpy(dtype=np.float64)[order]
+        max_clicks = num_clicks.max()
+        max_time = stats_df['total_time_seconds'].quantile(0.99)
+
+        self.matrix = np.empty((len(order), len(SIGNAL_COLUMNS)), dtype=np.float32)
+        self.matrix[:, 0] = np.clip(total_time, 0, max_time) / max_time
+        self.matrix[:, 1] = np.log1p(num_clicks) / np.log1p(max_clicks)
+        for column, name in enumerate(['avg_session_quality', 'avg_device_quality', 'avg_env_quality',
+                                       'avg_referrer_quality', 'avg_os_quality', 'avg_country_quality',
+                                       'avg_region_quality'], start=2):
+            self.matrix[:, column] = stats_df[name].to_numpy(dtype=np.float64)[order]
+
+        # Facteur varie de 0.6 (temps court) à 1.0 (temps suffisant), indépendant des poids
+        # 0.6 = seulement pub interstitielle (6€), 1.0 = interstitielle + in-article (6€ + 2.7€)
+        self.visibility = (0.6 + 0.4 / (1 + np.exp(-(total_time - SEUIL_PUB_INARTICLE) / TRANSITION_WIDTH))
+                           ).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.article_ids)
+
+    def weights(self, weight_params: Dict[str, float]) -> np.ndarray:
+        """Poids de chaque interaction (float32, ordre trié par utilisateur)"""
+        coefficients = np.array([weight_params[name] for name in SIGNAL_COLUMNS], dtype=np.float32)
+        weights = self.matrix @ coefficients
+        weights *= self.visibility
+        return np.clip(weights, 0.1, 1.0, out=weights)
+
+
+class SharedProfiles:
+    """
+    Profils de InteractionSignals en mémoire partagée entre le processus principal et les workers
+
+    user_ids, offsets et article_ids sont fixes, seul le tableau des poids (float32, une
+    valeur par ligne d'interaction) est réécrit par le processus principal à chaque trial.
+    Les workers y lisent un ProfileStore sans copie: plus aucun profil n'est sérialisé par tâche,
+    l'évaluateur en tire les poids des historiques train (embedding de profil content-based).
+    """
+
+    def __init__(self, signals: InteractionSignals):
+        arrays = {
+            'user_ids': signals.user_ids,
+            'offsets': signals.offsets,
+            'article_ids': signals.article_ids,
+            'weights': np.full(len(signals), np.nan, dtype=np.float32)
+        }
+        self.segments = {}
+        self.specs = {}
+        for name, array in arrays.items():
+            self.segments[name], shared, self.specs[name] = share_array(array)
+            if name == 'weights':
+                self.weights = shared
+
+    def update(self, interaction_weights: np.ndarray):
+        """Écrit les poids d'un trial (InteractionSignals.weights), avant pool.map"""
+        self.weights[:] = interaction_weights
+
+    def close(self):
+        """Libère les segments (à appeler une fois le pool terminé)"""
+        del self.weights
+        for segment in self.segments.values():
+            segment.close()
+            segment.unlink()
+
+    @staticmethod
+    def attach(specs: Dict[str, Tuple]) -> Tuple[ProfileStore, List[shared_memory.SharedMemory]]:
+        """Côté worker: ProfileStore sur les tableaux partagés (+ segments à garder ouverts)"""
+        segments, arrays = [], {}
+        for name, spec in specs.items():
+            segment, arrays[name] = attach_array(spec)
+            segments.append(segment)
+        store = ProfileStore(IdIndex.from_ids(arrays['user_ids']), arrays['offsets'],
+                             arrays['article_ids'], arrays['weights'])
+        return store, segments
+
+
+def init_worker(profile_specs):
+    """Initialise chaque worker: evaluator sur le bundle mappé + poids en mémoire partagée"""
+    global worker_evaluator, worker_weights, worker_segments
     worker_evaluator = ImprovedRecommendationEvaluator(models_path="../models")
     worker_evaluator.load_engine()
     worker_evaluator.create_temporal_split(train_ratio=0.8, min_interactions=15)
 
+    # Poids mis à jour en place par le processus principal à chaque trial (voir evaluate_one_user)
+    worker_weights, worker_segments = SharedProfiles.attach(profile_specs)
+
 
 def evaluate_one_user(args):
     """Évalue UN utilisateur (appelé en parallèle)"""
-    user_id, new_profiles, collab, content, temporal, max_age_days = args
+    user_id, collab, content, temporal, max_age_days, weights_version = args
     try:
         global worker_evaluator
 
-        # Injecter les nouveaux profils
-        worker_evaluator.engine.user_profiles = new_profiles
-        worker_evaluator.original_user_profiles = new_profiles.copy()
+        # Nouveau trial: poids partagés réécrits, les candidats en cache ne sont plus valides
+        if (worker_evaluator.interaction_weights is not worker_weights
+                or worker_evaluator.weights_version != weights_version):
+            worker_evaluator.set_interaction_weights(worker_weights, version=weights_version)
 
         # Évaluer ce user
         metrics = worker_evaluator.evaluate_user(
@@ -80,66 +218,6 @@ def evaluate_one_user(args):
         return None
 
 
-def recompute_profiles_fast(weight_params, stats_df):
-    """
-    Recalcule rapidement les poids avec nouveaux coefficients
-
-    Applique un facteur de visibilité de pub in-article basé sur le temps de lecture:
-    - Temps ≥30s → Facteur 1.0 (pub interstitielle + in-article vues)
-    - Temps <30s → Facteur 0.6 (probablement seulement pub interstitielle vue)
-
-    Justification: 96% du dataset a temps ≥30s, médiane à 30s
-    """
-    stats = stats_df.copy()
-
-    # Normaliser les features
-    max_clicks = stats['num_clicks'].max()
-    max_time = stats['total_time_seconds'].quantile(0.99)
-
-    stats['clicks_norm'] = np.log1p(stats['num_clicks']) / np.log1p(max_clicks)
-    stats['time_norm'] = stats['total_time_seconds'].clip(0, max_time) / max_time
-
-    # Calculer les poids de base avec les nouveaux coefficients
-    stats['interaction_weight'] = (
-        weight_params['w_time'] * stats['time_norm'] +
-        weight_params['w_clicks'] * stats['clicks_norm'] +
-        weight_params['w_session'] * stats['avg_session_quality'] +
-        weight_params['w_device'] * stats['avg_device_quality'] +
-        weight_params['w_env'] * stats['avg_env_quality'] +
-        weight_params['w_referrer'] * stats['avg_referrer_quality'] +
-        weight_params['w_os'] * stats['avg_os_quality'] +
-        weight_params['w_country'] * stats['avg_country_quality'] +
-        weight_params['w_region'] * stats['avg_region_quality']
-    )
-
-    # Facteur de visibilité pub in-article basé sur temps de lecture
-    # Transition douce entre 20s et 40s (sigmoid)
-    SEUIL_PUB_INARTICLE = 30  # secondes (temps pour scroller jusqu'à la pub)
-    TRANSITION_WIDTH = 5       # largeur de la transition
-
-    # Facteur varie de 0.6 (temps court) à 1.0 (temps suffisant)
-    # 0.6 = seulement pub interstitielle (6€), 1.0 = interstitielle + in-article (6€ + 2.7€)
-    pub_visibility_factor = 0.6 + 0.4 / (1 + np.exp(-(stats['total_time_seconds'] - SEUIL_PUB_INARTICLE) / TRANSITION_WIDTH))
-
-    # Appliquer le facteur et clipper
-    stats['interaction_weight'] = (stats['interaction_weight'] * pub_visibility_factor).clip(0.1, 1.0)
-
-    # Construire dictionnaire des profils
-    new_profiles = {}
-    for user_id in stats['user_id'].unique():
-        user_data = stats[stats['user_id'] == user_id]
-        article_weights = dict(zip(
-            user_data['article_id'].astype(int),
-            user_data['interaction_weight']
-        ))
-        new_profiles[int(user_id)] = {
-            'articles_read': user_data['article_id'].astype(int).tolist(),
-            'article_weights': article_weights
-        }
-
-    return new_profiles
-
-
 def compute_composite_score(metrics_list):
     """
     Calcule le score composite à partir d'une liste de métriques
@@ -162,14 +240,14 @@ def compute_composite_score(metrics_list):
     )
 
 
-def evaluate_users_parallel(user_ids, new_profiles, collab, content, temporal, max_age_days, pool):
-    """Évalue une liste d'utilisateurs en parallèle"""
-    args_list = [(uid, new_profiles, collab, content, temporal, max_age_days) for uid in user_ids]
+def evaluate_users_parallel(user_ids, collab, content, temporal, max_age_days, weights_version, pool):
+    """Évalue une liste d'utilisateurs en parallèle (poids du trial déjà dans shared_profiles)"""
+    args_list = [(uid, collab, content, temporal, max_age_days, weights_version) for uid in user_ids]
     results = pool.map(evaluate_one_user, args_list)
     return [r for r in results if r is not None]
 
 
-def create_objective(stats_df, all_users, pool):
+def create_objective(signals, all_users, pool, shared_profiles):
     """Crée la fonction objective avec closure sur les données"""
 
     def objective_progressive_parallel(trial):
@@ -214,11 +292,12 @@ def create_objective(stats_df, all_users, pool):
         # Range 30-365j permet à Optuna de trouver l'optimum revenus publicitaires
         max_article_age_days = trial.suggest_int('max_article_age_days', 30, 365)
 
-        # Recalculer les profils avec nouveaux poids
-        new_profiles = recompute_profiles_fast(weight_params, stats_df)
+        # Recalculer les poids et les publier aux workers (mémoire partagée, pool.map synchrone)
+        shared_profiles.update(signals.weights(weight_params))
+        weights_version = trial.number
 
         # PHASE 1: Évaluer 10 users en parallèle
-        metrics_10 = evaluate_users_parallel(all_users[:10], new_profiles, collab_norm, content_norm, temporal_norm, max_article_age_days, pool)
+        metrics_10 = evaluate_users_parallel(all_users[:10], collab_norm, content_norm, temporal_norm, max_article_age_days, weights_version, pool)
         score_10 = compute_composite_score(metrics_10)
 
         # Early stopping phase 1
@@ -228,7 +307,7 @@ def create_objective(stats_df, all_users, pool):
             return score_10
 
         # PHASE 2: Évaluer 20 users de plus en parallèle
-        metrics_20 = evaluate_users_parallel(all_users[10:30], new_profiles, collab_norm, content_norm, temporal_norm, max_article_age_days, pool)
+        metrics_20 = evaluate_users_parallel(all_users[10:30], collab_norm, content_norm, temporal_norm, max_article_age_days, weights_version, pool)
         all_metrics_30 = metrics_10 + metrics_20
         score_30 = compute_composite_score(all_metrics_30)
 
@@ -239,7 +318,7 @@ def create_objective(stats_df, all_users, pool):
             return score_30
 
         # PHASE 3: Candidat prometteur, évaluer les 20 derniers
-        metrics_20_final = evaluate_users_parallel(all_users[30:50], new_profiles, collab_norm, content_norm, temporal_norm, max_article_age_days, pool)
+        metrics_20_final = evaluate_users_parallel(all_users[30:50], collab_norm, content_norm, temporal_norm, max_article_age_days, weights_version, pool)
         all_metrics_50 = all_metrics_30 + metrics_20_final
         score_50 = compute_composite_score(all_metrics_50)
 
@@ -259,7 +338,7 @@ if __name__ == '__main__':
     print("TUNING PARALLÉLISÉ + EARLY STOPPING - 13 PARAMÈTRES (v8)")
     print("="*80)
 
-    print(f"\nConfiguration (adapté Ryzen 7 Pro / 30GB RAM):")
+    print(f"\nConfiguration:")
     print(f"  - {N_TRIALS} trials (optimisation bayésienne)")
     print(f"  - {N_USERS} users max par trial")
     print(f"  - {N_WORKERS} workers parallèles")
@@ -270,6 +349,9 @@ if __name__ == '__main__':
     print("\nChargement des données...")
     stats_df = pd.read_csv(STATS_PATH)
     print(f"✓ Stats chargés: {len(stats_df)} interactions")
+    signals = InteractionSignals(stats_df)
+    del stats_df
+    print(f"✓ Signaux: matrice {signals.matrix.shape[0]} × {signals.matrix.shape[1]} (float32)")
 
     # Charger la liste des utilisateurs
     print("Chargement des utilisateurs de validation...")
@@ -280,13 +362,17 @@ if __name__ == '__main__':
     del temp_evaluator
     print(f"✓ {len(ALL_USERS)} utilisateurs sélectionnés")
 
+    # Profils partagés (poids réécrits à chaque trial)
+    shared_profiles = SharedProfiles(signals)
+    print(f"✓ Profils en mémoire partagée: {len(signals)} interactions")
+
     # Créer le pool de workers
     print(f"\nCréation du pool de {N_WORKERS} workers...")
-    pool = multiprocessing.Pool(N_WORKERS, initializer=init_worker)
+    pool = multiprocessing.Pool(N_WORKERS, initializer=init_worker, initargs=(shared_profiles.specs,))
     print("✓ Pool créé")
 
     # Créer la fonction objective
-    objective = create_objective(stats_df, ALL_USERS, pool)
+    objective = create_objective(signals, ALL_USERS, pool, shared_profiles)
 
     # Lancer l'optimisation
     print("\n" + "="*80)
@@ -303,6 +389,7 @@ if __name__ == '__main__':
     finally:
         pool.close()
         pool.join()
+        shared_profiles.close()
 
     # Résultats
     print("\n" + "="*80)
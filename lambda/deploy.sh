@@ -63,6 +63,12 @@ cp lambda_function.py package/
 cp recommendation_engine.py package/
 cp config.py package/
 cp utils.py package/
+cp metadata_store.py package/
+cp model_bundle.py package/
+cp result_cache.py package/
+cp profile_delta.py package/
+cp profile_store.py package/
+cp component_scores.py package/
 
 # Créer le fichier zip
 cd package
@@ -15,6 +15,13 @@ logger.setLevel(logging.INFO)
 # Instance globale du moteur (réutilisée entre invocations Lambda)
 engine = None
 
+# Chargement des composants lourds: 'eager' (tout au démarrage), 'lazy' (à la première
+# utilisation) ou 'background' (thread de warm-up, popularité servie en attendant)
+ENGINE_LOAD_MODE = os.environ.get('ENGINE_LOAD_MODE', 'background')
+
+# Nombre maximum d'utilisateurs par requête batch (user_ids)
+MAX_BATCH_USERS = 500
+
 def initialize_engine():
     """Initialise le moteur de recommandation (appelé une seule fois)"""
     global engine
@@ -22,10 +29,81 @@ def initialize_engine():
         logger.info("Initialisation du moteur de recommandation...")
         models_path = os.environ.get('MODELS_PATH', '/tmp/models')
         engine = RecommendationEngine(models_path=models_path)
-        engine.load_models()
-        logger.info("Moteur initialisé avec succès")
+        engine.load_models(lazy=ENGINE_LOAD_MODE == 'lazy',
+                           warm_in_background=ENGINE_LOAD_MODE == 'background')
+        logger.info(f"Moteur initialisé avec succès (mode: {ENGINE_LOAD_MODE})")
     return engine
 
+def handle_batch_request(rec_engine, params):
+    """
+    Recommandations pour une liste d'utilisateurs en un appel (précalcul email/push)
+
+    Args:
+        rec_engine: Moteur initialisé
+        params: Paramètres de la requête, user_ids en liste JSON ou chaîne "58,100,500"
+
+    Returns:
+        Réponse HTTP avec les recommandations par utilisateur
+    """
+    user_ids = params['user_ids']
+    if isinstance(user_ids, str):
+        user_ids = user_ids.split(',')
+    user_ids = [int(user_id) for user_id in user_ids]
+    n_recommendations = int(params.get('n_recommendations', 5))
+    weight_collab = float(params.get('weight_collab', 3.0))
+    weight_content = float(params.get('weight_content', 2.0))
+    weight_trend = float(params.get('weight_trend', 1.0))
+    use_diversity = str(params.get('use_diversity', 'true')).lower() == 'true'
+
+    if not user_ids or len(user_ids) > MAX_BATCH_USERS or n_recommendations < 1 or n_recommendations > 50:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({
+                'error': f'user_ids doit contenir entre 1 et {MAX_BATCH_USERS} utilisateurs, '
+                         f'n_recommendations entre 1 et 50',
+                'example': {'user_ids': [58, 100, 500], 'n_recommendations': 5}
+            })
+        }
+
+    logger.info(f"Génération de recommandations pour {len(user_ids)} utilisateurs (batch)")
+    results = rec_engine.recommend_batch(
+        user_ids=user_ids,
+        n_recommendations=n_recommendations,
+        weight_collab=weight_collab,
+        weight_content=weight_content,
+        weight_trend=weight_trend,
+        use_diversity=use_diversity
+    )
+
+    response_body = {
+        'n_users': len(results),
+        'results': {str(user_id): recommendations for user_id, recommendations in results.items()},
+        'parameters': {
+            'n_recommendations': n_recommendations,
+            'weight_collab': weight_collab,
+            'weight_content': weight_content,
+            'weight_trend': weight_trend,
+            'weights_ratio': f"{weight_collab}:{weight_content}:{weight_trend}",
+            'use_diversity': use_diversity
+        },
+        'metadata': {
+            'model_version': rec_engine.model_version
+        }
+    }
+
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(response_body, indent=2)
+    }
+
 def lambda_handler(event, context):
     """
     Handler principal de la Lambda Function
@@ -52,6 +130,10 @@ def lambda_handler(event, context):
         else:
             params = event
 
+        # Mode batch: liste d'utilisateurs en un appel
+        if params.get('user_ids') is not None:
+            return handle_batch_request(rec_engine, params)
+
         # Récupérer les paramètres
         user_id = params.get('user_id')
         n_recommendations = int(params.get('n_recommendations', 5))
@@ -112,6 +194,12 @@ def lambda_handler(event, context):
                 'weight_trend': weight_trend,
                 'weights_ratio': f"{weight_collab}:{weight_content}:{weight_trend}",
                 'use_diversity': use_diversity
+            },
+            'metadata': {
+                'warming_up': rec_engine.is_warming_up(),
+                'model_version': rec_engine.model_version,
+                'deltas_applied': len(rec_engine.applied_deltas),
+                'cache': rec_engine.result_cache.stats() if rec_engine.result_cache else None
             }
         }
 
@@ -165,6 +253,7 @@ def health_check_handler(event, context):
             'body': json.dumps({
                 'status': 'healthy',
                 'engine_loaded': rec_engine.loaded,
+                'warming_up': rec_engine.is_warming_up(),
                 'message': 'Le système de recommandation est opérationnel'
             })
         }
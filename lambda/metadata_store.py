@@ -0,0 +1,111 @@
+"""
+Stockage colonnaire des métadonnées articles
+Remplace les filtres pandas (scan complet de 364k lignes) par des lookups O(1)
+"""
+
+import numpy as np
+from collections.abc import Mapping
+from typing import Dict, Iterable, Optional
+
+
+class ArticleColumnView(Mapping):
+    """Vue dict en lecture seule article_id -> valeur d'une colonne du store"""
+
+    def __init__(self, store: 'ArticleMetadataStore', column: str):
+        self.store = store
+        self.values = getattr(store, column)
+
+    def __getitem__(self, article_id) -> int:
+        row = self.store.row(article_id)
+        if row < 0:
+            raise KeyError(article_id)
+        return int(self.values[row])
+
+    def __contains__(self, article_id) -> bool:
+        return self.store.row(article_id) >= 0
+
+    def __iter__(self):
+        return iter(self.store.article_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+class ArticleMetadataStore:
+    """
+    Métadonnées articles en tableaux NumPy indexés par ligne dense
+
+    article_id -> ligne via un tableau de lookup direct (les article_id Globo sont
+    des entiers denses 0..364046), puis une colonne NumPy par attribut.
+    """
+
+    COLUMNS = ('category_id', 'publisher_id', 'words_count', 'created_at_ts')
+
+    def __init__(self, article_ids: np.ndarray, category_id: np.ndarray, publisher_id: np.ndarray,
+                 words_count: np.ndarray, created_at_ts: np.ndarray):
+        self.article_ids = np.asarray(article_ids, dtype=np.int64)
+        self.category_id = np.asarray(category_id, dtype=np.int32)
+        self.publisher_id = np.asarray(publisher_id, dtype=np.int32)
+        self.words_count = np.asarray(words_count, dtype=np.int32)
+        self.created_at_ts = np.asarray(created_at_ts, dtype=np.int64)
+
+        # Lookup direct article_id -> ligne (-1 si absent)
+        size = int(self.article_ids.max()) + 1 if len(self.article_ids) else 0
+        self._row_of_article = np.full(size, -1, dtype=np.int32)
+        self._row_of_article[self.article_ids] = np.arange(len(self.article_ids), dtype=np.int32)
+
+    @classmethod
+    def from_dataframe(cls, metadata_df) -> 'ArticleMetadataStore':
+        """Construit le store depuis le DataFrame articles_metadata.csv"""
+        return cls(
+            article_ids=metadata_df['article_id'].values,
+            category_id=metadata_df['category_id'].values,
+            publisher_id=metadata_df['publisher_id'].values,
+            words_count=metadata_df['words_count'].values,
+            created_at_ts=metadata_df['created_at_ts'].values
+        )
+
+    def __len__(self) -> int:
+        return len(self.article_ids)
+
+    def __contains__(self, article_id) -> bool:
+        return self.row(article_id) >= 0
+
+    def row(self, article_id) -> int:
+        """Ligne de l'article (-1 si inconnu)"""
+        article_id = int(article_id)
+        if 0 <= article_id < len(self._row_of_article):
+            return int(self._row_of_article[article_id])
+        return -1
+
+    def rows(self, article_ids: Iterable[int]) -> np.ndarray:
+        """Lignes d'un ensemble d'articles (vectorisé, -1 si inconnu)"""
+        article_ids = np.asarray(list(article_ids) if not isinstance(article_ids, np.ndarray) else article_ids,
+                                 dtype=np.int64)
+        valid = (article_ids >= 0) & (article_ids < len(self._row_of_article))
+        rows = np.full(len(article_ids), -1, dtype=np.int32)
+        rows[valid] = self._row_of_article[article_ids[valid]]
+        return rows
+
+    def categories(self, article_ids: Iterable[int]) -> np.ndarray:
+        """category_id d'un ensemble d'articles (-1 si inconnu)"""
+        rows = self.rows(article_ids)
+        return np.where(rows >= 0, self.category_id[rows], -1)
+
+    def record(self, row: int) -> Dict[str, int]:
+        """Attributs d'une ligne sous forme de dict (types Python, sérialisable JSON)"""
+        return {
+            'category_id': int(self.category_id[row]),
+            'publisher_id': int(self.publisher_id[row]),
+            'words_count': int(self.words_count[row]),
+            'created_at_ts': int(self.created_at_ts[row])
+        }
+
+    def get(self, article_id) -> Optional[Dict[str, int]]:
+        """Attributs d'un article, None si inconnu"""
+        row = self.row(article_id)
+        return self.record(row) if row >= 0 else None
+
+    def column_view(self, column: str) -> ArticleColumnView:
+        """Vue dict article_id -> valeur d'une colonne (remplace dict(zip(...)) sur le DataFrame)"""
+        return ArticleColumnView(self, column)
@@ -0,0 +1,209 @@
+"""
+Chargement du bundle binaire des modèles (tableaux NumPy bruts + manifest)
+
+Format écrit par data_preparation/build_model_bundle.py:
+    <models_path>/bundles/LATEST          -> nom de la version active
+    <models_path>/bundles/<version>/manifest.json
+    <models_path>/bundles/<version>/<nom>.npy
+
+Les tableaux sont ouverts avec np.load(mmap_mode='r'): le chargement ne lit
+que le manifest, les pages sont lues à la demande et partagées entre les
+processus workers via le page cache.
+
+Même principe pour la table de candidats pré-calculés (<models_path>/precomputed/,
+écrite par data_preparation/precompute_recommendations.py).
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+from collections.abc import Mapping
+from scipy.sparse import csr_matrix
+from typing import Dict, List, Optional, Sequence, Tuple
+
+BUNDLE_FORMAT = 1
+BUNDLES_DIR = "bundles"
+LATEST_FILE = "LATEST"
+
+
+class IdIndex(Mapping):
+    """
+    Mapping id -> index (ex: user_id -> user_idx) adossé à deux tableaux triés
+
+    Remplace les dicts Python de mappings.pkl: recherche dichotomique O(log n),
+    aucune construction d'objets au chargement.
+    """
+
+    def __init__(self, sorted_ids: np.ndarray, positions: np.ndarray):
+        self.sorted_ids = sorted_ids
+        self.positions = positions
+
+    @classmethod
+    def from_ids(cls, ids: np.ndarray) -> 'IdIndex':
+        """Construit l'index à partir du tableau position -> id"""
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')
+        return cls(ids[order], order.astype(np.int64))
+
+    def _find(self, key) -> int:
+        try:
+            key = int(key)
+        except (TypeError, ValueError):
+            return -1
+        pos = int(np.searchsorted(self.sorted_ids, key))
+        if pos < len(self.sorted_ids) and self.sorted_ids[pos] == key:
+            return int(self.positions[pos])
+        return -1
+
+    def __getitem__(self, key) -> int:
+        position = self._find(key)
+        if position < 0:
+            raise KeyError(key)
+        return position
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) >= 0
+
+    def __iter__(self):
+        return iter(self.sorted_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.sorted_ids)
+
+    def rows(self, keys) -> np.ndarray:
+        """Positions d'un ensemble d'ids (vectorisé, -1 si absent)"""
+        keys = np.asarray(keys, dtype=np.int64)
+        if len(self.sorted_ids) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.sorted_ids, keys), len(self.sorted_ids) - 1)
+        found = self.sorted_ids[pos] == keys
+        return np.where(found, self.positions[pos], -1)
+
+
+def find_latest_bundle(models_path: str) -> Optional[str]:
+    """Chemin du bundle actif (bundles/LATEST), None si aucun bundle"""
+    latest_path = os.path.join(models_path, BUNDLES_DIR, LATEST_FILE)
+    if not os.path.exists(latest_path):
+        return None
+    with open(latest_path, 'r') as f:
+        version = f.read().strip()
+    return os.path.join(models_path, BUNDLES_DIR, version)
+
+
+def legacy_model_version(models_path: str, filenames: Sequence[str]) -> str:
+    """
+    Version des modèles chargés depuis les fichiers legacy (pickle/CSV/npz)
+
+    Empreinte (nom, taille, date de modification) des fichiers: elle change dès qu'un script
+    de préparation réécrit l'un d'eux (data_preprocessing_parallel.py,
+    update_profiles_incremental.py...), ce qui invalide table pré-calculée et cache de résultats.
+    """
+    digest = hashlib.sha1()
+    for filename in filenames:
+        try:
+            stat = os.stat(os.path.join(models_path, filename))
+            digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        except FileNotFoundError:
+            digest.update(f"{filename}:-\n".encode())
+    return f"legacy-{digest.hexdigest()[:12]}"
+
+
+def load_bundle(bundle_path: str):
+    """
+    Ouvre un bundle en mémoire mappée
+
+    Returns:
+        (manifest, arrays) — arrays: nom -> np.memmap en lecture seule
+    """
+    with open(os.path.join(bundle_path, "manifest.json"), 'r') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"Format de bundle non supporté: {manifest.get('format')} (attendu: {BUNDLE_FORMAT})")
+
+    arrays = {
+        name: np.load(os.path.join(bundle_path, spec['file']), mmap_mode='r')
+        for name, spec in manifest['arrays'].items()
+    }
+    return manifest, arrays
+
+
+def bundle_csr(manifest: Dict, arrays: Dict[str, np.ndarray], name: str) -> Optional[csr_matrix]:
+    """Matrice CSR reconstruite sans copie depuis ses trois tableaux, None si absente du bundle"""
+    if name not in manifest['matrices']:
+        return None
+    shape = tuple(manifest['matrices'][name]['shape'])
+    return csr_matrix((arrays[f"{name}_data"], arrays[f"{name}_indices"], arrays[f"{name}_indptr"]),
+                      shape=shape, copy=False)
+
+
+def bundle_id_index(arrays: Dict[str, np.ndarray], name: str) -> IdIndex:
+    """IdIndex id -> position à partir des tableaux <name>_sorted / <name>_sorted_idx"""
+    return IdIndex(arrays[f"{name}_sorted"], arrays[f"{name}_sorted_idx"])
+
+
+PRECOMPUTED_DIR = "precomputed"
+PRECOMPUTED_FORMAT = 1
+
+
+class PrecomputedCandidates:
+    """
+    Candidats pré-calculés par utilisateur (data_preparation/precompute_recommendations.py)
+
+    Une paire de tables à largeur fixe (n_users × width) par source: article_ids
+    (-1 = emplacement vide) et scores bruts, lignes triées par user_id.
+    Seuls la combinaison des poids, la popularité et la diversité restent à calculer.
+    """
+
+    SOURCES = ('collab', 'content')
+
+    def __init__(self, manifest: Dict, arrays: Dict[str, np.ndarray]):
+        self.manifest = manifest
+        self.model_version = manifest['model_version']
+        self.ann_n_probe = manifest.get('ann_n_probe')  # Réglage IVF de la recherche content-based
+        self.width = int(manifest['width'])
+        self.user_index = IdIndex(arrays['user_ids'], np.arange(len(arrays['user_ids']), dtype=np.int64))
+        self.arrays = arrays
+
+    def __contains__(self, user_id) -> bool:
+        return user_id in self.user_index
+
+    def __len__(self) -> int:
+        return len(self.user_index)
+
+    def candidates(self, user_id, source: str, n: int) -> Optional[List[Tuple[int, float]]]:
+        """
+        Les n meilleurs candidats (article_id, score) d'une source, None si l'utilisateur est absent
+
+        Args:
+            user_id: ID de l'utilisateur
+            source: 'collab' ou 'content'
+            n: Nombre de candidats (au plus width)
+        """
+        row = self.user_index.rows([user_id])[0]
+        if row < 0:
+            return None
+        article_ids = self.arrays[f"{source}_article_ids"][row, :n]
+        scores = self.arrays[f"{source}_scores"][row, :n]
+        filled = article_ids >= 0
+        return [(int(a), float(s)) for a, s in zip(article_ids[filled], scores[filled])]
+
+
+def load_precomputed(models_path: str) -> Optional[PrecomputedCandidates]:
+    """Ouvre la table de candidats pré-calculés en mémoire mappée, None si absente"""
+    path = os.path.join(models_path, PRECOMPUTED_DIR)
+    manifest_path = os.path.join(path, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != PRECOMPUTED_FORMAT:
+        raise ValueError(f"Format de table pré-calculée non supporté: {manifest.get('format')} "
+                         f"(attendu: {PRECOMPUTED_FORMAT})")
+
+    names = ['user_ids'] + [f"{source}_{column}" for source in PrecomputedCandidates.SOURCES
+                            for column in ('article_ids', 'scores')]
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in names}
+    return PrecomputedCandidates(manifest, arrays)
@@ -5,12 +5,23 @@ Combine collaborative filtering et content-based filtering
 
 import numpy as np
 import pickle
-from scipy.sparse import load_npz
-from scipy.spatial.distance import cosine
+from scipy.sparse import load_npz, csr_matrix
 from sklearn.metrics.pairwise import cosine_similarity
 import json
-from typing import List, Dict, Tuple, Optional
+import os
+from typing import List, Dict, Tuple, Optional, Sequence
 import logging
+import threading
+import time
+from collections import OrderedDict
+
+from metadata_store import ArticleMetadataStore
+from result_cache import ResultCache
+from profile_delta import DELTA_BASE_FILES, list_deltas, load_delta, replace_csr_rows
+from profile_store import ProfileStore
+from component_scores import ComponentScores
+from model_bundle import (IdIndex, find_latest_bundle, load_bundle, bundle_csr, bundle_id_index,
+                          legacy_model_version, load_precomputed)
 
 logger = logging.getLogger(__name__)
 
@@ -23,101 +34,628 @@ class RecommendationEngine:
     TEMPORAL_HALF_LIFE_DAYS = 7  # Half-life: après 7 jours, score divisé par 2
     TEMPORAL_DECAY_LAMBDA = 0.099  # ln(2)/7 ≈ 0.099
 
-    def __init__(self, models_path: str = "./models"):
+    # MODES DE COLLABORATIVE FILTERING
+    CF_MODE_ITEM = 'item_knn'            # Index item-item pré-calculé (défaut si item_neighbors.npz présent)
+    CF_MODE_USER = 'user_knn'            # User-user, agrégation vectorisée (défaut sinon)
+    CF_MODE_USER_LOOP = 'user_knn_loop'  # User-user, boucle Python historique (tests de parité)
+    K_SIMILAR_USERS = 50
+
+    # INDEX ANN (IVF) DES EMBEDDINGS: clusters scorés par requête (compromis rappel/latence)
+    ANN_N_PROBE = 32
+
+    # CLASSEMENT DE POPULARITÉ: recalculé uniquement au changement de bucket temporel
+    POPULARITY_BUCKET_MS = 3600 * 1000  # 1 heure
+    POPULARITY_CACHE_SIZE = 64  # Classements conservés (un par bucket × paramètres)
+
+    # CHARGEMENT PARESSEUX: composants lourds chargés à la première utilisation (une seule fois)
+    COMPONENT_PROFILES = 'profiles'      # Profils utilisateurs (historiques)
+    COMPONENT_MATRICES = 'matrices'      # Matrices user-item, pondérée, index item-item
+    COMPONENT_EMBEDDINGS = 'embeddings'  # Embeddings normalisés + index ANN
+    LAZY_COMPONENTS = (COMPONENT_PROFILES, COMPONENT_MATRICES, COMPONENT_EMBEDDINGS)
+
+    # RECOMMANDATIONS PAR LOT: utilisateurs traités par produit matrice-matrice
+    # (borne la mémoire des similarités denses: chunk × n_users pour le CF user-user)
+    BATCH_CHUNK_SIZE = 32
+
+    # CACHE DES RÉSULTATS: clé (user, n, poids, diversité, bucket temporel, version des modèles)
+    RESULT_CACHE_SIZE = 10000
+    RESULT_CACHE_TTL_SECONDS = 600
+
+    def __init__(self, models_path: str = "./models", use_bundle: bool = True, use_precomputed: bool = True,
+                 use_result_cache: bool = True):
         """
         Initialise le moteur de recommandation
 
         Args:
             models_path: Chemin vers le dossier contenant les modèles
+            use_bundle: Charger le bundle binaire (models/bundles/LATEST) s'il existe (défaut: True)
+            use_precomputed: Servir les utilisateurs connus depuis la table de candidats
+                pré-calculés (models/precomputed/) si elle correspond aux modèles (défaut: True)
+            use_result_cache: Mettre en cache les résultats de recommend() (défaut: True)
         """
         self.models_path = models_path
+        self.use_bundle = use_bundle
+        self.use_precomputed = use_precomputed
+        self.precomputed = None  # PrecomputedCandidates (table mmap), None si absente ou obsolète
+        self.result_cache = None  # ResultCache des réponses de recommend()
+        if use_result_cache:
+            self.result_cache = ResultCache(self.RESULT_CACHE_SIZE, self.RESULT_CACHE_TTL_SECONDS)
+        self.model_version = None  # Version du bundle chargé ('legacy-<empreinte>' si fichiers pickle/CSV)
         self.user_item_matrix = None
         self.weighted_user_item_matrix = None  # Matrice pondérée avec interaction_weight
+        self.item_neighbors = None  # Index top-K item-item pré-calculé (CSR articles × articles)
+        self.idx_to_article_array = None  # Index optimisé: article_idx -> article_id (vectorisé)
+        self.article_index = None  # IdIndex article_id -> article_idx (vectorisé)
         self.mappings = None
         self.article_popularity = None
         self.user_profiles = None
         self.embeddings = None
         self.metadata = None
+        self.article_store = None  # Métadonnées en colonnes NumPy (lookups O(1) par article_id)
         self.article_timestamps = None  # Index optimisé pour temporal decay
         self.article_categories = None  # Index optimisé pour category boost
-        self.loaded = False
+        self.embedding_matrix = None  # Embeddings normalisés L2 (float32, n_articles × dim)
+        self.embedding_article_ids = None  # Ligne de embedding_matrix -> article_id
+        self.embedding_index = None  # IdIndex article_id -> ligne de embedding_matrix
+        self.embedding_norms = None  # Normes L2 d'origine (profil = moyenne des embeddings bruts)
+        self.user_embeddings = None  # Embeddings de profil pré-calculés (float32, ligne = user_idx, mmap)
+        self._user_embedding_overrides = {}  # user_idx -> requête recalculée (profil modifié), None si vide
+        self.embedding_categories = None  # Ligne de embedding_matrix -> category_id (-1 si inconnue)
+        self.n_categories = 0
+        self.ann_centroids = None  # Index IVF optionnel (embeddings_ivf.npz)
+        self.ann_list_offsets = None
+        self.ann_list_rows = None  # Entrées des listes -> ligne de embedding_matrix
+        self.popularity_article_ids = None  # Popularité en tableaux (ordre de article_popularity)
+        self.popularity_base_scores = None
+        self.popularity_created_ts = None  # NaN si article sans timestamp
+        self._popularity_rankings = OrderedDict()  # (bucket, paramètres) -> (ids triés, scores triés)
+        self._popularity_lock = threading.Lock()
+        self._bundle_manifest = None  # Bundle ouvert (None en mode legacy)
+        self._bundle_arrays = None
+        self._component_locks = {component: threading.Lock() for component in self.LAZY_COMPONENTS}
+        self._loaded_components = set()
+        self._warmup_thread = None
+        self.applied_deltas = []  # Deltas de profils appliqués à chaud (noms de fichiers, dans l'ordre)
+        self._delta_users = set()  # Utilisateurs mis à jour par un delta (table pré-calculée obsolète)
+        self._delta_base_version = None  # Version des modèles chargés dans les base_versions des deltas
+        self._delta_lock = threading.Lock()
+        self.loaded = False  # Socle chargé (mappings, popularité, métadonnées)
+
+    def load_models(self, lazy: bool = False, warm_in_background: bool = False):
+        """
+        Charge le socle (mappings, popularité, métadonnées) puis les composants lourds
 
-    def load_models(self):
-        """Charge tous les modèles et données nécessaires"""
+        Args:
+            lazy: Ne pas charger les composants lourds, ils le seront à la première utilisation
+            warm_in_background: Charger les composants lourds dans un thread (implique lazy);
+                pendant le chargement, les requêtes sont servies par la popularité
+        """
         logger.info("Chargement des modèles...")
 
         try:
-            # Charger la matrice user-item (counts)
-            self.user_item_matrix = load_npz(f"{self.models_path}/user_item_matrix.npz")
-            logger.info(f"Matrice user-item (counts) chargée: {self.user_item_matrix.shape}")
-
-            # Charger la matrice pondérée (interaction_weight) si disponible
-            try:
-                self.weighted_user_item_matrix = load_npz(f"{self.models_path}/user_item_matrix_weighted.npz")
-                logger.info(f"Matrice pondérée chargée: {self.weighted_user_item_matrix.shape}")
-                logger.info(f"  Weighted values: min={self.weighted_user_item_matrix.data.min():.3f}, "
-                           f"max={self.weighted_user_item_matrix.data.max():.3f}, "
-                           f"mean={self.weighted_user_item_matrix.data.mean():.3f}")
-            except FileNotFoundError:
-                logger.warning("Matrice pondérée non trouvée, utilisation de la matrice counts")
-                self.weighted_user_item_matrix = None
-
-            # Charger les mappings
-            with open(f"{self.models_path}/mappings.pkl", 'rb') as f:
-                self.mappings = pickle.load(f)
-            logger.info(f"Mappings chargés: {len(self.mappings['user_to_idx'])} users")
-
-            # Charger la popularité
-            with open(f"{self.models_path}/article_popularity.pkl", 'rb') as f:
-                self.article_popularity = pickle.load(f)
-            logger.info(f"Popularité chargée: {len(self.article_popularity)} articles")
-
-            # Charger les profils utilisateurs
-            with open(f"{self.models_path}/user_profiles.json", 'r') as f:
-                self.user_profiles = json.load(f)
-            # Convertir les clés en int
-            self.user_profiles = {int(k): v for k, v in self.user_profiles.items()}
-            logger.info(f"Profils utilisateurs chargés: {len(self.user_profiles)} users")
-
-            # Charger les embeddings
-            with open(f"{self.models_path}/embeddings_filtered.pkl", 'rb') as f:
-                self.embeddings = pickle.load(f)
-            logger.info(f"Embeddings chargés: {len(self.embeddings)} articles")
-
-            # Charger les métadonnées (on pourrait utiliser pandas mais pour Lambda, on optimise)
-            import pandas as pd
-            self.metadata = pd.read_csv(f"{self.models_path}/articles_metadata.csv")
-            logger.info(f"Métadonnées chargées: {len(self.metadata)} articles")
-
-            # Créer des index optimisés pour performance
-            # Index: article_id -> created_at_ts (pour temporal decay)
-            self.article_timestamps = dict(zip(
-                self.metadata['article_id'],
-                self.metadata['created_at_ts']
-            ))
-            # Index: article_id -> category_id (pour category boost)
-            self.article_categories = dict(zip(
-                self.metadata['article_id'],
-                self.metadata['category_id']
-            ))
-            logger.info(f"Index créés: {len(self.article_timestamps)} timestamps, "
-                       f"{len(self.article_categories)} catégories")
+            bundle_path = find_latest_bundle(self.models_path) if self.use_bundle else None
+            if bundle_path is not None:
+                self._load_bundle(bundle_path)
+            else:
+                self._load_legacy()
+
+            if self.use_precomputed:
+                self._load_precomputed()
+
+            # Nouvelle version des modèles: résultats en cache invalidés
+            if self.result_cache is not None:
+                self.result_cache.clear()
+            self._user_embedding_overrides = {}
+            self.applied_deltas = []
+            self._delta_users = set()
 
             self.loaded = True
-            logger.info("✓ Tous les modèles chargés avec succès")
+            logger.info(f"✓ Socle chargé (version: {self.model_version})")
+
+            if warm_in_background:
+                self.start_background_warmup()
+            elif not lazy:
+                for component in self.LAZY_COMPONENTS:
+                    self._ensure_component(component)
+                self.apply_pending_deltas()
+                logger.info("✓ Tous les modèles chargés avec succès")
 
         except Exception as e:
             logger.error(f"Erreur lors du chargement des modèles: {e}")
             raise
 
+    def _load_precomputed(self):
+        """Ouvre la table de candidats pré-calculés si elle a été produite pour les modèles chargés"""
+        table = load_precomputed(self.models_path)
+        if table is None:
+            logger.info("Table pré-calculée non trouvée, calcul en ligne")
+        elif table.model_version != self.model_version:
+            logger.warning(f"Table pré-calculée obsolète (modèles {table.model_version}, "
+                           f"chargés: {self.model_version}), ignorée")
+        elif table.ann_n_probe != self.ANN_N_PROBE:
+            # Présence de l'index IVF couverte par model_version, réglage de recherche vérifié ici
+            logger.warning(f"Table pré-calculée avec une autre recherche content-based "
+                           f"(n_probe {table.ann_n_probe}, moteur: {self.ANN_N_PROBE}), ignorée")
+        else:
+            self.precomputed = table
+            logger.info(f"Table pré-calculée chargée: {len(table)} utilisateurs × {table.width} candidats")
+
+    def _precomputed_candidates(self, user_id: int, n_candidates: int) -> Optional[Tuple[List, List]]:
+        """
+        Candidats (collab, content) pré-calculés d'un utilisateur
+
+        Returns:
+            None si pas de table, utilisateur absent ou n_candidates > largeur de la table
+        """
+        if (self.precomputed is None or n_candidates > self.precomputed.width
+                or user_id in self._delta_users):
+            return None
+        collab_recs = self.precomputed.candidates(user_id, 'collab', n_candidates)
+        if collab_recs is None:
+            return None
+        return collab_recs, self.precomputed.candidates(user_id, 'content', n_candidates)
+
+    def _ensure_component(self, component: str):
+        """Charge un composant lourd à sa première utilisation (une seule fois, thread-safe)"""
+        if component in self._loaded_components:
+            return
+
+        with self._component_locks[component]:
+            if component in self._loaded_components:
+                return
+
+            if self._bundle_arrays is not None:
+                loaders = {
+                    self.COMPONENT_PROFILES: self._load_bundle_profiles,
+                    self.COMPONENT_MATRICES: self._load_bundle_matrices,
+                    self.COMPONENT_EMBEDDINGS: self._load_bundle_embeddings
+                }
+            else:
+                loaders = {
+                    self.COMPONENT_PROFILES: self._load_legacy_profiles,
+                    self.COMPONENT_MATRICES: self._load_legacy_matrices,
+                    self.COMPONENT_EMBEDDINGS: self._load_legacy_embeddings
+                }
+
+            start_time = time.perf_counter()
+            loaders[component]()
+            self._loaded_components.add(component)
+            logger.info(f"✓ Composant '{component}' chargé en {time.perf_counter() - start_time:.2f}s")
+
+    def start_background_warmup(self) -> threading.Thread:
+        """Lance le chargement des composants lourds dans un thread daemon (idempotent)"""
+        if self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(target=self._warm_components, name="engine-warmup",
+                                                   daemon=True)
+            self._warmup_thread.start()
+        return self._warmup_thread
+
+    def _warm_components(self):
+        try:
+            for component in self.LAZY_COMPONENTS:
+                self._ensure_component(component)
+            self.apply_pending_deltas()
+            logger.info("✓ Warm-up terminé: tous les composants chargés")
+        except Exception as e:
+            logger.error(f"Erreur pendant le warm-up: {e}", exc_info=True)
+
+    @property
+    def fully_loaded(self) -> bool:
+        """Socle et tous les composants lourds chargés"""
+        return self.loaded and len(self._loaded_components) == len(self.LAZY_COMPONENTS)
+
+    def is_warming_up(self) -> bool:
+        """True tant que le warm-up en arrière-plan n'a pas chargé tous les composants"""
+        return (self._warmup_thread is not None and self._warmup_thread.is_alive()
+                and not self.fully_loaded)
+
+    def apply_delta(self, delta_path: str) -> int:
+        """
+        Applique un delta de profils (update_profiles_incremental.py) sans rechargement complet
+
+        Profils, lignes des matrices user-item, embeddings de profil et popularité des
+        utilisateurs/articles touchés sont remplacés; les requêtes en cours gardent les
+        anciennes matrices (remplacement de référence, pas de modification en place).
+        Les utilisateurs inconnus des mappings ne reçoivent que leur historique
+        (content-based): ils entrent dans les matrices au prochain recalcul complet.
+
+        Args:
+            delta_path: Chemin du fichier delta_*.npz
+
+        Returns:
+            Nombre d'utilisateurs mis à jour
+        """
+        for component in self.LAZY_COMPONENTS:
+            self._ensure_component(component)
+        delta = load_delta(delta_path)
+
+        with self._delta_lock:
+            # ProfileStore: profils gardés en surcouche, tableaux (mmap) non modifiés
+            for user_id, profile in delta.profiles():
+                self.user_profiles[user_id] = profile
+
+            # Lignes user-item des utilisateurs connus (articles hors mappings ignorés)
+            user_rows = np.array([self.mappings['user_to_idx'].get(user_id, -1)
+                                  for user_id in delta.user_ids.tolist()], dtype=np.int64)
+            article_cols = self.article_index.rows(delta.article_ids)
+            known_rows = user_rows[user_rows >= 0]
+            if len(known_rows) > 0:
+                n_articles = self.user_item_matrix.shape[1]
+                self.user_item_matrix = replace_csr_rows(
+                    self.user_item_matrix, known_rows,
+                    delta.matrix_rows(user_rows, article_cols, delta.num_clicks, n_articles))
+                if self.weighted_user_item_matrix is not None:
+                    self.weighted_user_item_matrix = replace_csr_rows(
+                        self.weighted_user_item_matrix, known_rows,
+                        delta.matrix_rows(user_rows, article_cols, delta.weights, n_articles))
+
+            for user_id in delta.user_ids.tolist():
+                self.update_user_embedding(user_id)
+
+            if delta.has_popularity:
+                self._set_popularity_arrays(delta.popularity_article_ids, delta.popularity_scores)
+
+            self._delta_users.update(delta.user_ids.tolist())
+            self.applied_deltas.append(delta.name)
+            if self.result_cache is not None:
+                self.result_cache.clear()
+
+        logger.info(f"✓ Delta {delta.name} appliqué: {len(delta)} utilisateurs "
+                    f"({len(known_rows)} dans les matrices), popularité: {delta.has_popularity}")
+        return len(delta)
+
+    def apply_pending_deltas(self) -> int:
+        """
+        Applique, dans l'ordre, les deltas de models/deltas/ pas encore appliqués
+
+        Seuls les deltas calculés sur les modèles chargés sont appliqués: ceux d'un socle
+        antérieur (recalcul complet, nouveau bundle) y sont déjà intégrés ou obsolètes.
+
+        Returns:
+            Nombre de deltas appliqués
+        """
+        pending = [path for path in list_deltas(self.models_path, self._delta_base_version)
+                   if os.path.basename(path) not in self.applied_deltas]
+        for path in pending:
+            self.apply_delta(path)
+        return len(pending)
+
+    def _load_legacy(self):
+        """Charge le socle depuis les fichiers de models/: mappings, popularité, métadonnées"""
+        # Charger les mappings
+        with open(f"{self.models_path}/mappings.pkl", 'rb') as f:
+            self.mappings = pickle.load(f)
+        logger.info(f"Mappings chargés: {len(self.mappings['user_to_idx'])} users")
+
+        self.idx_to_article_array = np.array(
+            [self.mappings['idx_to_article'][idx] for idx in range(len(self.mappings['idx_to_article']))],
+            dtype=np.int64
+        )
+
+        # Charger la popularité
+        with open(f"{self.models_path}/article_popularity.pkl", 'rb') as f:
+            self.article_popularity = pickle.load(f)
+        logger.info(f"Popularité chargée: {len(self.article_popularity)} articles")
+
+        # Charger les métadonnées (on pourrait utiliser pandas mais pour Lambda, on optimise)
+        import pandas as pd
+        self.metadata = pd.read_csv(f"{self.models_path}/articles_metadata.csv")
+        logger.info(f"Métadonnées chargées: {len(self.metadata)} articles")
+        self.article_store = ArticleMetadataStore.from_dataframe(self.metadata)
+
+        # Créer des index optimisés pour performance
+        # Index: article_id -> created_at_ts (pour temporal decay)
+        self.article_timestamps = dict(zip(
+            self.metadata['article_id'],
+            self.metadata['created_at_ts']
+        ))
+        # Index: article_id -> category_id (pour category boost)
+        self.article_categories = dict(zip(
+            self.metadata['article_id'],
+            self.metadata['category_id']
+        ))
+        logger.info(f"Index créés: {len(self.article_timestamps)} timestamps, "
+                   f"{len(self.article_categories)} catégories")
+
+        self.article_index = IdIndex.from_ids(self.idx_to_article_array)
+        self._build_popularity_index()
+        self.model_version = legacy_model_version(self.models_path, self._legacy_model_files())
+        self._delta_base_version = legacy_model_version(self.models_path, DELTA_BASE_FILES)
+
+    def _load_legacy_matrices(self):
+        """Matrices user-item (counts, pondérée) et index item-item"""
+        # Charger la matrice user-item (counts)
+        self.user_item_matrix = load_npz(f"{self.models_path}/user_item_matrix.npz")
+        logger.info(f"Matrice user-item (counts) chargée: {self.user_item_matrix.shape}")
+
+        # Charger la matrice pondérée (interaction_weight) si disponible
+        try:
+            self.weighted_user_item_matrix = load_npz(f"{self.models_path}/user_item_matrix_weighted.npz")
+            logger.info(f"Matrice pondérée chargée: {self.weighted_user_item_matrix.shape}")
+            logger.info(f"  Weighted values: min={self.weighted_user_item_matrix.data.min():.3f}, "
+                       f"max={self.weighted_user_item_matrix.data.max():.3f}, "
+                       f"mean={self.weighted_user_item_matrix.data.mean():.3f}")
+        except FileNotFoundError:
+            logger.warning("Matrice pondérée non trouvée, utilisation de la matrice counts")
+            self.weighted_user_item_matrix = None
+
+        # Charger l'index de voisinage item-item si disponible (build_item_neighbors.py)
+        try:
+            self.item_neighbors = load_npz(f"{self.models_path}/item_neighbors.npz").tocsr()
+            if self.item_neighbors.shape[0] != self.user_item_matrix.shape[1]:
+                logger.warning(f"Index item-item incompatible ({self.item_neighbors.shape} vs "
+                               f"{self.user_item_matrix.shape[1]} articles), ignoré")
+                self.item_neighbors = None
+            else:
+                logger.info(f"Index item-item chargé: {self.item_neighbors.nnz} voisins")
+        except FileNotFoundError:
+            logger.info("Index item-item non trouvé, collaborative filtering user-user")
+            self.item_neighbors = None
+
+    def _load_legacy_profiles(self):
+        """Profils utilisateurs (historiques de lecture)"""
+        # Charger les profils utilisateurs
+        with open(f"{self.models_path}/user_profiles.json", 'r') as f:
+            self.user_profiles = json.load(f)
+        # Convertir les clés en int
+        self.user_profiles = {int(k): v for k, v in self.user_profiles.items()}
+        logger.info(f"Profils utilisateurs chargés: {len(self.user_profiles)} users")
+        self._compact_legacy_profiles()
+
+    def _compact_legacy_profiles(self):
+        """Remplace le dict de profils chargé par un ProfileStore (tableaux typés)"""
+        self.user_profiles = ProfileStore.from_profiles(self.user_profiles)
+        logger.info(f"Profils compactés: {self.user_profiles.nbytes / 1024**2:.1f} Mo "
+                    f"(statistiques par article: {bool(self.user_profiles.stats)})")
+
+    def _load_legacy_embeddings(self):
+        """Embeddings d'articles, matrice normalisée et index ANN"""
+        # Charger les embeddings
+        with open(f"{self.models_path}/embeddings_filtered.pkl", 'rb') as f:
+            self.embeddings = pickle.load(f)
+        logger.info(f"Embeddings chargés: {len(self.embeddings)} articles")
+
+        self._build_embedding_index()
+        self._load_legacy_user_embeddings()
+
+    def _load_legacy_user_embeddings(self):
+        """Embeddings de profil pré-calculés (build_user_embeddings.py), ignorés s'ils sont incompatibles"""
+        try:
+            with open(f"{self.models_path}/user_embeddings.json", 'r') as f:
+                meta = json.load(f)
+            user_embeddings = np.load(f"{self.models_path}/user_embeddings.npy", mmap_mode='r')
+        except FileNotFoundError:
+            logger.info("Embeddings de profil pré-calculés non trouvés, calcul à la volée")
+            return
+
+        # Lignes alignées sur user_to_idx, historiques issus des mêmes profils que le moteur
+        expected_shape = (len(self.mappings['user_to_idx']), self.embedding_matrix.shape[1])
+        if user_embeddings.shape != expected_shape or meta.get('profiles_file') != self._legacy_profiles_file():
+            logger.warning(f"Embeddings de profil incompatibles ({user_embeddings.shape}, "
+                           f"profils: {meta.get('profiles_file')}), calcul à la volée")
+            return
+
+        self.user_embeddings = user_embeddings
+        logger.info(f"Embeddings de profil pré-calculés chargés: {user_embeddings.shape}")
+
+    def _legacy_model_files(self) -> List[str]:
+        """Fichiers lus en mode legacy (socle et composants lourds), pour la version des modèles"""
+        return ["mappings.pkl", "article_popularity.pkl", "articles_metadata.csv",
+                "user_item_matrix.npz", "user_item_matrix_weighted.npz", "item_neighbors.npz",
+                self._legacy_profiles_file(), "embeddings_filtered.pkl", "embeddings_ivf.npz",
+                "user_embeddings.npy", "user_embeddings.json"]
+
+    def _legacy_profiles_file(self) -> str:
+        """Fichier de profils lu par _load_legacy_profiles"""
+        return "user_profiles.json"
+
+    def _load_bundle(self, bundle_path: str):
+        """
+        Ouvre le bundle binaire (build_model_bundle.py) en mémoire mappée et installe le socle
+
+        Aucun pickle ni CSV n'est désérialisé: matrices CSR, mappings, profils,
+        embeddings et métadonnées pointent directement sur les fichiers .npy.
+        """
+        manifest, arrays = load_bundle(bundle_path)
+        self._bundle_manifest = manifest
+        self._bundle_arrays = arrays
+        self.model_version = manifest['version']
+        self._delta_base_version = self.model_version
+        logger.info(f"Bundle {self.model_version} ouvert: {len(arrays)} tableaux (mmap)")
+
+        self.idx_to_article_array = arrays['article_ids']
+        self.article_index = bundle_id_index(arrays, 'article_ids')
+        self.mappings = {
+            'user_to_idx': bundle_id_index(arrays, 'user_ids'),
+            'idx_to_user': arrays['user_ids'],
+            'article_to_idx': self.article_index,
+            'idx_to_article': self.idx_to_article_array
+        }
+
+        self.article_store = ArticleMetadataStore(
+            article_ids=arrays['metadata_article_ids'],
+            category_id=arrays['metadata_category_id'],
+            publisher_id=arrays['metadata_publisher_id'],
+            words_count=arrays['metadata_words_count'],
+            created_at_ts=arrays['metadata_created_at_ts']
+        )
+        self.article_timestamps = self.article_store.column_view('created_at_ts')
+        self.article_categories = self.article_store.column_view('category_id')
+
+        self._set_popularity_arrays(arrays['popularity_article_ids'], arrays['popularity_scores'])
+
+    def _load_bundle_matrices(self):
+        """Matrices user-item et index item-item du bundle (CSR sans copie)"""
+        manifest, arrays = self._bundle_manifest, self._bundle_arrays
+        self.user_item_matrix = bundle_csr(manifest, arrays, 'user_item')
+        self.weighted_user_item_matrix = bundle_csr(manifest, arrays, 'user_item_weighted')
+        self.item_neighbors = bundle_csr(manifest, arrays, 'item_neighbors')
+        logger.info(f"Matrice user-item: {self.user_item_matrix.shape}, "
+                    f"pondérée: {self.weighted_user_item_matrix is not None}, "
+                    f"index item-item: {self.item_neighbors is not None}")
+
+    def _load_bundle_profiles(self):
+        """Profils utilisateurs du bundle (CSR)"""
+        arrays = self._bundle_arrays
+        self.user_profiles = ProfileStore(
+            bundle_id_index(arrays, 'profile_user_ids'),
+            arrays['profile_offsets'], arrays['profile_article_ids'], arrays['profile_weights']
+        )
+        logger.info(f"Profils utilisateurs (CSR): {len(self.user_profiles)} users")
+
+    def _load_bundle_embeddings(self):
+        """Embeddings normalisés et index ANN du bundle"""
+        arrays = self._bundle_arrays
+        self.embedding_article_ids = arrays['embedding_article_ids']
+        self.embedding_index = bundle_id_index(arrays, 'embedding_article_ids')
+        self.embedding_matrix = arrays['embedding_matrix']
+        self.embedding_norms = arrays['embedding_norms']
+        self.user_embeddings = arrays.get('user_embeddings')
+        self.embedding_categories = self.article_store.categories(self.embedding_article_ids).astype(np.int64)
+        self.n_categories = int(self.article_store.category_id.max()) + 1
+        if 'ivf_centroids' in arrays:
+            self.ann_centroids = arrays['ivf_centroids']
+            self.ann_list_offsets = arrays['ivf_list_offsets']
+            self.ann_list_rows = arrays['ivf_list_rows']
+        logger.info(f"Embeddings: {self.embedding_matrix.shape}, index ANN: {self.ann_centroids is not None}, "
+                    f"profils pré-calculés: {self.user_embeddings is not None}")
+
+    def _build_embedding_index(self):
+        """
+        Construit la matrice d'embeddings normalisée pour le scoring content-based
+
+        La similarité cosinus avec tous les articles devient un seul produit
+        matrice-vecteur (BLAS) au lieu d'un appel scipy par article.
+        """
+        self.embedding_article_ids = np.fromiter(self.embeddings.keys(), dtype=np.int64,
+                                                 count=len(self.embeddings))
+        self.embedding_index = IdIndex.from_ids(self.embedding_article_ids)
+        matrix = np.ascontiguousarray(np.stack(list(self.embeddings.values())), dtype=np.float32)
+
+        self.embedding_norms = np.linalg.norm(matrix, axis=1)
+        self.embedding_matrix = matrix / np.where(self.embedding_norms == 0, 1.0, self.embedding_norms)[:, None]
+
+        self.embedding_categories = self.article_store.categories(self.embedding_article_ids).astype(np.int64)
+        self.n_categories = int(self.article_store.category_id.max()) + 1
+
+        logger.info(f"Matrice d'embeddings normalisée: {self.embedding_matrix.shape} "
+                    f"({self.embedding_matrix.nbytes / 1024**2:.1f} MB)")
+
+        # Index ANN optionnel (build_embedding_ann_index.py)
+        try:
+            ivf = np.load(f"{self.models_path}/embeddings_ivf.npz")
+        except FileNotFoundError:
+            logger.info("Index ANN non trouvé, recherche content-based exacte")
+            return
+
+        rows = self.embedding_index.rows(ivf['list_article_ids'])
+        if (rows < 0).any():
+            logger.warning("Index ANN incompatible avec embeddings_filtered.pkl, ignoré")
+            return
+
+        self.ann_centroids = ivf['centroids'].astype(np.float32)
+        self.ann_list_offsets = ivf['list_offsets']
+        self.ann_list_rows = rows
+        logger.info(f"Index ANN chargé: {len(self.ann_centroids)} clusters")
+
+    def _ann_candidate_rows(self, query: np.ndarray, n_probe: int) -> np.ndarray:
+        """
+        Lignes de embedding_matrix appartenant aux n_probe clusters les plus proches de la requête
+
+        Args:
+            query: Embedding du profil, normalisé
+            n_probe: Nombre de clusters explorés (plus élevé = meilleur rappel, plus lent)
+        """
+        n_probe = min(n_probe, len(self.ann_centroids))
+        probes = np.argpartition(-(self.ann_centroids @ query), n_probe - 1)[:n_probe]
+        return np.concatenate([
+            self.ann_list_rows[self.ann_list_offsets[c]:self.ann_list_offsets[c + 1]] for c in probes
+        ])
+
+    def _build_popularity_index(self):
+        """Convertit article_popularity (dict ou DataFrame) en tableaux NumPy alignés"""
+        if isinstance(self.article_popularity, dict):
+            article_ids = list(self.article_popularity.keys())
+            base_scores = list(self.article_popularity.values())
+        else:
+            article_ids = self.article_popularity.index.values
+            base_scores = self.article_popularity['popularity_score'].values
+        self._set_popularity_arrays(article_ids, base_scores)
+
+    def _set_popularity_arrays(self, article_ids, base_scores):
+        """Installe les tableaux de popularité et vide le cache des classements"""
+        self.popularity_article_ids = np.asarray(article_ids, dtype=np.int64)
+        self.popularity_base_scores = np.asarray(base_scores, dtype=np.float64)
+        rows = self.article_store.rows(self.popularity_article_ids)
+        self.popularity_created_ts = np.where(rows >= 0, self.article_store.created_at_ts[rows], np.nan)
+        with self._popularity_lock:
+            self._popularity_rankings.clear()
+
+    def _popularity_ranking(self, now_ts: int, use_temporal_decay: bool, decay_half_life_days: float,
+                            max_age_days: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Classement de popularité (ids et scores triés par score décroissant) pour le bucket de now_ts
+
+        Le classement est calculé une fois par bucket de POPULARITY_BUCKET_MS (âge mesuré au début
+        du bucket), puis réutilisé par toutes les requêtes du même bucket.
+        """
+        bucket_ts = now_ts - now_ts % self.POPULARITY_BUCKET_MS
+        key = (bucket_ts, use_temporal_decay, decay_half_life_days, max_age_days)
+
+        with self._popularity_lock:
+            ranking = self._popularity_rankings.get(key)
+            if ranking is not None:
+                self._popularity_rankings.move_to_end(key)
+                return ranking
+
+        has_timestamp = ~np.isnan(self.popularity_created_ts)
+        age_days = (bucket_ts - self.popularity_created_ts) / (86400 * 1000)  # Convertir ms -> jours
+
+        # FENÊTRE DE HYPE: Exclure articles trop vieux (articles sans timestamp conservés)
+        too_old = has_timestamp & (age_days > max_age_days)
+
+        scores = self.popularity_base_scores
+        if use_temporal_decay:
+            # Décroissance exponentielle: half-life = 7 jours pour news
+            decay_factor = np.exp(-np.where(has_timestamp, age_days, 0.0) * np.log(2) / decay_half_life_days)
+            scores = scores * decay_factor
+
+        keep = ~too_old
+        order = np.argsort(-scores[keep], kind='stable')
+        ranking = (self.popularity_article_ids[keep][order], scores[keep][order])
+
+        excluded_old_count = int(too_old.sum())
+        if excluded_old_count > 0:
+            logger.info(f"Fenêtre de hype: {excluded_old_count} articles exclus (> {max_age_days} jours)")
+        missing_count = int((~has_timestamp).sum())
+        if missing_count > 0:
+            logger.warning(f"{missing_count} articles sans timestamp, inclus par défaut")
+
+        with self._popularity_lock:
+            self._popularity_rankings[key] = ranking
+            while len(self._popularity_rankings) > self.POPULARITY_CACHE_SIZE:
+                self._popularity_rankings.popitem(last=False)
+
+        return ranking
+
     def _get_user_history(self, user_id: int) -> List[int]:
         """Récupère l'historique d'articles d'un utilisateur"""
+        self._ensure_component(self.COMPONENT_PROFILES)
+        if isinstance(self.user_profiles, ProfileStore):
+            return self.user_profiles.history(user_id)
+        # Profils injectés sous forme de dict (ex: tuning des poids)
         if user_id in self.user_profiles:
             return self.user_profiles[user_id]['articles_read']
         return []
 
+    @staticmethod
+    def _history_list(user_history: Sequence[int]) -> List[int]:
+        """Historique fourni par l'appelant (liste, tableau ou vue numpy) -> liste d'ids Python"""
+        return np.asarray(user_history, dtype=np.int64).tolist()
+
     def _collaborative_filtering(self, user_id: int, n_recommendations: int = 20,
-                                 use_weighted_matrix: bool = True) -> List[Tuple[int, float]]:
+                                 use_weighted_matrix: bool = True,
+                                 cf_mode: Optional[str] = None) -> List[Tuple[int, float]]:
         """
         Recommandations par filtrage collaboratif avec matrice pondérée
 
@@ -125,6 +663,8 @@ class RecommendationEngine:
             user_id: ID de l'utilisateur
             n_recommendations: Nombre de recommandations
             use_weighted_matrix: Utiliser la matrice pondérée si disponible (défaut: True)
+            cf_mode: CF_MODE_ITEM, CF_MODE_USER ou CF_MODE_USER_LOOP
+                     (défaut: CF_MODE_ITEM si l'index item-item est chargé, sinon CF_MODE_USER)
 
         Returns:
             Liste de tuples (article_id, score)
@@ -132,7 +672,12 @@ class RecommendationEngine:
         Note:
             Matrice pondérée capture l'engagement réel (temps, qualité) vs simple counts.
             Amélioration attendue: +2-5% HR@5 (littérature: +15-30% weighted vs binary)
+
+            Si l'index item-item (item_neighbors.npz) est chargé, le score est obtenu par
+            lookups creux uniquement (voir _item_based_filtering), sans similarité user-user.
         """
+        self._ensure_component(self.COMPONENT_MATRICES)
+
         # Vérifier si l'utilisateur existe dans la matrice
         if user_id not in self.mappings['user_to_idx']:
             logger.info(f"Utilisateur {user_id} inconnu pour collaborative filtering")
@@ -148,19 +693,128 @@ class RecommendationEngine:
             matrix = self.user_item_matrix
             logger.debug(f"Utilisation de la matrice COUNTS pour collaborative filtering")
 
-        # Obtenir le vecteur de l'utilisateur
-        user_vector = matrix[user_idx].toarray().flatten()
+        if cf_mode is None:
+            cf_mode = self.CF_MODE_ITEM if self.item_neighbors is not None else self.CF_MODE_USER
+
+        # Index item-item pré-calculé: coût indépendant du nombre d'utilisateurs
+        if cf_mode == self.CF_MODE_ITEM:
+            if self.item_neighbors is None:
+                raise ValueError("Mode item_knn demandé mais item_neighbors.npz n'est pas chargé")
+            return self._item_based_filtering(matrix[user_idx], n_recommendations)
+
+        user_row = matrix[user_idx]
 
         # Calculer la similarité avec tous les autres utilisateurs
-        similarities = cosine_similarity(
-            matrix[user_idx],
-            matrix
-        ).flatten()
+        similarities = cosine_similarity(user_row, matrix).flatten()
 
         # Trouver les k utilisateurs les plus similaires (exclure l'utilisateur lui-même)
-        k = min(50, self.user_item_matrix.shape[0])
+        k = min(self.K_SIMILAR_USERS, self.user_item_matrix.shape[0])
         similar_users_idx = np.argsort(similarities)[-k-1:-1][::-1]
 
+        if cf_mode == self.CF_MODE_USER_LOOP:
+            return self._user_based_filtering_loop(user_row, matrix, similarities,
+                                                   similar_users_idx, n_recommendations)
+
+        # Agrégation vectorisée: score = somme_v sim(u, v) * poids(v, article)
+        neighbors = similar_users_idx[similarities[similar_users_idx] > 0]
+        if len(neighbors) == 0:
+            return []
+
+        neighbor_weights = csr_matrix(similarities[neighbors].reshape(1, -1))
+        scores = (neighbor_weights @ matrix[neighbors]).tocsr()
+        scores.sum_duplicates()
+
+        # Exclure les articles déjà lus
+        candidates = scores.indices
+        values = scores.data
+        unread = ~np.isin(candidates, user_row.indices) & (values > 0)
+
+        return self._top_n_articles(candidates[unread], values[unread], n_recommendations)
+
+    def _collaborative_filtering_batch(self, user_ids: List[int], n_recommendations: int = 20,
+                                       use_weighted_matrix: bool = True,
+                                       cf_mode: Optional[str] = None) -> Dict[int, List[Tuple[int, float]]]:
+        """
+        Collaborative filtering pour un lot d'utilisateurs (produits matrice-matrice creux)
+
+        Même résultat que _collaborative_filtering appelé pour chaque utilisateur:
+        - item_knn: scores = lignes du lot @ item_neighbors
+        - user_knn: similarités (chunk × n_users) en un appel, puis matrice creuse
+          des voisins (chunk × n_users) @ matrice user-item
+
+        Returns:
+            Dict user_id -> liste de tuples (article_id, score)
+        """
+        results = {user_id: [] for user_id in user_ids}
+        if not user_ids:
+            return results
+        self._ensure_component(self.COMPONENT_MATRICES)
+
+        known_users = [user_id for user_id in user_ids if user_id in self.mappings['user_to_idx']]
+
+        if use_weighted_matrix and self.weighted_user_item_matrix is not None:
+            matrix = self.weighted_user_item_matrix
+        else:
+            matrix = self.user_item_matrix
+
+        if cf_mode is None:
+            cf_mode = self.CF_MODE_ITEM if self.item_neighbors is not None else self.CF_MODE_USER
+        if cf_mode == self.CF_MODE_ITEM and self.item_neighbors is None:
+            raise ValueError("Mode item_knn demandé mais item_neighbors.npz n'est pas chargé")
+
+        k = min(self.K_SIMILAR_USERS, self.user_item_matrix.shape[0])
+
+        for start in range(0, len(known_users), self.BATCH_CHUNK_SIZE):
+            chunk = known_users[start:start + self.BATCH_CHUNK_SIZE]
+            batch_rows = matrix[[self.mappings['user_to_idx'][user_id] for user_id in chunk]]
+
+            if cf_mode == self.CF_MODE_ITEM:
+                scores = batch_rows @ self.item_neighbors
+            else:
+                similarities = cosine_similarity(batch_rows, matrix)
+                similar_users_idx = np.argsort(similarities, axis=1)[:, -k-1:-1][:, ::-1]
+
+                if cf_mode == self.CF_MODE_USER_LOOP:
+                    for i, user_id in enumerate(chunk):
+                        results[user_id] = self._user_based_filtering_loop(
+                            batch_rows[i], matrix, similarities[i], similar_users_idx[i], n_recommendations)
+                    continue
+
+                # Voisins à similarité positive, dans l'ordre de similarité décroissante
+                neighbor_sims = np.take_along_axis(similarities, similar_users_idx, axis=1)
+                positive = neighbor_sims > 0
+                neighbor_weights = csr_matrix(
+                    (neighbor_sims[positive], similar_users_idx[positive],
+                     np.concatenate([[0], np.cumsum(positive.sum(axis=1))])),
+                    shape=(len(chunk), matrix.shape[0])
+                )
+                scores = neighbor_weights @ matrix
+
+            scores = scores.tocsr()
+            scores.sum_duplicates()
+
+            for i, user_id in enumerate(chunk):
+                candidates = scores.indices[scores.indptr[i]:scores.indptr[i + 1]]
+                values = scores.data[scores.indptr[i]:scores.indptr[i + 1]]
+                read = batch_rows.indices[batch_rows.indptr[i]:batch_rows.indptr[i + 1]]
+
+                # Exclure les articles déjà lus
+                unread = ~np.isin(candidates, read) & (values > 0)
+                results[user_id] = self._top_n_articles(candidates[unread], values[unread], n_recommendations)
+
+        return results
+
+    def _user_based_filtering_loop(self, user_row, matrix, similarities: np.ndarray,
+                                   similar_users_idx: np.ndarray,
+                                   n_recommendations: int) -> List[Tuple[int, float]]:
+        """
+        Agrégation user-user historique (boucle Python), conservée pour les tests de parité
+
+        Returns:
+            Liste de tuples (article_id, score)
+        """
+        user_vector = user_row.toarray().flatten()
+
         # Agréger les articles des utilisateurs similaires
         recommended_articles = {}
         for sim_user_idx in similar_users_idx:
@@ -180,8 +834,63 @@ class RecommendationEngine:
 
         return sorted_articles[:n_recommendations]
 
+    def _item_based_filtering(self, user_row, n_recommendations: int = 20) -> List[Tuple[int, float]]:
+        """
+        Collaborative filtering item-item via l'index top-K pré-calculé
+
+        Args:
+            user_row: Ligne sparse (1 × n_articles) de l'utilisateur
+            n_recommendations: Nombre de recommandations
+
+        Returns:
+            Liste de tuples (article_id, score)
+
+        Note:
+            score(j) = somme_i poids(u, i) * sim(i, j), calculé par un seul produit creux.
+            Coût proportionnel à len(historique) × K, indépendant du nombre d'utilisateurs.
+        """
+        scores = (user_row @ self.item_neighbors).tocsr()
+        scores.sum_duplicates()
+
+        # Exclure les articles déjà lus
+        candidates = scores.indices
+        values = scores.data
+        unread = ~np.isin(candidates, user_row.indices) & (values > 0)
+
+        return self._top_n_articles(candidates[unread], values[unread], n_recommendations)
+
+    def _top_n_articles(self, article_idx: np.ndarray, scores: np.ndarray, n_recommendations: int,
+                        article_ids: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Sélectionne les n meilleurs scores (argpartition) et convertit les index en article_id
+
+        Args:
+            article_idx: Index des articles candidats
+            scores: Scores associés
+            n_recommendations: Nombre de recommandations
+            article_ids: Tableau index -> article_id (défaut: idx_to_article_array, index matriciels)
+
+        Returns:
+            Liste de tuples (article_id, score) triée par score décroissant
+        """
+        if len(scores) == 0:
+            return []
+
+        if len(scores) > n_recommendations:
+            top = np.argpartition(-scores, n_recommendations - 1)[:n_recommendations]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        if article_ids is None:
+            article_ids = self.idx_to_article_array
+        return [(int(a), float(s)) for a, s in zip(article_ids[article_idx[top]], scores[top])]
+
     def _content_based_filtering(self, user_id: int, n_recommendations: int = 20,
-                                 use_weighted_aggregation: bool = True) -> List[Tuple[int, float]]:
+                                 use_weighted_aggregation: bool = True,
+                                 use_ann: bool = True, n_probe: Optional[int] = None,
+                                 user_history: Optional[Sequence[int]] = None,
+                                 user_weights: Optional[Sequence[float]] = None) -> List[Tuple[int, float]]:
         """
         Recommandations par filtrage basé sur le contenu avec agrégation pondérée
 
@@ -189,6 +898,12 @@ class RecommendationEngine:
             user_id: ID de l'utilisateur
             n_recommendations: Nombre de recommandations
             use_weighted_aggregation: Utiliser les poids d'interaction pour agréger (défaut: True)
+            use_ann: Utiliser l'index IVF s'il est chargé (défaut: True)
+            n_probe: Clusters IVF explorés (défaut: ANN_N_PROBE)
+            user_history: Historique à utiliser à la place du profil (l'embedding de profil
+                pré-calculé, qui porte sur le profil complet, est alors recalculé)
+            user_weights: Poids de chaque article de user_history pour l'embedding de profil
+                (défaut: lignes de la matrice pondérée)
 
         Returns:
             Liste de tuples (article_id, score)
@@ -198,75 +913,217 @@ class RecommendationEngine:
             Amélioration attendue: +1-3% HR@5
         """
         # Récupérer l'historique de l'utilisateur
-        user_history = self._get_user_history(user_id)
+        use_stored_embedding = user_history is None
+        user_history = self._get_user_history(user_id) if user_history is None else user_history
 
-        if not user_history:
+        if len(user_history) == 0:
             logger.info(f"Pas d'historique pour l'utilisateur {user_id}")
             return []
 
-        # Calculer l'embedding avec pondération par interaction_weight si disponible
-        user_embeddings = []
-        weights = []
+        profile = self._content_profile(user_id, user_history, use_weighted_aggregation, use_stored_embedding,
+                                        user_weights)
+        if profile is None:
+            return []
+        query, category_counts = profile
+
+        # Similarité cosinus (un seul produit matrice-vecteur), exacte ou restreinte par l'index ANN
+        if use_ann and self.ann_centroids is not None:
+            rows = self._ann_candidate_rows(query, n_probe or self.ANN_N_PROBE)
+            similarities = self.embedding_matrix[rows] @ query
+        else:
+            rows = np.arange(len(self.embedding_article_ids))
+            similarities = self.embedding_matrix @ query
+
+        return self._content_top_n(rows, similarities, category_counts, user_history, n_recommendations)
+
+    def _content_profile(self, user_id: int, user_history: List[int],
+                         use_weighted_aggregation: bool = True,
+                         use_stored_embedding: bool = True,
+                         user_weights: Optional[Sequence[float]] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Embedding de profil (requête normalisée) et fréquences des catégories de l'historique
+
+        use_stored_embedding: Lire l'embedding pré-calculé (valable pour l'historique du profil
+        uniquement), sinon le recalculer sur user_history
+        user_weights: Poids des articles de user_history, prioritaires sur la matrice pondérée
 
-        if user_id in self.mappings['user_to_idx'] and use_weighted_aggregation and self.weighted_user_item_matrix is not None:
+        Returns:
+            (query, category_counts), None si aucun article lu n'a d'embedding exploitable
+        """
+        self._ensure_component(self.COMPONENT_EMBEDDINGS)
+        if use_weighted_aggregation:
+            self._ensure_component(self.COMPONENT_MATRICES)
+
+        history = np.asarray(user_history, dtype=np.int64)
+        weighted = (use_weighted_aggregation and self.weighted_user_item_matrix is not None
+                    and user_id in self.mappings['user_to_idx'])
+        user_idx = self.mappings['user_to_idx'][user_id] if weighted else None
+
+        if use_weighted_aggregation and user_weights is not None:
+            # Poids fournis par l'appelant (ex: poids d'interaction d'un trial de tuning)
+            query = self._profile_query(history, weights=user_weights)
+        elif weighted and self.user_embeddings is not None and use_stored_embedding:
+            # Embedding pré-calculé (ou recalculé par update_user_embedding): lecture d'une ligne
+            query = self._stored_profile_query(user_idx)
+        else:
+            query = self._profile_query(history, user_idx)
+        if query is None:
+            return None
+
+        # Calculer les catégories préférées de l'utilisateur (lookup vectorisé)
+        history_categories = self.article_store.categories(history)
+        category_counts = np.bincount(history_categories[history_categories >= 0],
+                                      minlength=self.n_categories + 1).astype(np.float32)  # +1: inconnue (-1)
+        category_counts[-1] = 0.0
+
+        return query, category_counts
+
+    def _profile_query(self, history: np.ndarray, user_idx: Optional[int] = None,
+                       weights: Optional[Sequence[float]] = None) -> Optional[np.ndarray]:
+        """
+        Calcule l'embedding de profil normalisé à partir de l'historique
+
+        Args:
+            history: Articles lus
+            user_idx: Ligne de la matrice pondérée (poids interaction_weight), None = poids uniformes
+            weights: Poids de chaque article de history (prioritaires sur user_idx)
+
+        Returns:
+            Requête normalisée (float32), None si aucun article lu n'a d'embedding exploitable
+        """
+        embedding_rows = self.embedding_index.rows(history)
+
+        if weights is not None:
+            # Poids alignés sur l'historique (articles sans poids exploitable ignorés)
+            weights = np.nan_to_num(np.asarray(weights, dtype=np.float64))
+            keep = (embedding_rows >= 0) & (weights > 0)
+        elif user_idx is not None:
             # Utiliser les poids de la matrice pondérée
-            user_idx = self.mappings['user_to_idx'][user_id]
             user_weights_vector = self.weighted_user_item_matrix[user_idx].toarray().flatten()
-
-            for article_id in user_history:
-                if article_id in self.embeddings and article_id in self.mappings['article_to_idx']:
-                    article_idx = self.mappings['article_to_idx'][article_id]
-                    weight = user_weights_vector[article_idx]
-                    if weight > 0:
-                        user_embeddings.append(self.embeddings[article_id])
-                        weights.append(weight)
+            article_idx = self.article_index.rows(history)
+            weights = np.where(article_idx >= 0, user_weights_vector[article_idx], 0.0)
+            keep = (embedding_rows >= 0) & (weights > 0)
         else:
             # Fallback: pas de pondération (poids uniformes)
-            for article_id in user_history:
-                if article_id in self.embeddings:
-                    user_embeddings.append(self.embeddings[article_id])
-                    weights.append(1.0)
+            weights = np.ones(len(history))
+            keep = embedding_rows >= 0
+
+        if not keep.any():
+            return None
+
+        # Embedding du profil utilisateur: moyenne pondérée des embeddings bruts (normalisés × normes)
+        rows = embedding_rows[keep]
+        weights = weights[keep]
+        user_embeddings = self.embedding_matrix[rows] * self.embedding_norms[rows][:, None]
+        user_profile_embedding = (weights / weights.sum()) @ user_embeddings
+
+        # Requête normalisée pour la similarité cosinus
+        profile_norm = np.linalg.norm(user_profile_embedding)
+        if profile_norm == 0:
+            return None
+        return (user_profile_embedding / profile_norm).astype(np.float32)
+
+    def _stored_profile_query(self, user_idx: int) -> Optional[np.ndarray]:
+        """Embedding de profil pré-calculé (surcouche incrémentale prioritaire), None si ligne vide"""
+        if user_idx in self._user_embedding_overrides:
+            return self._user_embedding_overrides[user_idx]
+        row = np.array(self.user_embeddings[user_idx], dtype=np.float32)
+        return row if row.any() else None
+
+    def update_user_embedding(self, user_id: int):
+        """
+        Recalcule l'embedding de profil d'un utilisateur dont l'historique a changé
 
-        if not user_embeddings:
-            return []
+        Chemin incrémental: la table pré-calculée (mmap, lecture seule) n'est pas réécrite,
+        la nouvelle requête est gardée en surcouche et prime sur la ligne d'origine.
+        À appeler après toute modification de user_profiles[user_id].
 
-        # Calculer l'embedding du profil utilisateur (pondéré ou moyen)
-        if weights and sum(weights) > 0:
-            weights_array = np.array(weights)
-            weights_normalized = weights_array / weights_array.sum()
-            user_profile_embedding = np.average(user_embeddings, axis=0, weights=weights_normalized)
-        else:
-            user_profile_embedding = np.mean(user_embeddings, axis=0)
-
-        # Calculer les catégories préférées de l'utilisateur (lookup optimisé)
-        user_categories = {}
-        for article_id in user_history:
-            if article_id in self.article_categories:
-                category = self.article_categories[article_id]
-                user_categories[category] = user_categories.get(category, 0) + 1
-
-        # Calculer la similarité avec tous les articles + category boost (optimisé)
-        article_scores = {}
-        for article_id, embedding in self.embeddings.items():
-            if article_id not in user_history:  # Ne pas recommander ce qui a déjà été lu
-                # Similarité de contenu
-                similarity = 1 - cosine(user_profile_embedding, embedding)
-
-                # Category boost: +10% si dans catégories préférées (lookup optimisé O(1))
-                if user_categories and article_id in self.article_categories:
-                    category = self.article_categories[article_id]
-                    if category in user_categories:
-                        # Boost proportionnel à la fréquence de cette catégorie
-                        category_freq = user_categories[category] / len(user_history)
-                        boost = 1.0 + (0.1 * category_freq)  # Max +10% boost
-                        similarity *= boost
-
-                article_scores[article_id] = similarity
+        Args:
+            user_id: ID de l'utilisateur
+        """
+        self._ensure_component(self.COMPONENT_EMBEDDINGS)
+        self._ensure_component(self.COMPONENT_MATRICES)
+        if (self.user_embeddings is None or self.weighted_user_item_matrix is None
+                or user_id not in self.mappings['user_to_idx']):
+            return
 
-        # Trier par score
-        sorted_articles = sorted(article_scores.items(), key=lambda x: x[1], reverse=True)
+        user_idx = self.mappings['user_to_idx'][user_id]
+        history = np.asarray(self._get_user_history(user_id), dtype=np.int64)
+        self._user_embedding_overrides[user_idx] = self._profile_query(history, user_idx)
 
-        return sorted_articles[:n_recommendations]
+    def _content_top_n(self, rows: np.ndarray, similarities: np.ndarray, category_counts: np.ndarray,
+                       user_history: List[int], n_recommendations: int) -> List[Tuple[int, float]]:
+        """
+        Applique le category boost, exclut les articles lus et garde les n meilleurs
+
+        Args:
+            rows: Lignes de embedding_matrix scorées
+            similarities: Similarité cosinus de chaque ligne avec le profil
+            category_counts: Fréquences des catégories de l'historique (voir _content_profile)
+            user_history: Articles lus
+            n_recommendations: Nombre de recommandations
+        """
+        # Category boost: jusqu'à +10%, proportionnel à la fréquence de la catégorie dans l'historique
+        similarities = similarities * (1.0 + 0.1 * (category_counts[self.embedding_categories[rows]]
+                                                    / len(user_history)))
+
+        # Ne pas recommander ce qui a déjà été lu
+        unread = ~np.isin(self.embedding_article_ids[rows], user_history)
+
+        return self._top_n_articles(rows[unread], similarities[unread], n_recommendations,
+                                    self.embedding_article_ids)
+
+    def _content_based_filtering_batch(self, user_histories: Dict[int, List[int]], n_recommendations: int = 20,
+                                       use_weighted_aggregation: bool = True, use_ann: bool = True,
+                                       n_probe: Optional[int] = None) -> Dict[int, List[Tuple[int, float]]]:
+        """
+        Content-based pour un lot d'utilisateurs: requêtes empilées, un produit matrice-matrice par chunk
+
+        Même recherche que _content_based_filtering (mêmes candidats pour un utilisateur servi
+        en ligne, par lot ou depuis la table pré-calculée): si l'index IVF est chargé, chaque
+        requête n'est scorée que sur les lignes de ses n_probe clusters.
+
+        Args:
+            user_histories: Dict user_id -> articles lus
+            n_recommendations: Nombre de recommandations par utilisateur
+            use_weighted_aggregation: Utiliser les poids d'interaction pour agréger
+            use_ann: Utiliser l'index IVF s'il est chargé (défaut: True)
+            n_probe: Clusters IVF explorés (défaut: ANN_N_PROBE)
+
+        Returns:
+            Dict user_id -> liste de tuples (article_id, score)
+        """
+        results = {user_id: [] for user_id in user_histories}
+        profiles = {}
+        for user_id, user_history in user_histories.items():
+            if user_history:
+                profile = self._content_profile(user_id, user_history, use_weighted_aggregation)
+                if profile is not None:
+                    profiles[user_id] = profile
+
+        profiled_users = list(profiles)
+        if not profiled_users:
+            return results
+
+        if use_ann and self.ann_centroids is not None:
+            for user_id in profiled_users:
+                query, category_counts = profiles[user_id]
+                rows = self._ann_candidate_rows(query, n_probe or self.ANN_N_PROBE)
+                results[user_id] = self._content_top_n(rows, self.embedding_matrix[rows] @ query, category_counts,
+                                                       user_histories[user_id], n_recommendations)
+            return results
+
+        all_rows = np.arange(len(self.embedding_article_ids))
+        for start in range(0, len(profiled_users), self.BATCH_CHUNK_SIZE):
+            chunk = profiled_users[start:start + self.BATCH_CHUNK_SIZE]
+            queries = np.stack([profiles[user_id][0] for user_id in chunk])
+            similarities = queries @ self.embedding_matrix.T  # chunk × n_articles
+
+            for i, user_id in enumerate(chunk):
+                results[user_id] = self._content_top_n(all_rows, similarities[i], profiles[user_id][1],
+                                                       user_histories[user_id], n_recommendations)
+
+        return results
 
     def _popularity_based(self, n_recommendations: int = 20, exclude_articles: Optional[List[int]] = None,
                          use_temporal_decay: bool = True, decay_half_life_days: float = 7.0,
@@ -297,8 +1154,11 @@ class RecommendationEngine:
             - Age 7j: 50% du score (half-life)
             - Age 14j: 25% du score (limite)
             - Age >14j: EXCLU (hors fenêtre de hype)
+
+            Le classement est pré-calculé par bucket de POPULARITY_BUCKET_MS (1h): par requête,
+            il ne reste qu'à parcourir le top en sautant les articles déjà lus.
         """
-        exclude_articles = exclude_articles or []
+        exclude_articles = set(exclude_articles) if exclude_articles else set()
 
         # Fenêtre de hype par défaut: 14 jours (state-of-art)
         if max_age_days is None:
@@ -309,48 +1169,22 @@ class RecommendationEngine:
             import time
             now_ts = int(time.time() * 1000)
         else:
-            now_ts = reference_timestamp
+            now_ts = int(reference_timestamp)
 
-        # Filtrer et calculer scores avec fenêtre de hype + temporal decay
-        popular_articles = []
-        excluded_old_count = 0  # Pour logging
-
-        for article_id, row in self.article_popularity.iterrows():
-            if article_id not in exclude_articles:
-                base_score = row['popularity_score']
-
-                if article_id in self.article_timestamps:
-                    # Lookup optimisé O(1) au lieu de O(n) DataFrame scan
-                    created_ts = self.article_timestamps[article_id]
-                    age_ms = now_ts - created_ts
-                    age_days = age_ms / (86400 * 1000)  # Convertir ms -> jours
-
-                    # FENÊTRE DE HYPE: Exclure articles trop vieux
-                    if age_days > max_age_days:
-                        excluded_old_count += 1
-                        continue  # Article trop vieux, pas recommandé
-
-                    if use_temporal_decay:
-                        # Décroissance exponentielle: half-life = 7 jours pour news
-                        # Après 7 jours: score *= 0.5
-                        # Après 14 jours: score *= 0.25
-                        decay_factor = np.exp(-age_days * np.log(2) / decay_half_life_days)
-                        adjusted_score = base_score * decay_factor
-                        popular_articles.append((article_id, adjusted_score))
-                    else:
-                        popular_articles.append((article_id, base_score))
-                else:
-                    # Fallback: pas de timestamp, on garde l'article (risqué)
-                    logger.warning(f"Article {article_id} sans timestamp, inclus par défaut")
-                    popular_articles.append((article_id, base_score))
-
-        if excluded_old_count > 0:
-            logger.info(f"Fenêtre de hype: {excluded_old_count} articles exclus (> {max_age_days} jours)")
+        # Classement pré-calculé pour ce bucket temporel (fenêtre de hype + temporal decay)
+        ranked_ids, ranked_scores = self._popularity_ranking(now_ts, use_temporal_decay,
+                                                             decay_half_life_days, max_age_days)
 
-        # Trier par score ajusté
-        popular_articles = sorted(popular_articles, key=lambda x: x[1], reverse=True)
+        # Parcourir le top en sautant les articles déjà lus
+        popular_articles = []
+        for article_id, score in zip(ranked_ids.tolist(), ranked_scores.tolist()):
+            if article_id in exclude_articles:
+                continue
+            popular_articles.append((article_id, score))
+            if len(popular_articles) >= n_recommendations:
+                break
 
-        return popular_articles[:n_recommendations]
+        return popular_articles
 
     def _diversity_filtering(self, articles: List[Tuple[int, float]], n_final: int = 5) -> List[Tuple[int, float]]:
         """
@@ -366,12 +1200,11 @@ class RecommendationEngine:
         if len(articles) <= n_final:
             return articles
 
-        # Créer des groupes par catégorie avec leurs scores
+        # Créer des groupes par catégorie avec leurs scores (lookup colonnaire vectorisé)
+        candidate_categories = self.article_store.categories([article_id for article_id, _ in articles]).tolist()
         category_articles = {}
-        for article_id, score in articles:
-            article_info = self.metadata[self.metadata['article_id'] == article_id]
-            if not article_info.empty:
-                category = article_info.iloc[0]['category_id']
+        for (article_id, score), category in zip(articles, candidate_categories):
+            if category >= 0:
                 if category not in category_articles:
                     category_articles[category] = []
                 category_articles[category].append((article_id, score))
@@ -415,7 +1248,9 @@ class RecommendationEngine:
                   weight_collab: float = 0.36, weight_content: float = 0.39,
                   weight_trend: float = 0.25, use_diversity: bool = True,
                   reference_timestamp: Optional[int] = None,
-                  max_article_age_days: Optional[float] = None) -> List[Dict]:
+                  max_article_age_days: Optional[float] = None,
+                  user_history: Optional[Sequence[int]] = None,
+                  user_weights: Optional[Sequence[float]] = None) -> List[Dict]:
         """
         Génère des recommandations hybrides pour un utilisateur avec 3 coefficients
 
@@ -428,6 +1263,11 @@ class RecommendationEngine:
             use_diversity: Appliquer le filtre de diversité
             reference_timestamp: Timestamp de référence en ms pour calcul d'âge (défaut: now, pour évaluation: date split)
             max_article_age_days: Âge maximum des articles en jours (défaut: MAX_ARTICLE_AGE_DAYS, pour optuna: hyperparamètre)
+            user_history: Historique à utiliser à la place du profil (ex: partie train d'un split
+                d'évaluation, vue en lecture seule); le moteur n'est pas modifié, le cache de
+                résultats et les candidats pré-calculés (profil complet) sont ignorés
+            user_weights: Avec user_history, poids de chaque article pour l'embedding de profil
+                content-based (ex: poids d'interaction d'un trial); défaut: matrice pondérée
 
         Returns:
             Liste de dictionnaires avec les recommandations
@@ -448,60 +1288,164 @@ class RecommendationEngine:
         logger.info(f"Génération de {n_recommendations} recommandations pour user {user_id}")
         logger.info(f"Poids normalisés - Collab: {weight_collab:.2f}, Content: {weight_content:.2f}, Trend: {weight_trend:.2f}")
 
-        user_history = self._get_user_history(user_id)
-        is_cold_start = len(user_history) == 0
+        cache_key = None
+        if self.result_cache is not None and user_history is None:
+            cache_key = self._result_cache_key(user_id, n_recommendations, weight_collab, weight_content,
+                                               weight_trend, use_diversity,
+                                               reference_timestamp, max_article_age_days)
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"✓ {len(cached)} recommandations servies depuis le cache")
+                return [dict(rec) for rec in cached]
+
+        if self.is_warming_up():
+            # Composants lourds en cours de chargement: réponse immédiate par la popularité (non mise en cache)
+            logger.info(f"Warm-up en cours, recommandations par popularité pour user {user_id}")
+            cache_key = None
+            custom_history = False
+            user_history = []
+        else:
+            custom_history = user_history is not None
+            user_history = self._history_list(user_history) if custom_history else self._get_user_history(user_id)
+
+        components = self._component_scores(user_id, user_history, n_recommendations,
+                                            reference_timestamp, max_article_age_days,
+                                            custom_history=custom_history,
+                                            user_weights=user_weights if custom_history else None)
+        candidate_articles = components.combine(weight_collab, weight_content, weight_trend)
+
+        recommendations = self._finalize_recommendations(candidate_articles, n_recommendations, use_diversity)
 
-        if is_cold_start:
+        if cache_key is not None:
+            self.result_cache.put(cache_key, [dict(rec) for rec in recommendations])
+
+        logger.info(f"✓ {len(recommendations)} recommandations générées")
+
+        return recommendations
+
+    def component_scores(self, user_id: int, n_recommendations: int = 5,
+                         reference_timestamp: Optional[int] = None,
+                         max_article_age_days: Optional[float] = None,
+                         personal: Optional[ComponentScores] = None,
+                         user_history: Optional[Sequence[int]] = None,
+                         user_weights: Optional[Sequence[float]] = None) -> ComponentScores:
+        """
+        Candidats bruts des trois sources, avant pondération (tuning des poids hybrides)
+
+        recommend() = component_scores() + recommend_from_components(): l'appelant peut
+        garder les candidats en cache et les recombiner pour chaque jeu de poids.
+
+        Args:
+            user_id, n_recommendations, reference_timestamp, max_article_age_days, user_history,
+            user_weights: Voir recommend
+            personal: Scores d'un appel précédent pour le même historique: collaborative et
+                content-based sont réutilisés, seule la tendance est recalculée
+
+        Returns:
+            ComponentScores (listes brutes et scores normalisés par source)
+        """
+        if not self.loaded:
+            raise RuntimeError("Les modèles ne sont pas chargés. Appelez load_models() d'abord.")
+        if user_history is None:
+            return self._component_scores(user_id, self._get_user_history(user_id), n_recommendations,
+                                          reference_timestamp, max_article_age_days, personal)
+        return self._component_scores(user_id, self._history_list(user_history), n_recommendations,
+                                      reference_timestamp, max_article_age_days, personal, custom_history=True,
+                                      user_weights=user_weights)
+
+    def _component_scores(self, user_id: int, user_history: List[int], n_recommendations: int,
+                          reference_timestamp: Optional[int] = None,
+                          max_article_age_days: Optional[float] = None,
+                          personal: Optional[ComponentScores] = None,
+                          custom_history: bool = False,
+                          user_weights: Optional[Sequence[float]] = None) -> ComponentScores:
+        """
+        Candidats des trois sources pour un historique donné (voir component_scores)
+
+        custom_history: user_history ne vient pas du profil (pas de candidats pré-calculés,
+        embedding de profil recalculé sur cet historique)
+        user_weights: Poids des articles de user_history pour l'embedding de profil (voir recommend)
+        """
+        if len(user_history) == 0:
             logger.info(f"Cold start pour user {user_id}, utilisation de la popularité")
             # Pour un nouvel utilisateur, utiliser la popularité
-            candidate_articles = self._popularity_based(n_recommendations=n_recommendations * 3,
-                                                       reference_timestamp=reference_timestamp,
-                                                       max_age_days=max_article_age_days)
+            return ComponentScores.popularity_only(self._popularity_based(n_recommendations=n_recommendations * 3,
+                                   reference_timestamp=reference_timestamp,
+                                   max_age_days=max_article_age_days))
+
+        # Obtenir plus de candidats pour avoir plus de diversité
+        n_candidates = n_recommendations * 10
+
+        if personal is not None and not personal.cold_start:
+            # Historique inchangé: candidats personnels déjà calculés
+            collab_recs, content_recs = personal.collab, personal.content
         else:
-            # Obtenir plus de candidats pour avoir plus de diversité
-            n_candidates = n_recommendations * 10
-
-            # Obtenir les recommandations collaborative
-            collab_recs = self._collaborative_filtering(user_id, n_recommendations=n_candidates)
-
-            # Obtenir les recommandations content-based
-            content_recs = self._content_based_filtering(user_id, n_recommendations=n_candidates)
-
-            # Obtenir les recommandations basées sur les tendances (toujours incluses maintenant)
-            trend_recs = self._popularity_based(n_recommendations=n_candidates, exclude_articles=user_history,
-                                               reference_timestamp=reference_timestamp,
-                                               max_age_days=max_article_age_days)
-
-            # Combiner les scores avec les 3 coefficients
-            combined_scores = {}
-
-            # Normaliser les scores collaborative
-            if collab_recs:
-                max_collab = max(score for _, score in collab_recs)
-                for article_id, score in collab_recs:
-                    combined_scores[article_id] = weight_collab * (score / max_collab)
-
-            # Normaliser et ajouter les scores content-based
-            if content_recs:
-                max_content = max(score for _, score in content_recs)
-                for article_id, score in content_recs:
-                    if article_id in combined_scores:
-                        combined_scores[article_id] += weight_content * (score / max_content)
-                    else:
-                        combined_scores[article_id] = weight_content * (score / max_content)
-
-            # Normaliser et ajouter les scores de tendance
-            if trend_recs:
-                max_trend = max(score for _, score in trend_recs)
-                for article_id, score in trend_recs:
-                    if article_id in combined_scores:
-                        combined_scores[article_id] += weight_trend * (score / max_trend)
-                    else:
-                        combined_scores[article_id] = weight_trend * (score / max_trend)
-
-            # Trier par score combiné
-            candidate_articles = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)
+            precomputed = None if custom_history else self._precomputed_candidates(user_id, n_candidates)
+            if precomputed is not None:
+                # Utilisateur connu: candidats pré-calculés hors ligne
+                collab_recs, content_recs = precomputed
+            else:
+                # Obtenir les recommandations collaborative
+                collab_recs = self._collaborative_filtering(user_id, n_recommendations=n_candidates)
+
+                # Obtenir les recommandations content-based
+                content_recs = self._content_based_filtering(
+                    user_id, n_recommendations=n_candidates,
+                    user_history=user_history if custom_history else None,
+                    user_weights=user_weights)
+
+        # Obtenir les recommandations basées sur les tendances (toujours incluses maintenant)
+        trend_recs = self._popularity_based(n_recommendations=n_candidates, exclude_articles=user_history,
+                                           reference_timestamp=reference_timestamp,
+                                           max_age_days=max_article_age_days)
+
+        return ComponentScores(collab_recs, content_recs, trend_recs)
+
+    def recommend_from_components(self, components: ComponentScores, n_recommendations: int = 5,
+                                  weight_collab: float = 0.36, weight_content: float = 0.39,
+                                  weight_trend: float = 0.25, use_diversity: bool = True) -> List[Dict]:
+        """
+        Recommandations à partir de candidats déjà calculés (voir component_scores)
+
+        Seuls la somme pondérée, le tri et le formatage sont faits: même résultat que
+        recommend() avec les mêmes poids, sans recalculer les trois sources.
+        """
+        # Normaliser les poids pour qu'ils somment à 1
+        total_weight = weight_collab + weight_content + weight_trend
+        candidate_articles = components.combine(weight_collab / total_weight, weight_content / total_weight,
+                                                weight_trend / total_weight)
+        return self._finalize_recommendations(candidate_articles, n_recommendations, use_diversity)
+
+    def _result_cache_key(self, user_id: int, n_recommendations: int, weight_collab: float,
+                          weight_content: float, weight_trend: float, use_diversity: bool,
+                          reference_timestamp: Optional[int], max_article_age_days: Optional[float]) -> Tuple:
+        """
+        Clé de cache d'une requête (poids déjà normalisés)
+
+        Le bucket temporel est celui du classement de popularité (POPULARITY_BUCKET_MS):
+        un résultat n'est jamais réutilisé au-delà du changement de classement.
+        """
+        now_ts = int(time.time() * 1000) if reference_timestamp is None else int(reference_timestamp)
+        return (int(user_id), int(n_recommendations),
+                round(weight_collab, 6), round(weight_content, 6), round(weight_trend, 6),
+                bool(use_diversity), now_ts // self.POPULARITY_BUCKET_MS, self.model_version,
+                max_article_age_days)
+
+    def _combine_scores(self, collab_recs: List[Tuple[int, float]], content_recs: List[Tuple[int, float]],
+                        trend_recs: List[Tuple[int, float]], weight_collab: float, weight_content: float,
+                        weight_trend: float) -> List[Tuple[int, float]]:
+        """
+        Combine les trois sources (scores normalisés par leur max) avec les poids normalisés
 
+        Returns:
+            Liste de tuples (article_id, score combiné) triée par score décroissant
+        """
+        return ComponentScores(collab_recs, content_recs, trend_recs).combine(weight_collab, weight_content,
+                                                                              weight_trend)
+
+    def _finalize_recommendations(self, candidate_articles: List[Tuple[int, float]], n_recommendations: int,
+                                  use_diversity: bool) -> List[Dict]:
+        """Applique le filtre de diversité puis formate les articles retenus avec leurs métadonnées"""
         # Appliquer le filtre de diversité
         if use_diversity:
             final_articles = self._diversity_filtering(candidate_articles, n_final=n_recommendations)
@@ -510,19 +1454,93 @@ class RecommendationEngine:
 
         # Formater les résultats
         recommendations = []
-        for article_id, score in final_articles:
-            article_info = self.metadata[self.metadata['article_id'] == article_id]
-            if not article_info.empty:
+        rows = self.article_store.rows([article_id for article_id, _ in final_articles])
+        for (article_id, score), row in zip(final_articles, rows):
+            if row >= 0:
                 rec = {
                     'article_id': int(article_id),
                     'score': float(score),
-                    'category_id': int(article_info.iloc[0]['category_id']),
-                    'publisher_id': int(article_info.iloc[0]['publisher_id']),
-                    'words_count': int(article_info.iloc[0]['words_count']),
-                    'created_at_ts': int(article_info.iloc[0]['created_at_ts'])
+                    **self.article_store.record(row)
                 }
                 recommendations.append(rec)
 
-        logger.info(f"✓ {len(recommendations)} recommandations générées")
-
         return recommendations
+
+    def recommend_batch(self, user_ids: List[int], n_recommendations: int = 5,
+                        weight_collab: float = 0.36, weight_content: float = 0.39,
+                        weight_trend: float = 0.25, use_diversity: bool = True,
+                        reference_timestamp: Optional[int] = None,
+                        max_article_age_days: Optional[float] = None) -> Dict[int, List[Dict]]:
+        """
+        Recommandations hybrides pour un lot d'utilisateurs (précalcul email/push)
+
+        Même combinaison que recommend(), mais collaborative et content-based sont calculés
+        pour tout le lot par produits matrice-matrice (BATCH_CHUNK_SIZE utilisateurs à la fois).
+
+        Args:
+            user_ids: Liste des IDs utilisateurs
+            n_recommendations: Nombre de recommandations par utilisateur
+            weight_collab: Poids du collaborative filtering
+            weight_content: Poids du content-based filtering
+            weight_trend: Poids du trend/popularity filtering
+            use_diversity: Appliquer le filtre de diversité
+            reference_timestamp: Timestamp de référence en ms pour calcul d'âge (voir recommend)
+            max_article_age_days: Âge maximum des articles en jours (voir recommend)
+
+        Returns:
+            Dict user_id -> liste de recommandations (même format que recommend)
+
+        Note:
+            Le content-based du lot utilise la même recherche que recommend: index IVF
+            (ANN_N_PROBE clusters par utilisateur) s'il est chargé, sinon recherche exacte par
+            produit matrice-matrice sur tous les articles (voir _content_based_filtering_batch).
+        """
+        if not self.loaded:
+            raise RuntimeError("Les modèles ne sont pas chargés. Appelez load_models() d'abord.")
+
+        # Normaliser les poids pour qu'ils somment à 1
+        total_weight = weight_collab + weight_content + weight_trend
+        weight_collab = weight_collab / total_weight
+        weight_content = weight_content / total_weight
+        weight_trend = weight_trend / total_weight
+
+        logger.info(f"Génération de {n_recommendations} recommandations pour {len(user_ids)} utilisateurs (lot)")
+
+        user_histories = {user_id: self._get_user_history(user_id) for user_id in user_ids}
+        active_histories = {user_id: history for user_id, history in user_histories.items() if history}
+
+        n_candidates = n_recommendations * 10
+        precomputed = {}
+        for user_id in active_histories:
+            candidates = self._precomputed_candidates(user_id, n_candidates)
+            if candidates is not None:
+                precomputed[user_id] = candidates
+
+        # Calcul en ligne uniquement pour les utilisateurs absents de la table pré-calculée
+        live_histories = {user_id: history for user_id, history in active_histories.items()
+                          if user_id not in precomputed}
+        collab_recs = self._collaborative_filtering_batch(list(live_histories), n_recommendations=n_candidates)
+        content_recs = self._content_based_filtering_batch(live_histories, n_recommendations=n_candidates)
+        for user_id, (user_collab, user_content) in precomputed.items():
+            collab_recs[user_id] = user_collab
+            content_recs[user_id] = user_content
+
+        results = {}
+        for user_id, user_history in user_histories.items():
+            if not user_history:
+                # Cold start: popularité
+                candidate_articles = self._popularity_based(n_recommendations=n_recommendations * 3,
+                                                            reference_timestamp=reference_timestamp,
+                                                            max_age_days=max_article_age_days)
+            else:
+                trend_recs = self._popularity_based(n_recommendations=n_candidates, exclude_articles=user_history,
+                                                    reference_timestamp=reference_timestamp,
+                                                    max_age_days=max_article_age_days)
+                candidate_articles = self._combine_scores(collab_recs[user_id], content_recs[user_id], trend_recs,
+                                                          weight_collab, weight_content, weight_trend)
+            results[user_id] = self._finalize_recommendations(candidate_articles, n_recommendations, use_diversity)
+
+        logger.info(f"✓ Recommandations générées pour {len(results)} utilisateurs "
+                    f"({len(user_histories) - len(active_histories)} cold start)")
+
+        return results
@@ -0,0 +1,60 @@
+"""
+Cache LRU/TTL des résultats de recommandation (en mémoire, par processus)
+Évite de recalculer les appels répétés (reruns Streamlit, retries clients)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class ResultCache:
+    """
+    Cache LRU borné en taille, avec expiration (TTL) et compteurs hit/miss
+
+    Thread-safe: les accès sont sérialisés par un verrou (opérations O(1)).
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # clé -> (expiration monotonic, valeur)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Valeur associée à la clé, None si absente ou expirée"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        """Ajoute une entrée (évince la moins récemment utilisée au-delà de max_size)"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vide le cache (nouvelle version des modèles); les compteurs sont conservés"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs exposés dans les métadonnées des réponses"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
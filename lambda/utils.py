@@ -7,6 +7,8 @@ import os
 import logging
 from pathlib import Path
 
+from metadata_store import ArticleMetadataStore
+
 logger = logging.getLogger(__name__)
 
 def download_models_from_s3(bucket_name: str, prefix: str, local_path: str = '/tmp/models'):
@@ -91,31 +93,38 @@ def upload_models_to_s3(local_path: str, bucket_name: str, prefix: str):
         logger.error(f"Erreur lors de l'upload vers S3: {e}")
         return False
 
-def format_article_info(article_id: int, metadata_df):
+def format_article_info(article_id: int, metadata):
     """
     Formate les informations d'un article pour l'affichage
 
     Args:
         article_id: ID de l'article
-        metadata_df: DataFrame des métadonnées
+        metadata: ArticleMetadataStore (lookup O(1)) ou DataFrame des métadonnées
 
     Returns:
         dict: Informations formatées
     """
-    article = metadata_df[metadata_df['article_id'] == article_id]
+    if isinstance(metadata, ArticleMetadataStore):
+        info = metadata.get(article_id)
+    else:
+        article = metadata[metadata['article_id'] == article_id]
+        info = None if article.empty else {
+            'category_id': int(article.iloc[0]['category_id']),
+            'publisher_id': int(article.iloc[0]['publisher_id']),
+            'words_count': int(article.iloc[0]['words_count']),
+            'created_at_ts': int(article.iloc[0]['created_at_ts'])
+        }
 
-    if article.empty:
+    if info is None:
         return {
             'article_id': article_id,
             'error': 'Article non trouvé'
         }
 
-    row = article.iloc[0]
-
     return {
         'article_id': int(article_id),
-        'category_id': int(row['category_id']),
-        'publisher_id': int(row['publisher_id']),
-        'words_count': int(row['words_count']),
-        'created_at': int(row['created_at_ts'])
+        'category_id': info['category_id'],
+        'publisher_id': info['publisher_id'],
+        'words_count': info['words_count'],
+        'created_at': info['created_at_ts']
     }
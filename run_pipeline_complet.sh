@@ -213,11 +213,39 @@ if [ -f "$DATA_PREP/create_weighted_matrix.py" ]; then
         SIZE=$(du -h "$MODELS_DIR/user_item_matrix_weighted.npz" | cut -f1)
         log_success "Matrice pondérée: $SIZE"
     fi
+
+    if [ -f "$MODELS_DIR/user_embeddings.npy" ]; then
+        SIZE=$(du -h "$MODELS_DIR/user_embeddings.npy" | cut -f1)
+        log_success "Embeddings de profil utilisateur: $SIZE"
+    fi
 else
     log_error "Script de création matrice non trouvé: create_weighted_matrix.py"
     exit 1
 fi
 
+log "Construction de l'index item-item (top-K voisins)..."
+python3 "$DATA_PREP/build_item_neighbors.py" 2>&1 | tee -a "$LOG_FILE"
+
+if [ -f "$MODELS_DIR/item_neighbors.npz" ]; then
+    SIZE=$(du -h "$MODELS_DIR/item_neighbors.npz" | cut -f1)
+    log_success "Index item-item: $SIZE"
+fi
+
+log "Packaging du bundle binaire (chargement mmap)..."
+python3 "$DATA_PREP/build_model_bundle.py" 2>&1 | tee -a "$LOG_FILE"
+
+if [ -f "$MODELS_DIR/bundles/LATEST" ]; then
+    log_success "Bundle actif: $(cat "$MODELS_DIR/bundles/LATEST")"
+fi
+
+log "Pré-calcul des candidats de recommandation (utilisateurs connus)..."
+python3 "$DATA_PREP/precompute_recommendations.py" 2>&1 | tee -a "$LOG_FILE"
+
+if [ -f "$MODELS_DIR/precomputed/manifest.json" ]; then
+    SIZE=$(du -sh "$MODELS_DIR/precomputed" | cut -f1)
+    log_success "Table pré-calculée: $SIZE"
+fi
+
 # ============================================================================
 # ÉTAPE 5 : Création des modèles Lite (pour déploiement)
 # ============================================================================
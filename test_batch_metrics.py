@@ -0,0 +1,196 @@
+"""
+Test des métriques vectorisées (evaluation/batch_metrics.py)
+
+Compare ranking_metrics, intra_user_diversity et novelty aux implémentations par
+utilisateur d'origine de ImprovedRecommendationEvaluator (boucles Python, lookups par
+article), sur des recommandations synthétiques avec les cas limites:
+- lignes complétées par PAD (moins de k recommandations, aucune recommandation)
+- articles inconnus des métadonnées et de la popularité
+- articles de validation en double (comptés dans le recall et l'IDCG)
+
+Usage:
+    python test_batch_metrics.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'evaluation'))
+from batch_metrics import (PAD, recommendation_matrix, ground_truth_matrix, relevant_counts, hit_matrix,
+                           ranking_metrics, article_lookup, intra_user_diversity, novelty)
+
+N_USERS = 200
+N_ARTICLES = 300
+N_UNKNOWN = 40  # Articles recommandés absents des métadonnées et de la popularité
+K = 10
+TOLERANCE = 1e-9
+
+
+# ---------------------------------------------------------------------------
+# Implémentations de référence (une liste par utilisateur)
+# ---------------------------------------------------------------------------
+
+def reference_precision_at_k(recommended, relevant, k):
+    if k == 0 or len(recommended) == 0:
+        return 0.0
+    relevant_set = set(relevant)
+    return len([a for a in recommended[:k] if a in relevant_set]) / k
+
+
+def reference_recall_at_k(recommended, relevant, k):
+    if len(relevant) == 0:
+        return 0.0
+    relevant_set = set(relevant)
+    return len([a for a in recommended[:k] if a in relevant_set]) / len(relevant)
+
+
+def reference_ndcg_at_k(recommended, relevant, k):
+    if len(relevant) == 0:
+        return 0.0
+    relevant_set = set(relevant)
+    dcg = sum(1.0 / np.log2(i + 2) for i, a in enumerate(recommended[:k]) if a in relevant_set)
+    idcg = sum(1.0 / np.log2(i + 2) for i in range(min(k, len(relevant))))
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+def reference_mrr(recommended, relevant):
+    relevant_set = set(relevant)
+    for i, a in enumerate(recommended):
+        if a in relevant_set:
+            return 1.0 / (i + 1)
+    return 0.0
+
+
+def reference_intra_user_diversity(recommended, metadata):
+    if len(recommended) <= 1:
+        return 0.0
+    known = [metadata[a] for a in recommended if a in metadata]
+    if len(known) == 0:
+        return 0.0
+    categories = [category for category, _ in known]
+    publishers = [publisher for _, publisher in known]
+    return 0.7 * len(set(categories)) / len(categories) + 0.3 * len(set(publishers)) / len(publishers)
+
+
+def reference_novelty(recommended, popularity):
+    if len(recommended) == 0:
+        return 0.0
+    max_popularity = max(popularity.values())
+    scores = [1.0 - popularity[a] / max_popularity for a in recommended if a in popularity]
+    return float(np.mean(scores)) if scores else 0.0
+
+
+# ---------------------------------------------------------------------------
+# Données synthétiques
+# ---------------------------------------------------------------------------
+
+def synthetic_data(seed: int = 0):
+    """Recommandations, articles de validation, métadonnées et popularité avec cas limites"""
+    rng = np.random.default_rng(seed)
+    known_ids = np.sort(rng.choice(10000, N_ARTICLES, replace=False))
+    unknown_ids = np.setdiff1d(np.arange(10000, 10000 + 5 * N_UNKNOWN), known_ids)[:N_UNKNOWN]
+    candidates = np.r_[known_ids, unknown_ids]
+
+    metadata = {int(a): (int(rng.integers(0, 6)), int(rng.integers(0, 3))) for a in known_ids}
+    popularity = {int(a): float(p) for a, p in zip(known_ids, rng.uniform(0.01, 1.0, N_ARTICLES))}
+
+    recommendations, relevant = [], []
+    for _ in range(N_USERS):
+        n_recommended = int(rng.integers(0, K + 1))  # 0..K: lignes complétées par PAD
+        recs = rng.choice(candidates, n_recommended, replace=False).tolist()
+        # Validation: en partie dans les recommandations, doublons possibles, parfois vide
+        n_relevant = int(rng.integers(0, 8))
+        pool = recs + rng.choice(candidates, 5, replace=False).tolist() if recs else candidates.tolist()
+        relevant.append([int(a) for a in rng.choice(pool, n_relevant, replace=True)])
+        recommendations.append([int(a) for a in recs])
+
+    # Cas limites explicites
+    recommendations += [[], [int(known_ids[0])], unknown_ids[:3].tolist(), known_ids[:K].tolist()]
+    relevant += [[int(known_ids[1])], [int(known_ids[0])] * 3, [int(unknown_ids[0])],
+                 [int(known_ids[2]), int(known_ids[2]), int(known_ids[5])]]
+    return recommendations, relevant, metadata, popularity
+
+
+def check(name: str, got: np.ndarray, expected: list) -> bool:
+    """Compare un vecteur de métrique aux valeurs de référence"""
+    errors = np.abs(np.asarray(got, dtype=np.float64) - np.asarray(expected, dtype=np.float64))
+    if len(errors) != len(expected) or errors.max() > TOLERANCE:
+        worst = int(errors.argmax())
+        print(f"   ✗ {name}: user {worst} {got[worst]} vs {expected[worst]}")
+        return False
+    print(f"   ✓ {name}")
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+def test_ranking_metrics(recommendations, relevant) -> bool:
+    """precision/recall/ndcg@5,10 et mrr@10 vs boucles par utilisateur"""
+    print("\n1. Métriques de ranking...")
+    recommended = recommendation_matrix(recommendations, K)
+    ground_truth, article_ids = ground_truth_matrix(relevant)
+    hits = hit_matrix(recommended, ground_truth, article_ids)
+    metrics = ranking_metrics(hits, relevant_counts(ground_truth), ks=(5, 10))
+
+    ok = True
+    for k in (5, 10):
+        ok &= check(f"precision@{k}", metrics[f'precision@{k}'],
+                    [reference_precision_at_k(r, v, k) for r, v in zip(recommendations, relevant)])
+        ok &= check(f"recall@{k}", metrics[f'recall@{k}'],
+                    [reference_recall_at_k(r, v, k) for r, v in zip(recommendations, relevant)])
+        ok &= check(f"ndcg@{k}", metrics[f'ndcg@{k}'],
+                    [reference_ndcg_at_k(r, v, k) for r, v in zip(recommendations, relevant)])
+    ok &= check("mrr@10", metrics['mrr@10'],
+                [reference_mrr(r[:10], v) for r, v in zip(recommendations, relevant)])
+    return ok
+
+
+def test_intra_user_diversity(recommendations, metadata) -> bool:
+    """0.7 × catégories + 0.3 × publishers vs lookups par article"""
+    print("\n2. Diversité intra-utilisateur...")
+    recommended = recommendation_matrix(recommendations, K)
+    n_recommended = (recommended != PAD).sum(axis=1)
+    article_ids = np.array(list(metadata), dtype=np.int64)
+    categories = article_lookup(recommended, article_ids, np.array([c for c, _ in metadata.values()]))
+    publishers = article_lookup(recommended, article_ids, np.array([p for _, p in metadata.values()]))
+
+    return check("intra_diversity", intra_user_diversity(categories, publishers, n_recommended),
+                 [reference_intra_user_diversity(r, metadata) for r in recommendations])
+
+
+def test_novelty(recommendations, popularity) -> bool:
+    """Moyenne de 1 - popularité / max vs lookups par article"""
+    print("\n3. Nouveauté...")
+    recommended = recommendation_matrix(recommendations, K)
+    n_recommended = (recommended != PAD).sum(axis=1)
+    scores = np.array(list(popularity.values()))
+    looked_up = article_lookup(recommended, np.array(list(popularity), dtype=np.int64), scores)
+
+    return check("novelty", novelty(looked_up, scores.max(), n_recommended),
+                 [reference_novelty(r, popularity) for r in recommendations])
+
+
+def main() -> bool:
+    print("=" * 80)
+    print("TEST DES MÉTRIQUES VECTORISÉES (batch_metrics)")
+    print("=" * 80)
+
+    recommendations, relevant, metadata, popularity = synthetic_data()
+    print(f"\n{len(recommendations)} utilisateurs, k = {K}, {N_UNKNOWN} articles inconnus")
+
+    ok = test_ranking_metrics(recommendations, relevant)
+    ok &= test_intra_user_diversity(recommendations, metadata)
+    ok &= test_novelty(recommendations, popularity)
+
+    print("\n" + "=" * 80)
+    print("✅ MÉTRIQUES IDENTIQUES" if ok else "❌ ÉCARTS DÉTECTÉS")
+    print("=" * 80)
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
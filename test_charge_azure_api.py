@@ -83,6 +83,46 @@ def test_single_request(user_id, n_recommendations=5):
             'status_code': 0
         }
 
+def test_batch_request(user_ids, n_recommendations=5):
+    """Test une requête batch (user_ids) et retourne le temps de réponse"""
+    payload = {
+        "user_ids": user_ids,
+        "n": n_recommendations
+    }
+
+    start_time = time.time()
+    try:
+        response = requests.post(
+            API_URL,
+            json=payload,
+            headers={'Content-Type': 'application/json'},
+            timeout=120
+        )
+        elapsed = (time.time() - start_time) * 1000  # en ms
+
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                'success': True,
+                'latency_ms': elapsed,
+                'n_users': data.get('n_users', 0),
+                'status_code': response.status_code
+            }
+        return {
+            'success': False,
+            'latency_ms': elapsed,
+            'error': f"Status {response.status_code}",
+            'status_code': response.status_code
+        }
+    except Exception as e:
+        elapsed = (time.time() - start_time) * 1000
+        return {
+            'success': False,
+            'latency_ms': elapsed,
+            'error': str(e),
+            'status_code': 0
+        }
+
 def run_load_test():
     """Execute le test de charge"""
     print_section("TEST DE CHARGE API AZURE FUNCTIONS")
@@ -113,6 +153,12 @@ def run_load_test():
         else:
             print(f"User {user_id:5d}: {RED}ÉCHEC{NC} - {result.get('error')}")
 
+    result = test_batch_request(USERS_TO_TEST, n_recommendations=5)
+    if result['success']:
+        print(f"\nBatch ({result['n_users']} users, 1 requête): {result['latency_ms']:6.0f}ms")
+    else:
+        print(f"\nBatch: {RED}ÉCHEC{NC} - {result.get('error')}")
+
     # 3. TEST DE CHARGE CONCURRENT
     print_section("3. TEST DE CHARGE CONCURRENT")
     print(f"Lancement de {N_REQUESTS} requêtes avec {N_CONCURRENT} workers concurrents...\n")
@@ -0,0 +1,198 @@
+"""
+Test de parité des chemins vectorisés du moteur de recommandation
+
+Sur un petit modèle synthétique (fichiers legacy écrits dans un dossier temporaire):
+- Collaborative filtering: mode vectorisé (CF_MODE_USER) vs boucle historique (CF_MODE_USER_LOOP)
+- Content-based: matrice normalisée + BLAS vs cosinus scipy article par article (implémentation d'origine)
+
+Usage:
+    python test_engine_parity.py                   # lambda puis azure_function
+    python test_engine_parity.py azure_function    # un seul moteur
+"""
+
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, save_npz
+from scipy.spatial.distance import cosine
+
+ENGINE_FOLDERS = ('lambda', 'azure_function')
+N_USERS = 300
+N_ARTICLES = 200
+EMBEDDING_DIM = 16
+N_CANDIDATES = 30
+TOLERANCE = 1e-5
+
+
+def write_synthetic_models(models_path: str, seed: int = 0):
+    """Écrit un modèle legacy minimal (mappings, matrices, profils, embeddings, métadonnées)"""
+    rng = np.random.default_rng(seed)
+    article_ids = np.sort(rng.choice(5000, N_ARTICLES, replace=False))
+    user_ids = np.sort(rng.choice(100000, N_USERS, replace=False))
+
+    metadata = pd.DataFrame({
+        'article_id': article_ids,
+        'category_id': rng.integers(0, 8, N_ARTICLES),
+        'created_at_ts': 1700000000000 - rng.integers(0, 90, N_ARTICLES) * 86400000,
+        'publisher_id': 0,
+        'words_count': rng.integers(50, 400, N_ARTICLES)
+    })
+    metadata.to_csv(f"{models_path}/articles_metadata.csv", index=False)
+
+    rows, columns, counts, weights = [], [], [], []
+    profiles = {}
+    for user_idx, user_id in enumerate(user_ids):
+        n_read = int(rng.integers(3, 20))
+        read = rng.choice(N_ARTICLES, n_read, replace=False)
+        read_weights = rng.uniform(0.1, 1.0, n_read)
+        rows += [user_idx] * n_read
+        columns += read.tolist()
+        counts += rng.integers(1, 4, n_read).tolist()
+        weights += read_weights.tolist()
+        history = article_ids[read].tolist()
+        profiles[str(user_id)] = {
+            'articles_read': history,
+            'article_weights': {str(a): float(w) for a, w in zip(history, read_weights)},
+            'num_interactions': n_read
+        }
+
+    shape = (N_USERS, N_ARTICLES)
+    save_npz(f"{models_path}/user_item_matrix.npz",
+             csr_matrix((np.array(counts, dtype=np.float64), (rows, columns)), shape=shape))
+    save_npz(f"{models_path}/user_item_matrix_weighted.npz",
+             csr_matrix((np.array(weights, dtype=np.float32), (rows, columns)), shape=shape))
+
+    mappings = {
+        'user_to_idx': {int(u): i for i, u in enumerate(user_ids)},
+        'idx_to_user': {i: int(u) for i, u in enumerate(user_ids)},
+        'article_to_idx': {int(a): i for i, a in enumerate(article_ids)},
+        'idx_to_article': {i: int(a) for i, a in enumerate(article_ids)}
+    }
+    with open(f"{models_path}/mappings.pkl", 'wb') as f:
+        pickle.dump(mappings, f)
+    with open(f"{models_path}/article_popularity.pkl", 'wb') as f:
+        pickle.dump({int(a): float(s) for a, s in zip(article_ids, rng.uniform(0, 1, N_ARTICLES))}, f)
+    with open(f"{models_path}/user_profiles.json", 'w') as f:
+        json.dump(profiles, f)
+    with open(f"{models_path}/embeddings_filtered.pkl", 'wb') as f:
+        pickle.dump({int(a): rng.normal(size=EMBEDDING_DIM).astype(np.float32) for a in article_ids}, f)
+
+
+def reference_content_scores(engine, user_id: int) -> dict:
+    """Scores content-based de l'implémentation d'origine (cosinus scipy par article)"""
+    user_history = engine._get_user_history(user_id)
+    user_idx = engine.mappings['user_to_idx'][user_id]
+    user_weights_vector = engine.weighted_user_item_matrix[user_idx].toarray().flatten()
+
+    user_embeddings, weights = [], []
+    for article_id in user_history:
+        if article_id in engine.embeddings and article_id in engine.mappings['article_to_idx']:
+            weight = user_weights_vector[engine.mappings['article_to_idx'][article_id]]
+            if weight > 0:
+                user_embeddings.append(engine.embeddings[article_id])
+                weights.append(weight)
+    weights = np.array(weights)
+    user_profile_embedding = np.average(user_embeddings, axis=0, weights=weights / weights.sum())
+
+    user_categories = {}
+    for article_id in user_history:
+        if article_id in engine.article_categories:
+            category = engine.article_categories[article_id]
+            user_categories[category] = user_categories.get(category, 0) + 1
+
+    article_scores = {}
+    for article_id, embedding in engine.embeddings.items():
+        if article_id not in user_history:
+            similarity = 1 - cosine(user_profile_embedding, embedding)
+            category = engine.article_categories.get(article_id)
+            if category in user_categories:
+                similarity *= 1.0 + 0.1 * user_categories[category] / len(user_history)
+            article_scores[article_id] = similarity
+    return article_scores
+
+
+def check_ranking(name: str, recs: list, reference_scores: dict, reference_top: list) -> bool:
+    """
+    Même classement à la tolérance près: chaque article a le score de référence, et la suite
+    des scores est celle du top de référence (les ex aequo peuvent être permutés)
+    """
+    if len(recs) != len(reference_top):
+        print(f"   ✗ {name}: {len(recs)} recommandations au lieu de {len(reference_top)}")
+        return False
+    for article_id, score in recs:
+        if article_id not in reference_scores or abs(reference_scores[article_id] - score) > TOLERANCE:
+            print(f"   ✗ {name}: article {article_id} score {score} vs {reference_scores.get(article_id)}")
+            return False
+    if not np.allclose([s for _, s in recs], [s for _, s in reference_top], atol=TOLERANCE):
+        print(f"   ✗ {name}: ordre différent")
+        return False
+    return True
+
+
+def test_collaborative_parity(engine, engine_class) -> bool:
+    """CF_MODE_USER (produit creux + argpartition) vs CF_MODE_USER_LOOP"""
+    print("\n1. Collaborative filtering: vectorisé vs boucle...")
+    ok = True
+    for use_weighted_matrix in (True, False):
+        for user_id in engine.mappings['user_to_idx']:
+            loop = engine._collaborative_filtering(user_id, N_ARTICLES, use_weighted_matrix,
+                                                   cf_mode=engine_class.CF_MODE_USER_LOOP)
+            vectorized = engine._collaborative_filtering(user_id, N_CANDIDATES, use_weighted_matrix,
+                                                         cf_mode=engine_class.CF_MODE_USER)
+            ok &= check_ranking(f"user {user_id} (pondérée={use_weighted_matrix})",
+                                vectorized, dict(loop), loop[:N_CANDIDATES])
+    print(f"   {'✓' if ok else '✗'} {2 * N_USERS} requêtes comparées")
+    return ok
+
+
+def test_content_parity(engine) -> bool:
+    """Matrice normalisée + produit matrice-vecteur vs cosinus scipy par article"""
+    print("\n2. Content-based: BLAS vs cosinus par article...")
+    ok = True
+    for user_id in engine.mappings['user_to_idx']:
+        reference_scores = reference_content_scores(engine, user_id)
+        reference_top = sorted(reference_scores.items(), key=lambda x: x[1], reverse=True)[:N_CANDIDATES]
+        recs = engine._content_based_filtering(user_id, N_CANDIDATES, use_ann=False)
+        ok &= check_ranking(f"user {user_id}", recs, reference_scores, reference_top)
+    print(f"   {'✓' if ok else '✗'} {N_USERS} requêtes comparées")
+    return ok
+
+
+def run(engine_folder: str) -> bool:
+    """Exécute les tests de parité sur le moteur d'un dossier de déploiement"""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), engine_folder))
+    from recommendation_engine import RecommendationEngine
+
+    print("=" * 80)
+    print(f"TEST DE PARITÉ DU MOTEUR ({engine_folder})")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as models_path:
+        write_synthetic_models(models_path)
+        engine = RecommendationEngine(models_path=models_path, use_bundle=False,
+                                      use_precomputed=False, use_result_cache=False)
+        engine.load_models()
+
+        ok = test_collaborative_parity(engine, RecommendationEngine)
+        ok &= test_content_parity(engine)
+
+    print("\n" + "=" * 80)
+    print("✅ PARITÉ OK" if ok else "❌ ÉCARTS DÉTECTÉS")
+    print("=" * 80)
+    return ok
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(0 if run(sys.argv[1]) else 1)
+
+    # Un processus par moteur: les deux dossiers définissent les mêmes noms de modules
+    failed = [folder for folder in ENGINE_FOLDERS
+              if subprocess.run([sys.executable, os.path.abspath(__file__), folder]).returncode != 0]
+    sys.exit(1 if failed else 0)